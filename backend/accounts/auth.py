@@ -1,11 +1,56 @@
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework.permissions import BasePermission
+import copy
+import hashlib
+import time
+
 from django.conf import settings
-import hmac
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from infrastructure.cache import MISSING, TTLLRUCache
+
+# User.preferred_language, carried in access tokens for UserLanguageMiddleware
+LANGUAGE_CLAIM = "preferred_language"
+
+_token_cache: TTLLRUCache | None = None
+_user_cache: TTLLRUCache | None = None
+
+
+def get_token_cache() -> TTLLRUCache:
+    """sha256(raw access token) -> validated token, never kept past the token's `exp`."""
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = TTLLRUCache(maxsize=settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_TOKEN_CACHE_TTL)
+    return _token_cache
+
+
+def get_user_cache() -> TTLLRUCache:
+    """str(user id) -> User, dropped on every save / delete of that user (accounts/signals.py)."""
+    global _user_cache
+    if _user_cache is None:
+        _user_cache = TTLLRUCache(maxsize=settings.AUTH_USER_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL)
+    return _user_cache
 
 
+def invalidate_user(user_id) -> None:
+    # keyed like the token claim (simplejwt stores ids as strings)
+    key = str(user_id)
+    # now, and again at commit: a request in between may have re-read the old row
+    get_user_cache().delete(key)
+    transaction.on_commit(lambda: get_user_cache().delete(key))
+
 
 class CookieJWTAuthentication(JWTAuthentication):
+    """
+    Bearer header or `access_token` cookie.
+
+    Verified tokens and their users are cached per process, so a client
+    sending the same token again costs no signature check and no query.
+    """
+
     def authenticate(self, request):
         header = self.get_header(request)
         if header is None:
@@ -18,26 +63,54 @@ class CookieJWTAuthentication(JWTAuthentication):
 
         validated_token = self.get_validated_token(raw_token)
         return self.get_user(validated_token), validated_token
-    
 
-class HasMinecraftServerKey(BasePermission):
-    """
-    Allows access only if request contains the correct server key header.
-    This is *not* per-user auth. This is per-server auth.
-    """
-
-    # Incoming header should be:  X-Server-Key: <key>
-    # Django/DRF exposes that as request.META["HTTP_X_SERVER_KEY"]
-    header_name = "HTTP_X_SERVER_KEY"
+    def get_validated_token(self, raw_token):
+        if raw_token is None:
+            return super().get_validated_token(raw_token)
 
-    def has_permission(self, request, view):
-        provided = request.META.get(self.header_name)
-        expected = getattr(settings, "MINECRAFT_API_KEY", None)
+        cache = get_token_cache()
+        key = hashlib.sha256(raw_token.encode() if isinstance(raw_token, str) else raw_token).digest()
+        validated_token = cache.get(key)
+        if validated_token is MISSING:
+            validated_token = super().get_validated_token(raw_token)
+            remaining = validated_token.get("exp", 0) - time.time()
+            if remaining > 0:
+                cache.set(key, validated_token, ttl=min(remaining, settings.AUTH_TOKEN_CACHE_TTL))
+        elif validated_token.get("exp", 0) <= time.time():
+            # expired between two cache sweeps: let simplejwt reject it properly
+            cache.delete(key)
+            validated_token = super().get_validated_token(raw_token)
+        return validated_token
 
-        if not expected:
-            return False
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        cache = get_user_cache()
+        user = cache.get(str(user_id)) if user_id is not None else MISSING
+        if user is MISSING:
+            user = super().get_user(validated_token)
+            cache.set(str(user_id), user)
+        elif api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            # the active check held when the user was cached; revocation is per token
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        # every request gets its own instance to modify
+        return copy.copy(user)
 
-        if provided is None:
-            return False
 
-        return hmac.compare_digest(provided, expected)
\ No newline at end of file
+def token_language(request) -> str | None:
+    """
+    LANGUAGE_CLAIM of the request's access token (header or cookie), or None
+    without a valid one. Goes through the verified-token cache and never
+    loads the user, so it costs no query.
+    """
+    auth = CookieJWTAuthentication()
+    try:
+        header = auth.get_header(request)
+        raw_token = request.COOKIES.get("access_token") if header is None else auth.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return auth.get_validated_token(raw_token).get(LANGUAGE_CLAIM)
+    except (AuthenticationFailed, TokenError):
+        # a bad token is the view's business; the language just falls back
+        return None
@@ -0,0 +1,131 @@
+"""
+PBKDF2 password hashing off the request thread.
+
+A hash costs PASSWORD_HASH_ITERATIONS rounds of HMAC-SHA256 (hundreds of
+milliseconds of CPU). Run inline, a login wave after a restart keeps every
+worker busy hashing. PooledPBKDF2PasswordHasher instead sends the PBKDF2
+core to a per-process pool of PASSWORD_HASH_WORKERS processes. At most
+PASSWORD_HASH_QUEUE more hashes may wait for the pool; past that,
+HashingOverloaded is raised and HashingOverloadedMiddleware answers 503 at
+once instead of queueing.
+
+Same algorithm name and format as Django's PBKDF2PasswordHasher, so
+existing hashes keep verifying. Pick the iteration count for the host with
+`python manage.py calibrate_password_hasher`. Bulk jobs (import_users)
+hash on a pool of their own through encode_many().
+"""
+import base64
+import multiprocessing
+import threading
+from collections.abc import Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.utils.encoding import force_bytes
+
+from .kdf import pbkdf2
+
+
+class HashingOverloaded(Exception):
+    """More password hashes in flight than the pool and its queue allow."""
+
+
+_pool: ProcessPoolExecutor | None = None
+_slots: threading.BoundedSemaphore | None = None
+_lock = threading.Lock()
+
+
+def new_pool(workers: int) -> ProcessPoolExecutor:
+    # not fork: a forked copy of a threaded server process can inherit held locks
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+
+
+def _get_pool() -> ProcessPoolExecutor | None:
+    global _pool
+    if settings.PASSWORD_HASH_WORKERS <= 0:
+        return None
+    with _lock:
+        if _pool is None:
+            _pool = new_pool(settings.PASSWORD_HASH_WORKERS)
+        return _pool
+
+
+def _get_slots() -> threading.BoundedSemaphore:
+    global _slots
+    with _lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(max(settings.PASSWORD_HASH_WORKERS, 1) + settings.PASSWORD_HASH_QUEUE)
+        return _slots
+
+
+def _discard_pool(broken: ProcessPoolExecutor) -> None:
+    global _pool
+    with _lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def run_pbkdf2(password: bytes, salt: bytes, iterations: int, digest: str) -> bytes:
+    """PBKDF2 in the pool (inline with PASSWORD_HASH_WORKERS=0); raises HashingOverloaded when full."""
+    slots = _get_slots()
+    if not slots.acquire(blocking=False):
+        raise HashingOverloaded
+    try:
+        pool = _get_pool()
+        if pool is None:
+            return pbkdf2(password, salt, iterations, digest)
+        try:
+            return pool.submit(pbkdf2, password, salt, iterations, digest).result()
+        except BrokenProcessPool:
+            # a pool process died (OOM killer...): answer this one inline, rebuild next time
+            _discard_pool(pool)
+            return pbkdf2(password, salt, iterations, digest)
+    finally:
+        slots.release()
+
+
+def reset() -> None:
+    """Drop the pool and the queue limit (tests, or after changing the settings)."""
+    global _pool, _slots
+    with _lock:
+        pool, _pool, _slots = _pool, None, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2PasswordHasher whose key derivation runs in the hashing pool."""
+
+    @property
+    def iterations(self):
+        # hashes made with another count are upgraded on the next login (must_update)
+        return settings.PASSWORD_HASH_ITERATIONS or PBKDF2PasswordHasher.iterations
+
+    def encode(self, password, salt, iterations=None):
+        self._check_encode_args(password, salt)
+        iterations = iterations or self.iterations
+        hash = run_pbkdf2(force_bytes(password), force_bytes(salt), iterations, self.digest().name)
+        return self.format(salt, iterations, hash)
+
+    def format(self, salt: str, iterations: int, derived: bytes) -> str:
+        hash = base64.b64encode(derived).decode("ascii").strip()
+        return "%s$%d$%s$%s" % (self.algorithm, iterations, salt, hash)
+
+
+def encode_many(passwords: list[str], executor: Executor | None = None, chunksize: int = 16) -> Iterator[str]:
+    """
+    Hash `passwords` on `executor` (inline without one), bypassing the request
+    queue limit. The work is submitted right away; the encoded hashes come
+    out in order as they are consumed.
+    """
+    hasher = PooledPBKDF2PasswordHasher()
+    iterations, digest = hasher.iterations, hasher.digest().name
+    salts = [hasher.salt() for _ in passwords]
+    args = ([force_bytes(p) for p in passwords], [force_bytes(s) for s in salts], repeat(iterations), repeat(digest))
+    derived = executor.map(pbkdf2, *args, chunksize=chunksize) if executor is not None else map(pbkdf2, *args)
+    return (hasher.format(salt, iterations, hash) for salt, hash in zip(salts, derived))
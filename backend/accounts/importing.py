@@ -0,0 +1,306 @@
+"""
+Bulk user import, the engine behind `python manage.py import_users`.
+
+Rows come from CSV or NDJSON and are written a chunk at a time: one short
+transaction per chunk, made of a few bulk INSERTs (users, then the burnt
+tokens and accounts of rows that bring Minecraft accounts along). Usernames,
+emails, nicknames and uuids that are already taken (case-insensitively, as
+the unique indexes see them) are skipped rather than failing the chunk, so
+replaying a committed chunk after a crash is harmless.
+
+Row fields (CSV header / NDJSON keys):
+
+    username            required
+    email               optional
+    password            plain text, hashed on import
+    password_hash       an already encoded Django hash, kept as is
+    first_name, last_name, preferred_language, slots
+    minecraft_accounts  `nickname[:uuid]` entries separated by `;`
+                        (NDJSON may also give a list of {"nickname", "uuid"})
+
+A row without a password gets an unusable one (password reset only).
+"""
+import csv
+import json
+import re
+import secrets
+import uuid
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Lower, NullIf
+
+from minecraft.availability import remember_taken
+from minecraft.changes import record_changes
+from minecraft.handshake import invalidate_handshake
+from minecraft.models import NICKNAME_PATTERN, AccountChange, MinecraftAccount, NicknameLease
+from .models import GameToken, User
+
+FORMATS = ("csv", "ndjson")
+
+_NICKNAME_RE = re.compile(NICKNAME_PATTERN)
+_LANGUAGES = set(User.LanguageChoices.values)
+
+
+class RowError(ValueError):
+    """The row can't be imported; the message says why."""
+
+
+@dataclass
+class ImportRow:
+    username: str
+    email: str = ""
+    password: str | None = None
+    password_hash: str | None = None
+    first_name: str = ""
+    last_name: str = ""
+    preferred_language: str = User.LanguageChoices.ENGLISH
+    slots: int = 1
+    # (nickname, uuid or None)
+    accounts: list[tuple[str, str | None]] = field(default_factory=list)
+
+
+@dataclass
+class ChunkResult:
+    users: int = 0
+    accounts: int = 0
+    # rows / accounts left out because the name (or email, uuid) is already taken
+    taken: int = 0
+    accounts_taken: int = 0
+
+
+def read_rows(stream, fmt: str) -> Iterator[dict | str]:
+    """Raw records: dicts for CSV, undecoded lines for NDJSON (blank lines don't count)."""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield line
+
+
+def parse_row(raw: dict | str) -> ImportRow:
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            raise RowError("not valid JSON")
+        if not isinstance(raw, dict):
+            raise RowError("not a JSON object")
+
+    def text(key):
+        value = raw.get(key)
+        return "" if value is None else str(value).strip()
+
+    username = text("username")
+    if not username or len(username) > User._meta.get_field("username").max_length:
+        raise RowError("missing or too long username")
+    try:
+        User.username_validator(username)
+    except ValidationError:
+        raise RowError(f"invalid username {username!r}")
+
+    email = text("email")
+    if email:
+        try:
+            validate_email(email)
+        except ValidationError:
+            raise RowError(f"invalid email {email!r}")
+
+    password_hash = text("password_hash") or None
+    if password_hash:
+        try:
+            identify_hasher(password_hash)
+        except ValueError:
+            raise RowError("password_hash is not a hash this site can verify")
+
+    # not stripped: surrounding spaces may be part of it
+    password = raw.get("password")
+    password = str(password) if password not in (None, "") else None
+
+    language = text("preferred_language") or User.LanguageChoices.ENGLISH
+    if language not in _LANGUAGES:
+        raise RowError(f"unknown preferred_language {language!r}")
+
+    accounts = _parse_accounts(raw.get("minecraft_accounts"))
+    slots = text("slots")
+    try:
+        slots = int(slots) if slots else 1
+    except ValueError:
+        raise RowError(f"invalid slots {slots!r}")
+    if slots < 0:
+        raise RowError(f"invalid slots {slots!r}")
+
+    return ImportRow(
+        username=username,
+        email=email,
+        password=None if password_hash else password,
+        password_hash=password_hash,
+        first_name=text("first_name")[:150],
+        last_name=text("last_name")[:150],
+        preferred_language=language,
+        # every imported account burns a token, and tokens count against slots
+        slots=max(slots, len(accounts)),
+        accounts=accounts,
+    )
+
+
+def _parse_accounts(value) -> list[tuple[str, str | None]]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        entries = [entry.strip().partition(":")[::2] for entry in value.split(";") if entry.strip()]
+    elif isinstance(value, list) and all(isinstance(entry, dict) for entry in value):
+        entries = [(str(entry.get("nickname") or ""), str(entry.get("uuid") or "")) for entry in value]
+    else:
+        raise RowError("minecraft_accounts must be `nickname[:uuid];...` or a list of objects")
+
+    accounts = []
+    for nickname, raw_uuid in entries:
+        nickname, raw_uuid = nickname.strip(), raw_uuid.strip()
+        if not _NICKNAME_RE.fullmatch(nickname):
+            raise RowError(f"invalid Minecraft nickname {nickname!r}")
+        try:
+            account_uuid = str(uuid.UUID(raw_uuid)) if raw_uuid else None
+        except ValueError:
+            raise RowError(f"invalid uuid {raw_uuid!r}")
+        accounts.append((nickname, account_uuid))
+    return accounts
+
+
+def drop_taken(rows: Iterable[ImportRow]) -> tuple[list[ImportRow], int]:
+    """
+    Leave out rows whose username or email is taken, in the database or by
+    an earlier row of `rows`. Two queries, whatever the number of rows.
+    """
+    rows = list(rows)
+    names = set(
+        User.objects.annotate(username_ci=Lower("username"))
+        .filter(username_ci__in={row.username.lower() for row in rows})
+        .values_list("username_ci", flat=True)
+    )
+    emails = set(
+        # the expression of the email index, so the lookup can use it
+        User.objects.annotate(email_ci=NullIf(Lower("email"), Value("")))
+        .filter(email_ci__in={row.email.lower() for row in rows if row.email})
+        .values_list("email_ci", flat=True)
+    )
+
+    kept = []
+    for row in rows:
+        name, email = row.username.lower(), row.email.lower()
+        if name in names or (email and email in emails):
+            continue
+        names.add(name)
+        if email:
+            emails.add(email)
+        kept.append(row)
+    return kept, len(rows) - len(kept)
+
+
+def _drop_taken_accounts(rows: list[ImportRow]) -> int:
+    """Strip accounts whose nickname or uuid is taken from `rows`; returns how many."""
+    requested = [account for row in rows for account in row.accounts]
+    if not requested:
+        return 0
+    nicknames = {
+        nickname.lower()
+        for nickname in MinecraftAccount.objects
+        .nicknamed(*{nickname for nickname, _uuid in requested})
+        .values_list("nickname", flat=True)
+    }
+    uuids = set(
+        MinecraftAccount.objects
+        .filter(uuid__in={account_uuid for _nickname, account_uuid in requested if account_uuid})
+        .values_list("uuid", flat=True)
+    )
+
+    dropped = 0
+    for row in rows:
+        kept = []
+        for nickname, account_uuid in row.accounts:
+            if nickname.lower() in nicknames or (account_uuid and account_uuid in uuids):
+                dropped += 1
+                continue
+            nicknames.add(nickname.lower())
+            if account_uuid:
+                uuids.add(account_uuid)
+            kept.append((nickname, account_uuid))
+        row.accounts = kept
+    return dropped
+
+
+def write_chunk(rows: list[ImportRow], hashes: Iterator[str]) -> ChunkResult:
+    """
+    Insert `rows` in one transaction. `hashes` yields the encoded passwords
+    of the rows that carry a plain `password`, in order.
+
+    Rows taken since `drop_taken` ran (earlier chunks, parallel signups)
+    are skipped here too; an IntegrityError means a signup won a race
+    inside this very transaction, and nothing was written.
+    """
+    for row in rows:
+        if row.password is not None:
+            row.password_hash, row.password = next(hashes), None
+        elif row.password_hash is None:
+            row.password_hash = make_password(None)
+
+    result = ChunkResult()
+    with transaction.atomic():
+        rows, result.taken = drop_taken(rows)
+        result.accounts_taken = _drop_taken_accounts(rows)
+
+        User.objects.bulk_create([
+            User(
+                username=row.username,
+                email=row.email,
+                password=row.password_hash,
+                first_name=row.first_name,
+                last_name=row.last_name,
+                preferred_language=row.preferred_language,
+                slots=row.slots,
+            )
+            for row in rows
+        ])
+        result.users = len(rows)
+
+        owned = [row for row in rows if row.accounts]
+        if owned:
+            result.accounts = _create_accounts(owned)
+    return result
+
+
+def _create_accounts(rows: list[ImportRow]) -> int:
+    # MySQL can't return ids from a bulk insert: read the rows back
+    user_ids = dict(User.objects.filter(username__in=[row.username for row in rows]).values_list("username", "id"))
+
+    accounts = [
+        (user_ids[row.username], secrets.token_urlsafe(16), nickname, account_uuid)
+        for row in rows
+        for nickname, account_uuid in row.accounts
+    ]
+    # imported accounts are linked already: their tokens are born burnt
+    GameToken.objects.bulk_create([
+        GameToken(user_id=user_id, value=value, is_active=False) for user_id, value, _nickname, _uuid in accounts
+    ])
+    values = [value for _user_id, value, _nickname, _uuid in accounts]
+    token_ids = dict(GameToken.objects.filter(value__in=values).values_list("value", "id"))
+
+    MinecraftAccount.objects.bulk_create([
+        MinecraftAccount(owner_id=user_id, token_id=token_ids[value], nickname=nickname, uuid=account_uuid)
+        for user_id, value, nickname, account_uuid in accounts
+    ])
+    nicknames = [nickname for _user_id, _value, nickname, _uuid in accounts]
+    NicknameLease.objects.filter(nickname__in=nicknames).delete()
+    # bulk_create skips post_save, so feed the availability index, handshake cache and change feed ourselves
+    transaction.on_commit(lambda: remember_taken(nicknames))
+    invalidate_handshake(uuids=[account_uuid for _user_id, _value, _nickname, account_uuid in accounts])
+    record_changes(
+        MinecraftAccount.objects.filter(token_id__in=token_ids.values()).order_by("id"), AccountChange.CREATED,
+    )
+    return len(accounts)
@@ -0,0 +1,13 @@
+"""
+The PBKDF2 core the hashing pool runs.
+
+Kept free of Django (and of anything that imports it): pool processes
+unpickle `pbkdf2` by importing this module, and should not pay for loading
+settings and the app registry to derive a key.
+"""
+import hashlib
+
+
+def pbkdf2(password: bytes, salt: bytes, iterations: int, digest: str) -> bytes:
+    """django.utils.crypto.pbkdf2 without Django."""
+    return hashlib.pbkdf2_hmac(digest, password, salt, iterations)
@@ -0,0 +1,59 @@
+import os
+import secrets
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.hashing import PooledPBKDF2PasswordHasher
+from accounts.kdf import pbkdf2
+
+_PROBE_ITERATIONS = 100_000
+
+
+def time_pbkdf2(iterations: int, samples: int) -> float:
+    """Median milliseconds of one PBKDF2-SHA256 derivation on this host."""
+    timings = []
+    for _ in range(samples):
+        password, salt = secrets.token_bytes(16), secrets.token_bytes(16)
+        started = time.perf_counter()
+        pbkdf2(password, salt, iterations, "sha256")
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure PBKDF2 on this host and print the PASSWORD_HASH_ITERATIONS that makes one "
+        "password hash take about --target-ms, with the login throughput it allows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target-ms", type=float, default=250, help="Wanted time per hash (default 250).")
+        parser.add_argument("--samples", type=int, default=5, help="Timed runs per measurement (default 5).")
+
+    def handle(self, *args, **options):
+        target, samples = options["target_ms"], options["samples"]
+        if target <= 0 or samples <= 0:
+            raise CommandError("--target-ms and --samples must be positive.")
+
+        current = PooledPBKDF2PasswordHasher().iterations
+        self.stdout.write(f"[INFO] current: {current} iterations, {time_pbkdf2(current, samples):.0f} ms per hash")
+
+        per_ms = _PROBE_ITERATIONS / time_pbkdf2(_PROBE_ITERATIONS, samples)
+        recommended = max(10_000, int(round(target * per_ms, -4)))
+        measured = time_pbkdf2(recommended, samples)
+
+        workers = max(settings.PASSWORD_HASH_WORKERS, 1)
+        self.stdout.write(self.style.SUCCESS(
+            f"[INFO] PASSWORD_HASH_ITERATIONS={recommended} ({measured:.0f} ms per hash, "
+            f"~{workers * 1000 / measured:.1f} logins/s per web worker with {workers} pool process(es); "
+            f"{os.cpu_count()} CPUs on this host)"
+        ))
+        if recommended < PBKDF2PasswordHasher.iterations:
+            self.stdout.write(self.style.WARNING(
+                f"[WARN] below Django's default of {PBKDF2PasswordHasher.iterations}: prefer more "
+                "PASSWORD_HASH_WORKERS (or a larger target) over weaker hashes"
+            ))
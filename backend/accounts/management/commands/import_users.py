@@ -0,0 +1,132 @@
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from accounts.hashing import encode_many, new_pool
+from accounts.importing import FORMATS, RowError, drop_taken, parse_row, read_rows, write_chunk
+
+
+def read_checkpoint(path: str) -> int:
+    try:
+        with open(path) as f:
+            return int(json.load(f)["rows"])
+    except FileNotFoundError:
+        return 0
+    except (ValueError, KeyError, TypeError):
+        raise CommandError(f"Unreadable checkpoint {path}; delete it to start over.")
+
+
+def write_checkpoint(path: str, rows: int) -> None:
+    # replace, never rewrite in place: a crash mid-write must leave the previous one
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"rows": rows}, f)
+    os.replace(tmp, path)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import users (optionally with slots and their existing Minecraft accounts) from a CSV or NDJSON "
+        "file, in bulk-inserted chunks. Progress is checkpointed after every chunk; running the same "
+        "command again resumes after the last committed one."
+    )
+
+    # tries per chunk before giving up on one that keeps losing races to live signups
+    write_attempts = 3
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or NDJSON file, `-` for stdin (requires --format).")
+        parser.add_argument("--format", choices=FORMATS, help="Input format (default: from the file extension).")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Rows per transaction (default 1000).")
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Password hashing processes (default: one per CPU; 0 hashes inline).",
+        )
+        parser.add_argument("--checkpoint", help="Checkpoint file (default: <path>.checkpoint).")
+
+    def handle(self, *args, **options):
+        path, chunk_size, workers = options["path"], options["chunk_size"], options["workers"]
+        fmt = options["format"] or {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}.get(
+            os.path.splitext(path)[1].lower()
+        )
+        if fmt is None:
+            raise CommandError("Can't tell the format from the file name; pass --format.")
+        if chunk_size <= 0 or workers < 0:
+            raise CommandError("--chunk-size must be positive and --workers not negative.")
+        checkpoint = options["checkpoint"] or (None if path == "-" else f"{path}.checkpoint")
+
+        done = read_checkpoint(checkpoint) if checkpoint else 0
+        if done:
+            self.stdout.write(f"[INFO] resuming after row {done} (checkpoint {checkpoint})")
+
+        pool = new_pool(workers) if workers else None
+        stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8-sig")
+        try:
+            self.import_rows(read_rows(stream, fmt), done, chunk_size, pool, checkpoint)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    def import_rows(self, raw_rows, done, chunk_size, pool, checkpoint):
+        self.totals = dict(users=0, accounts=0, taken=0, accounts_taken=0, rejected=0)
+        self.started, self.start_row = time.perf_counter(), done
+        raw_rows = islice(raw_rows, done, None)
+
+        # hash chunk N+1 in the pool while chunk N is being written
+        pending = None
+        while True:
+            raw_chunk = list(islice(raw_rows, chunk_size))
+            if raw_chunk:
+                rows = []
+                for number, raw in enumerate(raw_chunk, start=done + 1):
+                    try:
+                        rows.append(parse_row(raw))
+                    except RowError as e:
+                        self.totals["rejected"] += 1
+                        self.stderr.write(f"[WARN] row {number}: {e}")
+                rows, taken = drop_taken(rows)
+                self.totals["taken"] += taken
+                hashes = encode_many([row.password for row in rows if row.password is not None], pool)
+                done += len(raw_chunk)
+            if pending is not None:
+                self.commit_chunk(*pending, checkpoint)
+            if not raw_chunk:
+                break
+            pending = rows, hashes, done
+
+        elapsed = time.perf_counter() - self.started
+        totals = self.totals
+        self.stdout.write(self.style.SUCCESS(
+            f"[INFO] imported {totals['users']} user(s) and {totals['accounts']} Minecraft account(s) "
+            f"from {done - self.start_row} row(s) in {elapsed:.1f}s; skipped {totals['taken']} taken user(s), "
+            f"{totals['accounts_taken']} taken account(s) and {totals['rejected']} invalid row(s)"
+        ))
+
+    def commit_chunk(self, rows, hashes, done, checkpoint):
+        for attempt in range(1, self.write_attempts + 1):
+            try:
+                result = write_chunk(rows, hashes)
+                break
+            except IntegrityError as e:
+                # a live signup took one of the names mid-chunk; the retry skips it
+                if attempt == self.write_attempts:
+                    raise CommandError(f"Chunk ending at row {done} keeps conflicting: {e}")
+
+        for key in ("users", "accounts", "taken", "accounts_taken"):
+            self.totals[key] += getattr(result, key)
+        if checkpoint:
+            write_checkpoint(checkpoint, done)
+
+        rows_done = done - self.start_row
+        rate = rows_done / max(time.perf_counter() - self.started, 1e-9)
+        self.stdout.write(
+            f"[INFO] row {done}: {self.totals['users']} user(s), {self.totals['accounts']} account(s) "
+            f"imported, {rate:.0f} rows/s"
+        )
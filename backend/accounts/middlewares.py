@@ -0,0 +1,36 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import JsonResponse
+from django.utils.translation import gettext as _
+
+from .hashing import HashingOverloaded
+
+
+class HashingOverloadedMiddleware:
+    """
+    Answers 503 with Retry-After when a request could not get a password hash
+    (HashingOverloaded), wherever the hash was needed: token/, registration,
+    the admin login, a password change. The client should retry shortly;
+    queueing it would only tie up the worker.
+
+    Sync and async capable, so async views under ASGI don't pay a thread hop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        # under ASGI this hands back the coroutine for the caller to await
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, HashingOverloaded):
+            return None
+        return JsonResponse(
+            {"detail": _("Too many sign-ins at once, please try again in a moment.")},
+            status=503,
+            headers={"Retry-After": "1"},
+        )
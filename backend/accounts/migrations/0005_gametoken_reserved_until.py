@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_slots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gametoken',
+            name='reserved_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
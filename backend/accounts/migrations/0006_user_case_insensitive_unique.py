@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:12
+
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_case_duplicates(apps, schema_editor):
+    """Name the clashing users instead of failing on an anonymous IntegrityError."""
+    User = apps.get_model("accounts", "User")
+    problems = []
+    for field in ("username", "email"):
+        clashes = list(
+            User.objects
+            .exclude(**{field: ""})
+            .values(value=Lower(field))
+            .annotate(users=Count("id"))
+            .filter(users__gt=1)
+            .values_list("value", flat=True)[:20]
+        )
+        if clashes:
+            problems.append(f"{field}: {', '.join(clashes)}")
+    if problems:
+        raise RuntimeError(
+            "Users differing only in case must be merged or renamed before the case-insensitive "
+            f"unique constraints can be added (up to 20 per field shown): {'; '.join(problems)}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_gametoken_reserved_until'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_case_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('username'), name='accounts_user_username_ci_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.NullIf(django.db.models.functions.text.Lower('email'), models.Value('')), name='accounts_user_email_ci_unique'),
+        ),
+    ]
@@ -1,6 +1,12 @@
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Lower, NullIf
 from django.contrib.auth.models import AbstractUser
 
+# names appear in IntegrityError messages, see UserRegistrationSerializer.create()
+USERNAME_CI_CONSTRAINT = "accounts_user_username_ci_unique"
+EMAIL_CI_CONSTRAINT = "accounts_user_email_ci_unique"
+
 class User(AbstractUser):
     class LanguageChoices(models.TextChoices):
         ENGLISH = "en", "English"
@@ -8,7 +14,14 @@ class User(AbstractUser):
 
     preferred_language = models.CharField(max_length=10, choices=LanguageChoices.choices, default=LanguageChoices.ENGLISH)
     slots = models.PositiveIntegerField(default=1) # VALUE TO INDICATE HOW MANY TOKENS THE USER CAN HAVE
-    
+
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            models.UniqueConstraint(Lower("username"), name=USERNAME_CI_CONSTRAINT),
+            # blank emails (createsuperuser allows them) become NULL, which never collides
+            models.UniqueConstraint(NullIf(Lower("email"), Value("")), name=EMAIL_CI_CONSTRAINT),
+        ]
+
     def __str__(self):
         return self.username
     
@@ -18,6 +31,7 @@ class GameToken(models.Model):
     value = models.CharField(max_length=64, unique=True, db_index=True)
     generated_at = models.DateTimeField(auto_now_add=True, editable=False)
     is_active = models.BooleanField(default=True) # VALUE TO REVEAL IF IT IS ALREADY USED OR NOT
+    reserved_until = models.DateTimeField(blank=True, null=True) # SET WHILE A LINK-TOKEN REQUEST IS PICKING A NICKNAME FOR IT
 
     def __str__(self):
         return f"{self.user}'s Token #{self.id}"
\ No newline at end of file
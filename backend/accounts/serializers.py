@@ -1,8 +1,15 @@
-from rest_framework.validators import UniqueValidator
 from django.utils.translation import gettext_lazy as _
 from django.utils.translation import gettext
 from rest_framework import serializers
-from .models import User, GameToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from .auth import LANGUAGE_CLAIM
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Lower, NullIf
+from infrastructure.db import violated_unique
+from .models import EMAIL_CI_CONSTRAINT, USERNAME_CI_CONSTRAINT, User, GameToken
 
 
 
@@ -20,8 +27,24 @@ class MeSerializer(serializers.ModelSerializer):
     
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
-    email = serializers.EmailField(required=True, validators=[UniqueValidator(queryset=User.objects.all(), message=_("Email is already in use."))])
-    username = serializers.CharField(required=True, validators=[UniqueValidator(queryset=User.objects.all(), message=_("Username is taken."))])
+    """
+    Uniqueness is case-insensitive (see User.Meta.constraints). validate()
+    turns duplicates away with one SELECT through those indexes, before the
+    password is hashed for nothing; the INSERT still has the last word, and
+    an IntegrityError from a concurrent sign-up is mapped to the same errors.
+    """
+    USERNAME_TAKEN = _("Username is taken.")
+    EMAIL_TAKEN = _("Email is already in use.")
+    # violated_unique() name -> field, error
+    UNIQUE_VIOLATIONS = {
+        EMAIL_CI_CONSTRAINT: ("email", EMAIL_TAKEN),
+        USERNAME_CI_CONSTRAINT: ("username", USERNAME_TAKEN),
+        # the column's own unique index
+        "username": ("username", USERNAME_TAKEN),
+    }
+
+    email = serializers.EmailField(required=True)
+    username = serializers.CharField(required=True)
     password = serializers.CharField(write_only=True, min_length=8)
     password2 = serializers.CharField(write_only=True, label="Confirm password")
 
@@ -33,13 +56,42 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         if attrs["password"] != attrs["password2"]:
             raise serializers.ValidationError({"password2": gettext("Passwords do not match.")})
         attrs.pop("password2", None)
+        self.reject_taken(attrs["username"], attrs["email"])
         return attrs
 
+    def reject_taken(self, username, email):
+        username, email = username.lower(), email.lower()
+        taken = (
+            User.objects
+            .alias(username_ci=Lower("username"), email_ci=NullIf(Lower("email"), Value("")))
+            .filter(Q(username_ci=username) | Q(email_ci=email))
+            .values_list("username", "email")
+        )
+        errors = {}
+        for taken_username, taken_email in taken:
+            if taken_username.lower() == username:
+                errors["username"] = [self.USERNAME_TAKEN]
+            if taken_email.lower() == email:
+                errors["email"] = [self.EMAIL_TAKEN]
+        if errors:
+            raise serializers.ValidationError(errors)
+
     def create(self, validated_data):
         password = validated_data.pop("password")
         user = User(**validated_data)
+        # hashed before the write, so no transaction is open meanwhile
         user.set_password(password)
-        user.save()
+        try:
+            # savepoint: the failed INSERT must not break an outer transaction
+            with transaction.atomic():
+                user.save()
+        except IntegrityError as exc:
+            # another sign-up took the name or email since validate()
+            violation = self.UNIQUE_VIOLATIONS.get(violated_unique(exc, User))
+            if violation is None:
+                raise
+            field, error = violation
+            raise serializers.ValidationError({field: [error]}) from exc
         return user
     
 
@@ -58,4 +110,33 @@ class GameTokenSerializer(serializers.ModelSerializer):
         raise serializers.ValidationError(gettext("GameTokenSerializer is read-only."))
 
     def update(self, instance, validated_data):
-        raise serializers.ValidationError(gettext("GameTokenSerializer is read-only."))
\ No newline at end of file
+        raise serializers.ValidationError(gettext("GameTokenSerializer is read-only."))
+
+
+class LanguageTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Token pair carrying the user's preferred_language (LANGUAGE_CLAIM)."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        # copied into every access token minted from this refresh token
+        token[LANGUAGE_CLAIM] = user.preferred_language
+        return token
+
+
+class LanguageTokenRefreshSerializer(TokenRefreshSerializer):
+    """Re-reads preferred_language, so a changed preference reaches the next access token."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data["access"])
+        language = (
+            User.objects
+            .filter(**{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM]})
+            .values_list("preferred_language", flat=True)
+            .first()
+        )
+        if language is not None and language != access.get(LANGUAGE_CLAIM):
+            access[LANGUAGE_CLAIM] = language
+            data["access"] = str(access)
+        return data
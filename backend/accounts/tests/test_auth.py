@@ -0,0 +1,89 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.auth import CookieJWTAuthentication, get_token_cache, get_user_cache
+from .factories import UserFactory
+
+
+class CookieJWTAuthenticationCacheTests(TestCase):
+    def setUp(self):
+        get_token_cache().clear()
+        get_user_cache().clear()
+        self.factory = APIRequestFactory()
+        self.auth = CookieJWTAuthentication()
+        self.user = UserFactory()
+
+    def authenticate(self, token):
+        request = self.factory.get("/fake-endpoint", HTTP_AUTHORIZATION=f"Bearer {token}")
+        return self.auth.authenticate(request)
+
+    def test_repeated_token_costs_no_queries(self):
+        token = str(AccessToken.for_user(self.user))
+        with self.assertNumQueries(1):
+            self.authenticate(token)
+
+        with self.assertNumQueries(0):
+            user, validated = self.authenticate(token)
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(validated["user_id"], str(self.user.pk))
+
+    def test_cookie_token_shares_the_cache(self):
+        token = str(AccessToken.for_user(self.user))
+        self.authenticate(token)
+
+        request = self.factory.get("/fake-endpoint")
+        request.COOKIES["access_token"] = token
+        with self.assertNumQueries(0):
+            user, _validated = self.auth.authenticate(request)
+
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_each_request_gets_its_own_user_instance(self):
+        token = str(AccessToken.for_user(self.user))
+
+        first, _validated = self.authenticate(token)
+        first.first_name = "Changed"
+        second, _validated = self.authenticate(token)
+
+        self.assertIsNot(first, second)
+        self.assertNotEqual(second.first_name, "Changed")
+
+    def test_saving_the_user_drops_it(self):
+        token = str(AccessToken.for_user(self.user))
+        self.authenticate(token)
+
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_deleting_the_user_drops_it(self):
+        token = str(AccessToken.for_user(self.user))
+        self.authenticate(token)
+
+        self.user.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_expired_tokens_are_not_cached(self):
+        token = AccessToken.for_user(self.user)
+        token.set_exp(lifetime=-timedelta(seconds=1))
+
+        with self.assertRaises(InvalidToken):
+            self.authenticate(str(token))
+        self.assertEqual(len(get_token_cache()), 0)
+
+    def test_forged_token_is_rejected(self):
+        token = str(AccessToken.for_user(self.user))
+        self.authenticate(token)
+
+        with self.assertRaises(InvalidToken):
+            self.authenticate(token[:-2] + ("AA" if not token.endswith("AA") else "BB"))
@@ -0,0 +1,108 @@
+import subprocess
+import sys
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password, identify_hasher, make_password
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from accounts import hashing
+from accounts.hashing import HashingOverloaded, PooledPBKDF2PasswordHasher
+from accounts.models import User
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class PooledHasherTests(SimpleTestCase):
+    def setUp(self):
+        hashing.reset()
+        self.addCleanup(hashing.reset)
+
+    @override_settings(PASSWORD_HASH_WORKERS=1)
+    def test_pool_output_matches_djangos_hasher(self):
+        pooled = PooledPBKDF2PasswordHasher().encode("s3cret-pass", "somesalt")
+
+        self.assertEqual(pooled, PBKDF2PasswordHasher().encode("s3cret-pass", "somesalt", 1000))
+
+    @override_settings(PASSWORD_HASH_WORKERS=0)
+    def test_existing_django_hashes_still_verify(self):
+        encoded = PBKDF2PasswordHasher().encode("s3cret-pass", "somesalt", 2000)
+
+        self.assertIsInstance(identify_hasher(encoded), PooledPBKDF2PasswordHasher)
+        self.assertTrue(check_password("s3cret-pass", encoded))
+        self.assertFalse(check_password("wrong-pass", encoded))
+
+    @override_settings(PASSWORD_HASH_WORKERS=0)
+    def test_other_iteration_counts_are_upgraded(self):
+        encoded = make_password("s3cret-pass")
+
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertTrue(PooledPBKDF2PasswordHasher().must_update(encoded))
+        self.assertFalse(PooledPBKDF2PasswordHasher().must_update(encoded))
+
+    def test_pool_processes_do_not_load_django(self):
+        # what a pool process imports to unpickle the task
+        probe = "import sys, accounts.kdf; print('django' in sys.modules)"
+        out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+
+        self.assertEqual(out.stdout.strip(), "False")
+        self.assertEqual(hashing.pbkdf2.__module__, "accounts.kdf")
+
+    @override_settings(PASSWORD_HASH_WORKERS=0, PASSWORD_HASH_QUEUE=0)
+    def test_full_queue_fails_fast(self):
+        slots = hashing._get_slots()
+        slots.acquire()  # the one allowed hash is in flight
+        try:
+            with self.assertRaises(HashingOverloaded):
+                make_password("s3cret-pass")
+        finally:
+            slots.release()
+
+        self.assertTrue(make_password("s3cret-pass").startswith("pbkdf2_sha256$1000$"))
+
+
+class HashingOverloadedViewTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="player1", password="supersecret123")
+
+    @patch("accounts.hashing.run_pbkdf2", side_effect=HashingOverloaded)
+    def test_login_answers_503(self, _run):
+        res = self.client.post(
+            reverse("token_obtain_pair"), {"username": "player1", "password": "supersecret123"}, format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res["Retry-After"], "1")
+        self.assertNotIn("access_token", res.cookies)
+
+    @patch("accounts.hashing.run_pbkdf2", side_effect=HashingOverloaded)
+    def test_registration_answers_503_without_creating_the_user(self, _run):
+        res = self.client.post(reverse("me"), {
+            "username": "player2",
+            "email": "player2@example.com",
+            "password": "supersecret123",
+            "password2": "supersecret123",
+        }, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(User.objects.filter(username="player2").exists())
+
+    @patch("accounts.hashing.run_pbkdf2", side_effect=HashingOverloaded)
+    def test_admin_login_answers_503(self, _run):
+        res = self.client.post("/admin/login/", {"username": "player1", "password": "supersecret123"})
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res["Retry-After"], "1")
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=10_000)
+class CalibratePasswordHasherCommandTests(TestCase):
+    def test_prints_a_recommendation(self):
+        out = StringIO()
+
+        call_command("calibrate_password_hasher", target_ms=5, samples=1, stdout=out)
+
+        self.assertIn("PASSWORD_HASH_ITERATIONS=", out.getvalue())
@@ -0,0 +1,161 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from accounts.importing import RowError, parse_row, write_chunk
+from accounts.models import GameToken, User
+from minecraft.models import AccountChange, MinecraftAccount
+from .factories import UserFactory
+
+UUID_1 = "0f6d5c3e-8a3b-4bde-9d5c-6a1e2b3c4d5e"
+UUID_2 = "1a2b3c4d-5e6f-4a1b-8c2d-3e4f5a6b7c8d"
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class ImportUsersCommandTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.dir.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def import_users(self, path, **options):
+        out, err = StringIO(), StringIO()
+        options.setdefault("workers", 0)
+        call_command("import_users", path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_rows_become_users_with_accounts(self):
+        path = self.write_file("users.csv", (
+            "username,email,password,first_name,preferred_language,slots,minecraft_accounts\n"
+            f"alice,alice@example.com,s3cret-pass,Alice,uk,5,Alice_MC:{UUID_1.replace('-', '')}\n"
+            "bob,,another-pass,,,,bob_one;bob_two\n"
+        ))
+
+        out, _err = self.import_users(path, workers=1)
+
+        alice = User.objects.get(username="alice")
+        self.assertTrue(check_password("s3cret-pass", alice.password))
+        self.assertEqual((alice.first_name, alice.preferred_language, alice.slots), ("Alice", "uk", 5))
+        account = MinecraftAccount.objects.get(owner=alice)
+        self.assertEqual((account.nickname, account.uuid), ("Alice_MC", UUID_1))
+        self.assertFalse(account.token.is_active)
+
+        bob = User.objects.get(username="bob")
+        # two accounts burn two tokens, whatever slots said
+        self.assertEqual(bob.slots, 2)
+        self.assertEqual(GameToken.objects.filter(user=bob, is_active=False).count(), 2)
+        self.assertEqual(
+            AccountChange.objects.filter(action=AccountChange.CREATED).count(), MinecraftAccount.objects.count(),
+        )
+        self.assertIn("imported 2 user(s) and 3 Minecraft account(s)", out)
+        self.assertIn("rows/s", out)
+
+    def test_ndjson_keeps_hashes_and_reports_invalid_rows(self):
+        encoded = make_password("from-old-launcher")
+        path = self.write_file("users.ndjson", "\n".join([
+            json.dumps({"username": "carol", "password_hash": encoded,
+                        "minecraft_accounts": [{"nickname": "carol_mc", "uuid": UUID_2}]}),
+            "",
+            "{not json",
+            json.dumps({"username": "dave", "email": "not-an-email"}),
+            json.dumps({"username": "erin", "minecraft_accounts": "bad name!"}),
+            json.dumps({"username": "frank"}),
+        ]) + "\n")
+
+        _out, err = self.import_users(path)
+
+        carol = User.objects.get(username="carol")
+        self.assertEqual(carol.password, encoded)
+        self.assertEqual(MinecraftAccount.objects.get(owner=carol).uuid, UUID_2)
+        self.assertFalse(User.objects.get(username="frank").has_usable_password())
+        self.assertFalse(User.objects.filter(username__in=["dave", "erin"]).exists())
+        self.assertIn("row 2: not valid JSON", err)
+        self.assertIn("row 3: invalid email", err)
+        self.assertIn("row 4: invalid Minecraft nickname", err)
+
+    def test_nicknames_follow_the_account_rule(self):
+        # 1-16 of [A-Za-z0-9_], as migration 0011 left existing accounts
+        row = parse_row({"username": "ivan", "minecraft_accounts": "x;" + "a" * 16})
+        self.assertEqual([nickname for nickname, _uuid in row.accounts], ["x", "a" * 16])
+
+        with self.assertRaises(RowError):
+            parse_row({"username": "ivan", "minecraft_accounts": "a" * 17})
+
+    def test_taken_names_are_skipped_case_insensitively(self):
+        UserFactory(username="Alice", email="alice@example.com")
+        MinecraftAccount.objects.create(
+            owner=UserFactory(), token=GameToken.objects.create(user=UserFactory(), value="tok"), nickname="Taken_Name",
+        )
+        path = self.write_file("users.csv", (
+            "username,email,minecraft_accounts\n"
+            "ALICE,,\n"
+            "mallory,ALICE@example.com,\n"
+            "grace,,taken_name;grace_mc\n"
+            "GRACE,,\n"
+        ))
+
+        out, _err = self.import_users(path)
+
+        self.assertFalse(User.objects.filter(username__in=["ALICE", "mallory", "GRACE"]).exists())
+        grace = User.objects.get(username="grace")
+        self.assertEqual(list(grace.minecraft_accounts.values_list("nickname", flat=True)), ["grace_mc"])
+        self.assertIn("skipped 3 taken user(s), 1 taken account(s)", out)
+
+    def test_interrupted_import_resumes_from_the_checkpoint(self):
+        path = self.write_file("users.csv", "username\n" + "".join(f"user{i}\n" for i in range(5)))
+        calls = []
+
+        def fail_on_second_chunk(rows, hashes):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError("connection lost")
+            return write_chunk(rows, hashes)
+
+        with patch("accounts.management.commands.import_users.write_chunk", side_effect=fail_on_second_chunk):
+            with self.assertRaises(RuntimeError):
+                self.import_users(path, chunk_size=2)
+
+        self.assertEqual(User.objects.count(), 2)
+        with open(f"{path}.checkpoint") as f:
+            self.assertEqual(json.load(f), {"rows": 2})
+
+        out, _err = self.import_users(path, chunk_size=2)
+
+        self.assertIn("resuming after row 2", out)
+        self.assertEqual(sorted(User.objects.values_list("username", flat=True)), [f"user{i}" for i in range(5)])
+        with open(f"{path}.checkpoint") as f:
+            self.assertEqual(json.load(f), {"rows": 5})
+
+    def test_replayed_chunk_is_harmless(self):
+        path = self.write_file("users.csv", "username,minecraft_accounts\nheidi,heidi_mc\n")
+        self.import_users(path, checkpoint=os.path.join(self.dir.name, "first"))
+
+        out, _err = self.import_users(path, checkpoint=os.path.join(self.dir.name, "second"))
+
+        self.assertEqual(User.objects.filter(username="heidi").count(), 1)
+        self.assertEqual(MinecraftAccount.objects.filter(nickname="heidi_mc").count(), 1)
+        self.assertIn("imported 0 user(s)", out)
+
+    def test_chunks_cost_a_fixed_number_of_queries(self):
+        path = self.write_file("users.csv", "username,minecraft_accounts\n" + "".join(
+            f"bulk{i},bulk_mc{i}\n" for i in range(50)
+        ))
+
+        # usernames checked before hashing; then savepoint, usernames again, nicknames, users, user ids,
+        # tokens, token ids, accounts, lease cleanup, change feed read and insert, release
+        # (no emails or uuids in the file: those lookups are skipped)
+        with self.assertNumQueries(13):
+            self.import_users(path, chunk_size=50)
+
+        self.assertEqual(MinecraftAccount.objects.count(), 50)
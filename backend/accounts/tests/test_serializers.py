@@ -1,4 +1,5 @@
 from typing import Dict, Any
+from unittest.mock import patch
 from django.test import TestCase
 from rest_framework import serializers
 from faker import Faker
@@ -141,21 +142,58 @@ class UserRegistrationSerializerTests(TestCase):
         self.assertIn("password2", cm.exception.detail)
         self.assertIn("Passwords do not match.", str(cm.exception.detail["password2"][0]))
 
+    def _save_error(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Duplicates are turned away by validation, before the password is hashed."""
+        ser = UserRegistrationSerializer(data=payload)
+        with patch.object(User, "set_password") as set_password:
+            self.assertFalse(ser.is_valid())
+        set_password.assert_not_called()
+        return ser.errors
+
     def test_duplicate_email_rejected(self) -> None:
         # Collides with `taken@example.com` from setUpTestData
-        payload = self._make_payload(email="taken@example.com")
-        ser = UserRegistrationSerializer(data=payload)
-        self.assertFalse(ser.is_valid())
-        self.assertIn("email", ser.errors)
-        self.assertIn("already in use", ser.errors["email"][0])
+        errors = self._save_error(self._make_payload(email="taken@example.com"))
+        self.assertIn("email", errors)
+        self.assertIn("already in use", errors["email"][0])
+
+    def test_duplicate_email_in_other_case_rejected(self) -> None:
+        errors = self._save_error(self._make_payload(email="Taken@Example.com"))
+        self.assertIn("email", errors)
 
     def test_duplicate_username_rejected(self) -> None:
         # Collides with "takenuser" from setUpTestData
-        payload = self._make_payload(username="takenuser")
-        ser = UserRegistrationSerializer(data=payload)
-        self.assertFalse(ser.is_valid())
-        self.assertIn("username", ser.errors)
-        self.assertIn("taken", ser.errors["username"][0].lower())
+        errors = self._save_error(self._make_payload(username="takenuser"))
+        self.assertIn("username", errors)
+        self.assertIn("taken", errors["username"][0].lower())
+
+    def test_duplicate_username_in_other_case_rejected(self) -> None:
+        errors = self._save_error(self._make_payload(username="TakenUser"))
+        self.assertIn("username", errors)
+
+    def test_both_duplicates_reported_together(self) -> None:
+        errors = self._save_error(self._make_payload(username="TAKENUSER", email="TAKEN@example.com"))
+        self.assertEqual(set(errors), {"username", "email"})
+
+    def test_concurrent_duplicate_is_mapped_from_the_insert(self) -> None:
+        ser = UserRegistrationSerializer(data=self._make_payload(username="TakenUser"))
+        # another sign-up wins between validation and the INSERT
+        with patch.object(UserRegistrationSerializer, "reject_taken"):
+            self.assertTrue(ser.is_valid(), ser.errors)
+        with self.assertRaises(serializers.ValidationError) as cm:
+            ser.save()
+        self.assertIn("username", cm.exception.detail)
+
+    def test_signup_is_a_single_write(self) -> None:
+        ser = UserRegistrationSerializer(data=self._make_payload())
+        self.assertTrue(ser.is_valid(), ser.errors)
+        # SAVEPOINT, INSERT, RELEASE SAVEPOINT: the savepoint is what keeps a
+        # rejected INSERT from breaking the surrounding transaction
+        with self.assertNumQueries(3):
+            ser.save()
+
+    def test_blank_emails_do_not_collide(self) -> None:
+        UserFactory(email="")
+        UserFactory(email="")
 
     def test_password_min_length_enforced(self) -> None:
         payload = self._make_payload(password="1234567", password2="1234567")
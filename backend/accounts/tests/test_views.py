@@ -4,6 +4,9 @@ from rest_framework import status
 from django.urls import reverse
 from faker import Faker
 
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.auth import LANGUAGE_CLAIM
 from accounts.views import UserView, GameTokenView
 from accounts.models import User, GameToken
 from .factories import UserFactory, GameTokenFactory
@@ -130,6 +133,33 @@ class JWTFlowTests(APITestCase):
         self.assertIn("access_token", res2.cookies)
         self.assertNotIn("access", res2.data)
 
+    def test_tokens_carry_preferred_language(self):
+        self.user.preferred_language = "uk"
+        self.user.save()
+
+        res = self.client.post(
+            self.obtain_url,
+            {"username": "player1", "password": "supersecret123"},
+            format="json",
+        )
+
+        self.assertEqual(AccessToken(res.cookies["access_token"].value)[LANGUAGE_CLAIM], "uk")
+
+    def test_refresh_picks_up_a_changed_language(self):
+        res = self.client.post(
+            self.obtain_url,
+            {"username": "player1", "password": "supersecret123"},
+            format="json",
+        )
+        self.assertEqual(AccessToken(res.cookies["access_token"].value)[LANGUAGE_CLAIM], "en")
+        self.user.preferred_language = "uk"
+        self.user.save()
+
+        self.client.cookies = res.cookies
+        res2 = self.client.post(self.refresh_url)
+
+        self.assertEqual(AccessToken(res2.cookies["access_token"].value)[LANGUAGE_CLAIM], "uk")
+
     def test_verify_cookie_token(self):
         """Verify view should validate access token from cookie."""
         res = self.client.post(
@@ -242,6 +272,15 @@ class RegistrationTests(APITestCase):
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("username", res.data)
 
+    def test_register_duplicate_in_other_case(self):
+        """Uniqueness ignores case; nothing is created."""
+        data = self._payload(username="TakenUser", email="Taken@Example.com")
+        res = self.client.post(self.register_url, data, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(res.data), {"username", "email"})
+        self.assertEqual(User.objects.count(), 1)
+
     def test_register_duplicate_email(self):
         """Email must be unique."""
         data = self._payload(email="taken@example.com")
@@ -2,17 +2,21 @@ from rest_framework.views import APIView
 import secrets
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.response import Response
 from rest_framework import status
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
-from .serializers import MeSerializer, UserRegistrationSerializer, GameTokenSerializer
+from .serializers import (
+    GameTokenSerializer, LanguageTokenObtainPairSerializer, LanguageTokenRefreshSerializer, MeSerializer,
+    UserRegistrationSerializer,
+)
 from .models import GameToken
 
 
 class CookieTokenObtainPairView(TokenObtainPairView):
+    serializer_class = LanguageTokenObtainPairSerializer
+
     def post(self, request, *args, **kwargs):
         response = super().post(request, *args, **kwargs)
         data = response.data
@@ -38,6 +42,8 @@ class CookieTokenObtainPairView(TokenObtainPairView):
     
 
 class CookieTokenRefreshView(TokenRefreshView):
+    serializer_class = LanguageTokenRefreshSerializer
+
     def post(self, request, *args, **kwargs):
         refresh_token = request.COOKIES.get("refresh_token")
         if not refresh_token:
@@ -98,7 +104,7 @@ class UserView(APIView):
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
         
-        refresh = RefreshToken.for_user(user)
+        refresh = LanguageTokenObtainPairSerializer.get_token(user)
         access = refresh.access_token
 
         return Response(
@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported after setup: it reads settings and the ORM models
+from minecraft.asgi import HandshakeFastPath  # noqa: E402
+
+application = HandshakeFastPath(django_application)
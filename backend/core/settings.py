@@ -53,6 +53,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'infrastructure.middlewares.MaintenanceModeMiddleware',
+    'minecraft.middlewares.ServerAccountingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -62,6 +63,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django_otp.middleware.OTPMiddleware',
     'infrastructure.middlewares.UserLanguageMiddleware',
+    'accounts.middlewares.HashingOverloadedMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -127,6 +129,9 @@ else:
             "default": {
                 "ENGINE": "django.db.backends.sqlite3",
                 "NAME": DEFAULT_SQLITE_PATH,
+                # file-backed test DB: concurrency tests need real busy-wait
+                # locking, shared-cache in-memory DBs fail fast instead
+                "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
             }
         }
 
@@ -176,6 +181,22 @@ LOGGING = {
 # ========== AUTH ==========
 AUTH_USER_MODEL = 'accounts.User'
 
+# Django's defaults, with PBKDF2 (same algorithm and format) moved to a process pool.
+# Keep django's own PBKDF2PasswordHasher out: hashers are looked up by algorithm name.
+PASSWORD_HASHERS = [
+    "accounts.hashing.PooledPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+# Pool processes per worker (0 = hash inline); hashes allowed to wait beyond
+# them before login / registration answer 503. Iterations: 0 = Django's
+# default; see `calibrate_password_hasher`.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", "0"))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -216,9 +237,103 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
     "SIGNING_KEY": SECRET_KEY,
 }
+
+# Per-process auth caches (accounts/auth.py). Verified access tokens are kept
+# until they expire (at most AUTH_TOKEN_CACHE_TTL); users until AUTH_USER_CACHE_TTL,
+# which bounds how long other workers keep serving a user changed elsewhere.
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+AUTH_TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "900"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "30"))
 # ==========================
 
 
+# ========== MINECRAFT ==========
+# Nickname candidate engines: "randomuser" (randomuser.me) or "local"
+# (bundled name tables). Empty fallback = surface provider errors as 502.
+NICKNAME_ENGINE = os.getenv("NICKNAME_ENGINE", "randomuser")
+NICKNAME_FALLBACK_ENGINE = os.getenv("NICKNAME_FALLBACK_ENGINE", "local")
+
+# Identity provider client: keep-alive pool + per-process circuit breaker.
+NICKNAME_PROVIDER_URL = os.getenv("NICKNAME_PROVIDER_URL", "https://randomuser.me/api/")
+NICKNAME_PROVIDER_CONNECT_TIMEOUT = float(os.getenv("NICKNAME_PROVIDER_CONNECT_TIMEOUT", "2"))
+NICKNAME_PROVIDER_READ_TIMEOUT = float(os.getenv("NICKNAME_PROVIDER_READ_TIMEOUT", "5"))
+NICKNAME_PROVIDER_POOL_SIZE = int(os.getenv("NICKNAME_PROVIDER_POOL_SIZE", "10"))
+NICKNAME_PROVIDER_ASYNC_MAX_CONNECTIONS = int(os.getenv("NICKNAME_PROVIDER_ASYNC_MAX_CONNECTIONS", "100"))
+NICKNAME_PROVIDER_FAILURE_THRESHOLD = int(os.getenv("NICKNAME_PROVIDER_FAILURE_THRESHOLD", "3"))
+NICKNAME_PROVIDER_RESET_TIMEOUT = float(os.getenv("NICKNAME_PROVIDER_RESET_TIMEOUT", "30"))
+
+# How long link-token holds a token while it picks a nickname. Must outlive
+# the network phase (two provider round trips); crashed requests release on expiry.
+NICKNAME_TOKEN_RESERVATION_TTL = int(os.getenv("NICKNAME_TOKEN_RESERVATION_TTL", "60"))
+
+# Lease on a picked nickname until its account row exists (see minecraft/leases.py).
+NICKNAME_LEASE_TTL = int(os.getenv("NICKNAME_LEASE_TTL", "60"))
+
+# Max (token/account_id, uuid) pairs a server may attach in one POST link-token call.
+MINECRAFT_ATTACH_MAX_ITEMS = int(os.getenv("MINECRAFT_ATTACH_MAX_ITEMS", "5000"))
+
+# Rows per keyset page (and per streamed chunk) of GET /api/minecraft/roster/.
+MINECRAFT_ROSTER_PAGE_SIZE = int(os.getenv("MINECRAFT_ROSTER_PAGE_SIZE", "2000"))
+
+# POST /api/minecraft/events/: max events per call, and how long (seconds) an
+# idempotency key is remembered, i.e. how late a retry may still come in.
+MINECRAFT_EVENTS_MAX_ITEMS = int(os.getenv("MINECRAFT_EVENTS_MAX_ITEMS", "5000"))
+MINECRAFT_EVENT_KEY_TTL = int(os.getenv("MINECRAFT_EVENT_KEY_TTL", str(7 * 24 * 3600)))
+
+# GET /api/minecraft/changes/: max entries per page, and how many days entries
+# are kept (prune_account_changes); older cursors have to reload the roster.
+MINECRAFT_CHANGES_PAGE_SIZE = int(os.getenv("MINECRAFT_CHANGES_PAGE_SIZE", "1000"))
+MINECRAFT_CHANGES_RETENTION_DAYS = int(os.getenv("MINECRAFT_CHANGES_RETENTION_DAYS", "30"))
+
+# GET /api/minecraft/stream/ (SSE, ASGI only): how often each worker checks for
+# changes made by other workers, per-connection buffer (a connection that falls
+# further behind is closed and resumes from Last-Event-ID) and keep-alive period.
+MINECRAFT_PUSH_POLL_INTERVAL = float(os.getenv("MINECRAFT_PUSH_POLL_INTERVAL", "0.5"))
+MINECRAFT_PUSH_BUFFER = int(os.getenv("MINECRAFT_PUSH_BUFFER", "1000"))
+MINECRAFT_PUSH_HEARTBEAT = float(os.getenv("MINECRAFT_PUSH_HEARTBEAT", "15"))
+
+# Playtime heartbeats (POST /api/minecraft/heartbeats/, minecraft/playtime.py):
+# max heartbeats per call, max seconds one heartbeat may credit, and when the
+# per-process buffer is written out (every N seconds or at N pending accounts).
+MINECRAFT_HEARTBEAT_MAX_ITEMS = int(os.getenv("MINECRAFT_HEARTBEAT_MAX_ITEMS", "5000"))
+MINECRAFT_HEARTBEAT_MAX_SECONDS = int(os.getenv("MINECRAFT_HEARTBEAT_MAX_SECONDS", "120"))
+MINECRAFT_PLAYTIME_FLUSH_INTERVAL = float(os.getenv("MINECRAFT_PLAYTIME_FLUSH_INTERVAL", "5"))
+MINECRAFT_PLAYTIME_FLUSH_MAX_ACCOUNTS = int(os.getenv("MINECRAFT_PLAYTIME_FLUSH_MAX_ACCOUNTS", "5000"))
+
+# Per-server API keys (minecraft/servers.py): lookup cache TTLs, how long old keys
+# keep working after a rotation, and the default per-server request rate
+# (DRF rate string such as "1200/min"; empty = unthrottled).
+MINECRAFT_SERVER_KEY_CACHE_TTL = float(os.getenv("MINECRAFT_SERVER_KEY_CACHE_TTL", "60"))
+MINECRAFT_SERVER_KEY_NEGATIVE_TTL = float(os.getenv("MINECRAFT_SERVER_KEY_NEGATIVE_TTL", "5"))
+MINECRAFT_SERVER_KEY_ROTATION_GRACE = int(os.getenv("MINECRAFT_SERVER_KEY_ROTATION_GRACE", str(24 * 3600)))
+MINECRAFT_SERVER_THROTTLE_RATE = os.getenv("MINECRAFT_SERVER_THROTTLE_RATE", "")
+
+# Per-process cache behind GET /api/minecraft/handshake/ (player joins).
+# Unknown tokens/uuids are cached for HANDSHAKE_NEGATIVE_TTL only.
+HANDSHAKE_CACHE_SIZE = int(os.getenv("HANDSHAKE_CACHE_SIZE", "100000"))
+HANDSHAKE_CACHE_TTL = float(os.getenv("HANDSHAKE_CACHE_TTL", "30"))
+HANDSHAKE_NEGATIVE_TTL = float(os.getenv("HANDSHAKE_NEGATIVE_TTL", "5"))
+
+# Pre-generated nickname pool (see `manage.py refill_nickname_pool`).
+# Buckets are "gender:nationality" pairs, empty parts mean "any".
+NICKNAME_POOL_LOW_WATER = int(os.getenv("NICKNAME_POOL_LOW_WATER", "200"))
+NICKNAME_POOL_TARGET = int(os.getenv("NICKNAME_POOL_TARGET", "1000"))
+NICKNAME_POOL_BATCH_SIZE = int(os.getenv("NICKNAME_POOL_BATCH_SIZE", "100"))
+NICKNAME_POOL_BUCKETS = os.getenv("NICKNAME_POOL_BUCKETS", ":").split(",")
+
+# Node-wide availability index (counting Bloom filter of taken nicknames)
+# shared by all workers through /dev/shm. Path is derived from the DB if unset.
+# Rebuilt by `rebuild_nickname_index --loop`; a build older than MAX_AGE
+# seconds is ignored and names are checked in the DB.
+NICKNAME_INDEX_ENABLED = os.getenv("NICKNAME_INDEX_ENABLED", "True") == "True"
+NICKNAME_INDEX_PATH = os.getenv("NICKNAME_INDEX_PATH") or None
+NICKNAME_INDEX_CAPACITY = int(os.getenv("NICKNAME_INDEX_CAPACITY", "1000000"))
+NICKNAME_INDEX_ERROR_RATE = float(os.getenv("NICKNAME_INDEX_ERROR_RATE", "0.01"))
+NICKNAME_INDEX_MAX_AGE = int(os.getenv("NICKNAME_INDEX_MAX_AGE", "3600"))
+# ===============================
+
+
 # ========== INTERNATIONALIZATION (I18N) ==========
 LANGUAGE_CODE = 'en-us'
 
@@ -244,6 +359,8 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 # ========== MODEL & DB DEFAULTS ==========
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+# keeps node-wide files of a test run (nickname index) out of the real ones
+TEST_RUNNER = 'core.test_runner.TestRunner'
 # =========================================
 
 
@@ -0,0 +1,26 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    DiscoverRunner that points node-wide state at a throwaway directory, so a
+    test run neither writes the real /dev/shm nickname index nor inherits the
+    one a previous run left behind.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._scratch = tempfile.mkdtemp(prefix="exp40-tests-")
+        path = os.path.join(self._scratch, "nicknames.bloom")
+        # the environment too: spawned --parallel workers load the settings afresh
+        os.environ["NICKNAME_INDEX_PATH"] = path
+        settings.NICKNAME_INDEX_PATH = path
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        shutil.rmtree(self._scratch, ignore_errors=True)
@@ -9,4 +9,9 @@ echo "✅ MySQL is up."
 
 /venv/bin/python -m pip show django || true
 /venv/bin/python manage.py migrate --noinput
+# background rebuilder for this node's nickname index; requests check the DB until its first build
+/venv/bin/python manage.py rebuild_nickname_index --loop &
+if [ "$DJANGO_SERVER" = "uvicorn" ]; then
+  exec /venv/bin/uvicorn core.asgi:application --host 0.0.0.0 --port 8000 --workers "${UVICORN_WORKERS:-2}"
+fi
 exec /venv/bin/python manage.py runserver 0.0.0.0:8000
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""
+Database helpers shared by the apps.
+"""
+import re
+
+from django.db import IntegrityError, connection
+
+_MYSQL_DUPLICATE_KEY = 1062
+# the key closes the message; the duplicate value (user input) is quoted before it
+_MYSQL_KEY_RE = re.compile(r"for key '(?:[^'.]*\.)?([^'.]*)'$")
+_SQLITE_UNIQUE_RE = re.compile(r"^UNIQUE constraint failed: (?:index '([^']+)'|(.+))$")
+
+
+def _reported_unique(exc: IntegrityError) -> tuple[str | None, list[str]]:
+    """(index or constraint name, ["table.column", ...]) as the backend reports them."""
+    if connection.vendor == "postgresql":
+        diag = getattr(exc.__cause__, "diag", None)
+        return getattr(diag, "constraint_name", None), []
+    if connection.vendor == "mysql":
+        if len(exc.args) > 1 and exc.args[0] == _MYSQL_DUPLICATE_KEY:
+            match = _MYSQL_KEY_RE.search(str(exc.args[1]))
+            return (match.group(1) if match else None), []
+        return None, []
+    if connection.vendor == "sqlite":
+        match = _SQLITE_UNIQUE_RE.match(str(exc))
+        if match:
+            return match.group(1), [c.strip() for c in (match.group(2) or "").split(",") if c.strip()]
+    return None, []
+
+
+def violated_unique(exc: IntegrityError, model) -> str | None:
+    """
+    Name the unique rule of `model` that `exc` broke: the name of a
+    `Meta.constraints` entry, or the name of a `unique=True` field. None
+    when it is about something else or the backend's report can't be matched.
+
+    Only the index name the backend reports is looked at, never the rest of
+    the message, which may quote the offending value.
+    """
+    name, columns = _reported_unique(exc)
+    if name is None and not columns:
+        return None
+
+    for constraint in model._meta.constraints:
+        if name == constraint.name:
+            return constraint.name
+
+    table = model._meta.db_table
+    for field in model._meta.concrete_fields:
+        if not field.unique or field.primary_key:
+            continue
+        column = field.column
+        if columns == [f"{table}.{column}"]:
+            return field.name
+        # inline UNIQUE: MySQL names the key after the column, PostgreSQL `<table>_<column>_key`;
+        # added later by a migration: Django's `<table>_<column>_<hash>_uniq`
+        if name in (column, f"{table}_{column}_key"):
+            return field.name
+        if name and name.startswith(f"{table}_{column}_") and name.endswith("_uniq"):
+            return field.name
+    return None
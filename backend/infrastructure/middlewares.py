@@ -1,42 +1,102 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
 from django.http import HttpResponse
 from django.utils import translation
 
+from accounts.auth import token_language
+
+
 class MaintenanceModeMiddleware:
     """
     Middleware that checks if the site is in maintenance mode.
     If the MAINTENANCE_MODE setting is True, it return a "Site under maintenance" response.
+
+    Sync and async capable, so async views under ASGI don't pay a thread hop.
     """
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         if getattr(settings, 'MAINTENANCE_MODE', False):
             return HttpResponse("Site is under maintenance", status=503)
         return self.get_response(request)
+
+    async def __acall__(self, request):
+        if getattr(settings, 'MAINTENANCE_MODE', False):
+            return HttpResponse("Site is under maintenance", status=503)
+        return await self.get_response(request)
     
 
 class UserLanguageMiddleware:
     """
     Middleware that synchronizes language with backend
     and frontend.
+
+    Accept-Language wins; otherwise the `preferred_language` claim of the
+    JWT access token, read without loading the user (accounts.auth.token_language).
+    Only session-authenticated requests (the admin) fall back to the user
+    row, so anonymous and API traffic never touches the user table here.
+
+    Sync and async capable, so async views under ASGI don't pay a thread hop.
     """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        lang = None
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
 
-        if request.user.is_authenticated:
+        lang = self.claimed_language(request)
+        if lang is None and self.has_session(request) and request.user.is_authenticated:
             lang = getattr(request.user, "preferred_language", None)
 
+        self.activate(request, lang)
+
+        response = self.get_response(request)
+        translation.deactivate()
+        return response
+
+    async def __acall__(self, request):
+        # no DB access: verifying a token is CPU only (and usually cached)
+        lang = self.claimed_language(request)
+        if lang is None and self.has_session(request):
+            user = await request.auser()
+            if user.is_authenticated:
+                lang = getattr(user, "preferred_language", None)
+
+        self.activate(request, lang)
+
+        response = await self.get_response(request)
+        translation.deactivate()
+        return response
+
+    @staticmethod
+    def claimed_language(request):
+        if request.headers.get("Accept-Language"):
+            return None  # the header wins anyway, don't bother decoding
+        return token_language(request)
+
+    @staticmethod
+    def has_session(request):
+        return settings.SESSION_COOKIE_NAME in request.COOKIES
+
+    @staticmethod
+    def activate(request, lang):
         header_lang = request.headers.get("Accept-Language")
         active_lang = header_lang or lang or "en"
 
         translation.activate(active_lang)
         request.LANGUAGE_CODE = active_lang
-
-        response = self.get_response(request)
-        translation.deactivate()
-        return response
\ No newline at end of file
+        return active_lang
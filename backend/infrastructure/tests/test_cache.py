@@ -0,0 +1,50 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from infrastructure.cache import MISSING, TTLLRUCache
+
+
+class TTLLRUCacheTests(SimpleTestCase):
+    def test_get_returns_stored_value_and_counts_hits(self):
+        cache = TTLLRUCache(maxsize=10, ttl=30)
+        cache.set("a", 1)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIs(cache.get("b"), MISSING)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_entries_expire_after_ttl(self):
+        cache = TTLLRUCache(maxsize=10, ttl=30)
+
+        with patch("infrastructure.cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+            cache.set("b", 2, ttl=5)
+        with patch("infrastructure.cache.time.monotonic", return_value=110.0):
+            self.assertEqual(cache.get("a"), 1)
+            self.assertIs(cache.get("b"), MISSING)
+        with patch("infrastructure.cache.time.monotonic", return_value=131.0):
+            self.assertIs(cache.get("a"), MISSING)
+        self.assertEqual(len(cache), 0)
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLLRUCache(maxsize=2, ttl=30)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # "b" is now the oldest
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIs(cache.get("b"), MISSING)
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_delete_many_and_clear(self):
+        cache = TTLLRUCache(maxsize=10, ttl=30)
+        for key in "abc":
+            cache.set(key, key)
+
+        cache.delete_many(["a", "b", "zzz"])
+        self.assertEqual(len(cache), 1)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase
+
+from accounts.models import EMAIL_CI_CONSTRAINT, USERNAME_CI_CONSTRAINT, GameToken, User
+from infrastructure.db import violated_unique
+from minecraft.models import MinecraftAccount
+
+
+def integrity_error(*args, cause=None):
+    exc = IntegrityError(*args)
+    exc.__cause__ = cause
+    return exc
+
+
+@skipUnless(connection.vendor == "sqlite", "reads SQLite's error messages")
+class ViolatedUniqueSQLiteTests(TestCase):
+    def violation(self, create):
+        with self.assertRaises(IntegrityError) as ctx, transaction.atomic():
+            create()
+        return ctx.exception
+
+    def test_names_the_expression_constraint(self):
+        User.objects.create(username="alice", email="alice@example.com")
+
+        exc = self.violation(lambda: User.objects.create(username="ALICE"))
+        self.assertEqual(violated_unique(exc, User), USERNAME_CI_CONSTRAINT)
+
+        exc = self.violation(lambda: User.objects.create(username="bob", email="Alice@example.com"))
+        self.assertEqual(violated_unique(exc, User), EMAIL_CI_CONSTRAINT)
+
+    def test_names_the_unique_field(self):
+        user = User.objects.create(username="alice")
+        token = GameToken.objects.create(user=user, value="tok")
+        MinecraftAccount.objects.create(owner=user, token=token, nickname="alex_stone")
+
+        exc = self.violation(lambda: MinecraftAccount.objects.create(owner=user, token=token, nickname="john_doe"))
+        self.assertEqual(violated_unique(exc, MinecraftAccount), "token")
+
+
+class ViolatedUniqueBackendTests(SimpleTestCase):
+    def test_mysql_key_is_read_from_the_end_of_the_message(self):
+        # the duplicate value is user input and may look like a key name
+        exc = integrity_error(
+            1062, "Duplicate entry 'accounts_user_email_ci_unique' for key 'accounts_user.accounts_user_username_ci_unique'",
+        )
+        with patch.object(connection, "vendor", "mysql"):
+            self.assertEqual(violated_unique(exc, User), USERNAME_CI_CONSTRAINT)
+
+    def test_mysql_inline_unique_key_is_named_after_the_column(self):
+        exc = integrity_error(1062, "Duplicate entry '42' for key 'minecraft_minecraftaccount.token_id'")
+        with patch.object(connection, "vendor", "mysql"):
+            self.assertEqual(violated_unique(exc, MinecraftAccount), "token")
+
+    def test_postgresql_constraint_name_comes_from_the_diagnostics(self):
+        cause = Exception("duplicate key value violates unique constraint")
+        cause.diag = SimpleNamespace(constraint_name="minecraft_minecraftaccount_uuid_7f3a9c1e_uniq")
+        with patch.object(connection, "vendor", "postgresql"):
+            self.assertEqual(violated_unique(integrity_error("duplicate key", cause=cause), MinecraftAccount), "uuid")
+
+    def test_other_errors_name_nothing(self):
+        with patch.object(connection, "vendor", "mysql"):
+            self.assertIsNone(violated_unique(integrity_error(1452, "Cannot add or update a child row"), User))
+        self.assertIsNone(violated_unique(integrity_error("NOT NULL constraint failed: accounts_user.username"), User))
@@ -1,4 +1,7 @@
 from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.auth import LANGUAGE_CLAIM
 from accounts.models import User
 
 
@@ -68,4 +71,34 @@ class UserLanguageMiddlewareTests(TestCase):
 
         data = res.json()
         self.assertEqual(data["lang"], "en")
-        self.assertEqual(data["active_lang"], "en")
\ No newline at end of file
+        self.assertEqual(data["active_lang"], "en")
+
+    def test_uses_token_claim_without_queries(self):
+        user = User.objects.create_user(username="olena", password="pass12345", preferred_language="uk")
+        token = AccessToken.for_user(user)
+        token[LANGUAGE_CLAIM] = "uk"
+
+        with self.assertNumQueries(0):
+            res = self.client.get("/ping/", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        self.assertEqual(res.json()["active_lang"], "uk")
+
+    def test_reads_the_access_token_cookie(self):
+        user = User.objects.create_user(username="olena", password="pass12345")
+        token = AccessToken.for_user(user)
+        token[LANGUAGE_CLAIM] = "uk"
+        self.client.cookies["access_token"] = str(token)
+
+        res = self.client.get("/ping/")
+
+        self.assertEqual(res.json()["active_lang"], "uk")
+
+    def test_invalid_token_falls_back_to_default(self):
+        res = self.client.get("/ping/", HTTP_AUTHORIZATION="Bearer not-a-jwt")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["active_lang"], "en")
+
+    def test_anonymous_request_does_no_queries(self):
+        with self.assertNumQueries(0):
+            self.client.get("/ping/")
@@ -0,0 +1,69 @@
+"""
+ASGI fast path for the join handshake.
+
+A cache hit on GET /api/minecraft/handshake/ (for a server key that is
+cached too) is answered right here, before Django builds a request, runs
+middleware or resolves the URL. Everything else - misses, unknown keys,
+throttled servers, maintenance mode, any other path - goes to the Django
+application unchanged, so responses never differ from HandshakeView's.
+"""
+import json
+import time
+from urllib.parse import parse_qs
+
+from django.conf import settings
+
+from .handshake import cached_handshake
+from .servers import ServerIdentity, cached_server, log_server_request
+
+HANDSHAKE_PATH = "/api/minecraft/handshake/"
+
+
+class HandshakeFastPath:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "GET" and scope["path"] == HANDSHAKE_PATH:
+            started = time.perf_counter()
+            answer = self.answer(scope)
+            if answer is not None:
+                identity, body = answer
+                await send({
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                    ],
+                })
+                await send({"type": "http.response.body", "body": body})
+                log_server_request(identity, "GET", HANDSHAKE_PATH, 200, time.perf_counter() - started)
+                return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def answer(scope) -> tuple[ServerIdentity, bytes] | None:
+        """(server, JSON body) for a cache hit, or None to let Django handle the request."""
+        if getattr(settings, "MAINTENANCE_MODE", False):
+            return None
+
+        provided = dict(scope["headers"]).get(b"x-server-key")
+        identity = cached_server(provided.decode("latin-1") if provided else None)
+        # unknown keys, cache misses and throttled servers get the full treatment
+        if not isinstance(identity, ServerIdentity):
+            return None
+        if identity.throttle_rate or settings.MINECRAFT_SERVER_THROTTLE_RATE:
+            return None
+
+        params = parse_qs(scope["query_string"].decode("latin-1"))
+        token, uuid = params.get("token"), params.get("uuid")
+        if (token is None) == (uuid is None):
+            return None
+
+        result = cached_handshake(token=token[0] if token else None, uuid=uuid[0] if uuid else None)
+        if isinstance(result, dict):
+            return identity, json.dumps({"ok": True, **result}).encode()
+        # misses and negative hits (404 body is localized) take the normal route
+        return None
@@ -0,0 +1,282 @@
+"""
+Nickname availability index.
+
+A counting Bloom filter of taken nicknames, kept in a memory-mapped file
+under /dev/shm so every worker on the node shares one copy. It answers
+"definitely free" without touching the DB; "maybe taken" answers are
+confirmed with a single query per batch. Names are compared regardless of
+case everywhere, like the unique index does (see
+MinecraftAccount.objects.nicknamed).
+
+The filter is per node and can lag behind (other nodes, rows written with
+bulk operations, a rebuild in progress), so the unique index on
+MinecraftAccount.nickname stays the final arbiter - callers must still
+handle IntegrityError on insert.
+
+Requests never rebuild it: that full-table scan is the job of the
+`rebuild_nickname_index` command (`--loop` in the background on each node).
+Until a build exists, or once the last one is older than
+NICKNAME_INDEX_MAX_AGE, every batch is checked in the DB instead.
+"""
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable
+
+from django.conf import settings
+from django.db import connection
+
+from .models import MinecraftAccount
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: fall back to a per-process filter
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("<4sIQId")
+_MAGIC = b"NKBF"
+# 2: positions hashed from the lowercased name
+_VERSION = 2
+
+
+def bloom_parameters(capacity: int, error_rate: float) -> tuple[int, int]:
+    """Optimal (counters, hash functions) for `capacity` items at `error_rate`."""
+    size = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+    hashes = max(1, round(size / capacity * math.log(2)))
+    return size, hashes
+
+
+class NicknameIndex:
+    """
+    Counting Bloom filter with 8-bit saturating counters.
+
+    `path=None` keeps the counters in a private buffer (tests, platforms
+    without fcntl); otherwise they live in a shared, file-backed mmap and
+    writers serialize on an flock.
+    """
+
+    def __init__(self, size: int, hashes: int, path: str | None = None):
+        self.size = size
+        self.hashes = hashes
+        self.path = path
+        self._offset = _HEADER.size
+        self._lock = threading.Lock()
+        self._fd = None
+
+        total = self._offset + size
+        if path is None:
+            self._buf = bytearray(total)
+            _HEADER.pack_into(self._buf, 0, _MAGIC, _VERSION, size, hashes, 0.0)
+            return
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._exclusive():
+            header_ok = False
+            if os.fstat(self._fd).st_size == total:
+                magic, version, old_size, old_hashes, _built = _HEADER.unpack(os.pread(self._fd, _HEADER.size, 0))
+                header_ok = (magic, version, old_size, old_hashes) == (_MAGIC, _VERSION, size, hashes)
+            if not header_ok:
+                # new file or different geometry: reset, mark as never built
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, total)
+                os.pwrite(self._fd, _HEADER.pack(_MAGIC, _VERSION, size, hashes, 0.0), 0)
+        self._buf = mmap.mmap(self._fd, total)
+
+    @contextmanager
+    def _exclusive(self):
+        with self._lock:
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if self._fd is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _positions(self, nickname: str) -> list[int]:
+        digest = hashlib.blake2b(nickname.lower().encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        offset = self._offset
+        return [offset + (h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    @property
+    def built_at(self) -> float:
+        return _HEADER.unpack_from(self._buf, 0)[4]
+
+    def __contains__(self, nickname: str) -> bool:
+        buf = self._buf
+        return all(buf[p] for p in self._positions(nickname))
+
+    def add(self, nickname: str) -> None:
+        with self._exclusive():
+            buf = self._buf
+            for p in self._positions(nickname):
+                if buf[p] < 255:
+                    buf[p] += 1
+
+    def discard(self, nickname: str) -> None:
+        with self._exclusive():
+            buf = self._buf
+            for p in self._positions(nickname):
+                # saturated counters stay put: we no longer know their real count
+                if 0 < buf[p] < 255:
+                    buf[p] -= 1
+
+    def rebuild(self, nicknames: Iterable[str]) -> int:
+        """
+        Recompute the counters from scratch.
+
+        Builds into a private buffer first so readers never see a half-empty
+        filter, then swaps it in with a single copy under the lock.
+        """
+        fresh = bytearray(self.size)
+        count = 0
+        offset = self._offset
+        for nickname in nicknames:
+            for p in self._positions(nickname):
+                p -= offset
+                if fresh[p] < 255:
+                    fresh[p] += 1
+            count += 1
+
+        with self._exclusive():
+            self._buf[offset:offset + self.size] = fresh
+            _HEADER.pack_into(self._buf, 0, _MAGIC, _VERSION, self.size, self.hashes, time.time())
+        return count
+
+
+_index: NicknameIndex | None = None
+_index_lock = threading.Lock()
+
+
+def _default_path() -> str | None:
+    if fcntl is None:
+        return None
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    db = connection.settings_dict
+    identity = f"{connection.vendor}:{db.get('HOST')}:{db.get('PORT')}:{db.get('NAME')}"
+    digest = hashlib.sha1(identity.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(base, f"exp40-nicknames-{digest}.bloom")
+
+
+def taken_nicknames():
+    """Every nickname currently in the table, streamed."""
+    return MinecraftAccount.objects.values_list("nickname", flat=True).iterator(chunk_size=10_000)
+
+
+def get_nickname_index() -> NicknameIndex | None:
+    """The node-wide index, opened on first use (built or not). Returns None when disabled."""
+    global _index
+
+    if not settings.NICKNAME_INDEX_ENABLED:
+        return None
+
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                size, hashes = bloom_parameters(settings.NICKNAME_INDEX_CAPACITY, settings.NICKNAME_INDEX_ERROR_RATE)
+                _index = NicknameIndex(size, hashes, settings.NICKNAME_INDEX_PATH or _default_path())
+    return _index
+
+
+_stale_logged = False
+
+
+def _fresh_index() -> NicknameIndex | None:
+    """The index, if it was built within NICKNAME_INDEX_MAX_AGE; else None (check the DB)."""
+    global _stale_logged
+
+    index = get_nickname_index()
+    if index is None:
+        return None
+    if time.time() - index.built_at > settings.NICKNAME_INDEX_MAX_AGE:
+        if not _stale_logged:
+            _stale_logged = True
+            logger.warning(
+                "Nickname index missing or older than NICKNAME_INDEX_MAX_AGE, checking names in the DB; "
+                "is `rebuild_nickname_index --loop` running?"
+            )
+        return None
+    _stale_logged = False
+    return index
+
+
+def _distinct(nicknames: Iterable[str]) -> list[str]:
+    """`nicknames` without repeats in any case, first spelling kept, in order."""
+    first = {}
+    for nickname in nicknames:
+        first.setdefault(nickname.lower(), nickname)
+    return list(first.values())
+
+
+def filter_available(nicknames: Iterable[str]) -> list[str]:
+    """
+    Return the free nicknames from `nicknames`, de-duplicated, in order.
+
+    Names the filter has never seen are free without a DB hit; the rest are
+    checked together with one query through the case-insensitive index.
+    """
+    nicknames = _distinct(nicknames)
+    index = _fresh_index()
+
+    suspects = nicknames if index is None else [n for n in nicknames if n in index]
+    if not suspects:
+        return nicknames
+
+    taken = {n.lower() for n in MinecraftAccount.objects.nicknamed(*suspects).values_list("nickname", flat=True)}
+    return [n for n in nicknames if n.lower() not in taken]
+
+
+async def afilter_available(nicknames: Iterable[str]) -> list[str]:
+    """
+    filter_available for async callers. The index is only ever opened here,
+    never rebuilt, and membership checks are memory reads, so all of it
+    stays on the loop; only the confirming query is awaited.
+    """
+    nicknames = _distinct(nicknames)
+    index = _fresh_index()
+
+    suspects = nicknames if index is None else [n for n in nicknames if n in index]
+    if not suspects:
+        return nicknames
+
+    taken = {
+        n.lower() async for n in MinecraftAccount.objects.nicknamed(*suspects).values_list("nickname", flat=True)
+    }
+    return [n for n in nicknames if n.lower() not in taken]
+
+
+async def ais_available(nickname: str) -> bool:
+    return bool(await afilter_available([nickname]))
+
+
+def is_available(nickname: str) -> bool:
+    return bool(filter_available([nickname]))
+
+
+def remember_taken(nicknames: Iterable[str]) -> None:
+    """Record names inserted behind the ORM's back (bulk_create, lost races)."""
+    index = get_nickname_index()
+    if index is None:
+        return
+    for nickname in nicknames:
+        index.add(nickname)
+
+
+def forget_taken(nicknames: Iterable[str]) -> None:
+    index = get_nickname_index()
+    if index is None:
+        return
+    for nickname in nicknames:
+        index.discard(nickname)
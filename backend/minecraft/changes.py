@@ -0,0 +1,152 @@
+"""
+Change feed over MinecraftAccount state (deaths, deactivations, uuid binds...).
+
+Every write appends AccountChange rows in its own transaction: saves and
+deletes through signals, bulk writes (link_accounts, attach_uuids) through
+record_changes. Servers mirror the roster once (GET roster/, which hands
+out the starting cursor in X-Changes-Cursor) and then poll
+GET changes/?since=<cursor> for the deltas, or follow GET stream/ (push.py).
+
+Ids are allocated at INSERT but become visible at COMMIT, so a reader can
+see id 102 while 101 is still in flight; paging by id would skip 101 for
+good once it commits. Entries are paged by `seq` instead, which only
+committed entries get: sequence_changes() locks the ChangeSequence row and
+numbers every visible unnumbered entry in one short transaction. Numbering
+is serialized and each batch commits before the next one starts, so once a
+reader sees seq N, every seq below N is visible too. Readers number pending
+entries themselves before reading (one indexed lookup when there are none),
+so nothing depends on clocks or on how long write transactions take.
+Entries carry the full tracked state, so replaying one twice is harmless.
+
+prune_changes() drops entries older than MINECRAFT_CHANGES_RETENTION_DAYS;
+a cursor from before the pruned range raises CursorExpired and the server
+has to reload the roster.
+"""
+from datetime import timedelta
+from typing import Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import AccountChange, ChangeSequence, MinecraftAccount
+
+# sent after a transaction that recorded changes commits (wakes the push hubs)
+changes_committed = Signal()
+
+
+def record_changes(accounts: Iterable[MinecraftAccount], action: str, fields: Iterable[str] | None = None) -> None:
+    """Append one entry per account; call inside the transaction that made the change."""
+    fields = list(fields) if fields is not None else list(MinecraftAccount.TRACKED_FIELDS)
+    AccountChange.objects.bulk_create([
+        AccountChange(account_id=account.pk, action=action, fields=fields, state=account.tracked_state())
+        for account in accounts
+    ])
+    transaction.on_commit(lambda: changes_committed.send(sender=AccountChange))
+
+
+class CursorExpired(Exception):
+    """The entries after this cursor were pruned; reload the roster."""
+
+
+# entries numbered (or deleted) per transaction
+BATCH_SIZE = 1000
+
+
+def _lock_sequence() -> ChangeSequence:
+    # get_or_create: TransactionTestCase flushes the row the migration made
+    sequence, _created = ChangeSequence.objects.select_for_update().get_or_create(pk=1)
+    return sequence
+
+
+def _sequence_state() -> tuple[int, int]:
+    """(last seq handed out, highest seq pruned)."""
+    row = ChangeSequence.objects.filter(pk=1).values_list("last", "pruned_through").first()
+    return row or (0, 0)
+
+
+def sequence_changes() -> None:
+    """
+    Give committed entries without a seq the next ones, in id order.
+
+    Call it outside any transaction that records changes: numbering entries
+    that haven't committed yet would let later ones overtake them.
+    """
+    while AccountChange.objects.filter(seq__isnull=True).exists():
+        with transaction.atomic():
+            sequence = _lock_sequence()
+            # read after taking the lock: whatever committed before it is numbered now
+            pending = list(AccountChange.objects.filter(seq__isnull=True).order_by("id")[:BATCH_SIZE])
+            for entry in pending:
+                sequence.last += 1
+                entry.seq = sequence.last
+            AccountChange.objects.bulk_update(pending, ["seq"])
+            sequence.save(update_fields=["last"])
+
+
+def current_cursor() -> int:
+    """Cursor from which a freshly loaded roster should start polling."""
+    sequence_changes()
+    return _sequence_state()[0]
+
+
+def cursor_expired(cursor: int) -> bool:
+    """Have entries after `cursor` been pruned?"""
+    return cursor < _sequence_state()[1]
+
+
+def changes_since(cursor: int, limit: int) -> tuple[list[dict], int, bool]:
+    """
+    Changes after `cursor`, in commit order.
+
+    Returns `(changes, next_cursor, has_more)`; pass `next_cursor` as the
+    next `since`. Raises CursorExpired if entries after `cursor` were pruned.
+    """
+    sequence_changes()
+    if cursor_expired(cursor):
+        raise CursorExpired
+    rows = list(
+        AccountChange.objects
+        .filter(seq__gt=cursor)
+        .order_by("seq")
+        .values("seq", "account_id", "action", "fields", "state")[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changes = [
+        {
+            "cursor": row["seq"],
+            "account_id": row["account_id"],
+            "action": row["action"],
+            "fields": row["fields"],
+            "state": row["state"],
+        }
+        for row in rows
+    ]
+    return changes, (rows[-1]["seq"] if rows else cursor), has_more
+
+
+def prune_changes() -> int:
+    """Delete entries older than MINECRAFT_CHANGES_RETENTION_DAYS. Returns how many were removed."""
+    sequence_changes()
+    cutoff = timezone.now() - timedelta(days=settings.MINECRAFT_CHANGES_RETENTION_DAYS)
+    through = (
+        AccountChange.objects.filter(created_at__lt=cutoff, seq__isnull=False)
+        .order_by("-created_at", "-seq").values_list("seq", flat=True).first()
+    )
+    if through is None:
+        return 0
+
+    # raise the floor first, so no reader pages into a range that is being deleted
+    with transaction.atomic():
+        sequence = _lock_sequence()
+        sequence.pruned_through = max(sequence.pruned_through, through)
+        sequence.save(update_fields=["pruned_through"])
+
+    deleted = 0
+    while True:
+        pks = list(AccountChange.objects.filter(seq__lte=through).values_list("pk", flat=True)[:BATCH_SIZE])
+        if not pks:
+            return deleted
+        deleted += AccountChange.objects.filter(pk__in=pks).delete()[0]
@@ -0,0 +1,31 @@
+from django.db import models
+
+
+class CaseInsensitiveUniqueConstraint(models.UniqueConstraint):
+    """
+    A unique index over an expression like `Lower("nickname")`, for backends
+    whose collation compares the column case-sensitively.
+
+    MySQL gets no index: AsciiCharField's `ascii_general_ci` collation already
+    makes the column's plain unique index case-insensitive, so a second one
+    over LOWER() would only cost writes and space.
+    """
+
+    @staticmethod
+    def _redundant(schema_editor):
+        return schema_editor.connection.vendor == "mysql"
+
+    def constraint_sql(self, model, schema_editor):
+        if self._redundant(schema_editor):
+            return None
+        return super().constraint_sql(model, schema_editor)
+
+    def create_sql(self, model, schema_editor):
+        if self._redundant(schema_editor):
+            return None
+        return super().create_sql(model, schema_editor)
+
+    def remove_sql(self, model, schema_editor):
+        if self._redundant(schema_editor):
+            return None
+        return super().remove_sql(model, schema_editor)
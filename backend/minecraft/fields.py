@@ -0,0 +1,82 @@
+"""
+Compact column types for the hot MinecraftAccount indexes.
+
+Under MySQL utf8mb4 every CHAR/VARCHAR character costs up to 4 bytes in an
+index key, so a 36-char uuid string or a 255-char nickname make for wide
+unique indexes. These fields keep plain Python strings on the model but
+store the values in the smallest column the backend offers.
+"""
+import uuid
+
+from django import forms
+from django.core import exceptions
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class CompactUUIDField(models.Field):
+    """
+    A UUID held as its canonical string ("xxxxxxxx-xxxx-...") in Python and
+    stored as BINARY(16) on MySQL, the native uuid type on PostgreSQL and
+    CHAR(32) hex elsewhere.
+    """
+    description = _("UUID stored in 16 bytes where the backend allows it")
+    empty_strings_allowed = False
+    default_error_messages = {
+        "invalid": _("“%(value)s” is not a valid UUID."),
+    }
+
+    def db_type(self, connection):
+        if connection.vendor == "mysql":
+            return "binary(16)"
+        if connection.vendor == "postgresql":
+            return "uuid"
+        return "char(32)"
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str) and not value:
+            return None
+        try:
+            if isinstance(value, uuid.UUID):
+                parsed = value
+            elif isinstance(value, (bytes, bytearray, memoryview)):
+                parsed = uuid.UUID(bytes=bytes(value))
+            else:
+                parsed = uuid.UUID(str(value))
+        except (AttributeError, ValueError):
+            raise exceptions.ValidationError(self.error_messages["invalid"], code="invalid", params={"value": value})
+        return str(parsed)
+
+    def from_db_value(self, value, expression, connection):
+        return self.to_python(value)
+
+    def get_prep_value(self, value):
+        return self.to_python(super().get_prep_value(value))
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if value is None:
+            return None
+        parsed = uuid.UUID(value)
+        if connection.vendor == "mysql":
+            return parsed.bytes
+        if connection.vendor == "postgresql":
+            return parsed
+        return parsed.hex
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{"form_class": forms.UUIDField, **kwargs})
+
+
+class AsciiCharField(models.CharField):
+    """
+    CharField stored as single-byte ASCII on MySQL (ascii_general_ci, i.e. as
+    case-insensitive as the utf8mb4 default it replaces). Other backends
+    already store ASCII compactly and keep their usual VARCHAR.
+    """
+
+    def db_type(self, connection):
+        if connection.vendor == "mysql":
+            return f"varchar({self.max_length}) CHARACTER SET ascii COLLATE ascii_general_ci"
+        return super().db_type(connection)
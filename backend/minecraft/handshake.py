@@ -0,0 +1,103 @@
+"""
+Player join handshake: resolve a GameToken value or a player UUID to the
+account state a Minecraft server needs to let the player in.
+
+Answers come from a per-process TTL+LRU cache:
+
+- ("account", id) -> payload
+- ("token", value) / ("uuid", uuid) -> account id, or NOT_FOUND (short TTL)
+
+Aliases are re-checked against the payload on every hit, so an alias left
+behind by a uuid change just misses. Writes invalidate through signals or,
+for bulk operations that skip signals, explicitly (see services.py).
+Other workers converge within HANDSHAKE_CACHE_TTL.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from infrastructure.cache import MISSING, TTLLRUCache
+from .models import MinecraftAccount
+
+NOT_FOUND = "not_found"
+
+_FIELDS = ("id", "nickname", "uuid", "is_dead", "is_active", "token__value")
+
+_cache: TTLLRUCache | None = None
+
+
+def get_handshake_cache() -> TTLLRUCache:
+    global _cache
+    if _cache is None:
+        _cache = TTLLRUCache(maxsize=settings.HANDSHAKE_CACHE_SIZE, ttl=settings.HANDSHAKE_CACHE_TTL)
+    return _cache
+
+
+def _alias(token: str | None, uuid: str | None) -> tuple[str, str]:
+    return ("token", token) if token else ("uuid", uuid)
+
+
+def _matches(payload: dict, alias: tuple[str, str]) -> bool:
+    kind, value = alias
+    return payload["token"] == value if kind == "token" else payload["uuid"] == value
+
+
+def _public(payload: dict) -> dict:
+    return {k: v for k, v in payload.items() if k != "token"}
+
+
+def cached_handshake(token: str | None = None, uuid: str | None = None):
+    """
+    Cache-only lookup. Returns the public payload, NOT_FOUND, or MISSING
+    when the cache can't answer (caller goes to the DB).
+    """
+    cache = get_handshake_cache()
+    alias = _alias(token, uuid)
+
+    account_id = cache.get(alias)
+    if account_id is MISSING or account_id == NOT_FOUND:
+        return account_id
+
+    payload = cache.get(("account", account_id))
+    if payload is MISSING or not _matches(payload, alias):
+        return MISSING
+    return _public(payload)
+
+
+def handshake(token: str | None = None, uuid: str | None = None):
+    """Public payload for the token/uuid, or NOT_FOUND. Fills the cache on a miss."""
+    cached = cached_handshake(token, uuid)
+    if cached is not MISSING:
+        return cached
+
+    cache = get_handshake_cache()
+    alias = _alias(token, uuid)
+    lookup = {"token__value": token} if token else {"uuid": uuid}
+    row = MinecraftAccount.objects.filter(**lookup).values(*_FIELDS).first()
+
+    if row is None:
+        cache.set(alias, NOT_FOUND, ttl=settings.HANDSHAKE_NEGATIVE_TTL)
+        return NOT_FOUND
+
+    payload = {
+        "account_id": row["id"],
+        "nickname": row["nickname"],
+        "uuid": row["uuid"],
+        "is_dead": row["is_dead"],
+        "is_active": row["is_active"],
+        "token": row["token__value"],
+    }
+    cache.set(("account", row["id"]), payload)
+    cache.set(alias, row["id"])
+    return _public(payload)
+
+
+def invalidate_handshake(account_ids=(), tokens=(), uuids=()) -> None:
+    """
+    Drop cached state once the current transaction commits (right away
+    outside of one), so a concurrent miss can't re-cache the old rows.
+    """
+    keys = [("account", pk) for pk in account_ids]
+    keys += [("token", value) for value in tokens if value]
+    keys += [("uuid", value) for value in uuids if value]
+    if keys:
+        transaction.on_commit(lambda: get_handshake_cache().delete_many(keys))
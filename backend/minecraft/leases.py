@@ -0,0 +1,99 @@
+"""
+Nickname leases.
+
+A name that looked free (availability index / DB) can still be picked by a
+parallel request before either of them inserts its MinecraftAccount. Every
+name handed to the link flow is therefore leased first: an INSERT into
+NicknameLease, whose unique index lets exactly one request win. The lease
+is dropped in the same transaction that creates the account, released on
+failure, and otherwise just expires after NICKNAME_LEASE_TTL.
+"""
+from datetime import timedelta
+from typing import Iterable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import NicknameLease
+
+
+def _insert(nickname: str, expires_at) -> bool:
+    try:
+        # savepoint: a lost insert must not break the caller's transaction
+        with transaction.atomic():
+            NicknameLease.objects.create(nickname=nickname, expires_at=expires_at)
+    except IntegrityError:
+        return False
+    return True
+
+
+def acquire_lease(nickname: str) -> bool:
+    """Lease `nickname` for NICKNAME_LEASE_TTL seconds. False if someone holds it."""
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.NICKNAME_LEASE_TTL)
+
+    if _insert(nickname, expires_at):
+        return True
+
+    # the row may be a dead lease: clear it (only if still expired) and try once more
+    if NicknameLease.objects.filter(nickname=nickname, expires_at__lte=now).delete()[0]:
+        return _insert(nickname, expires_at)
+    return False
+
+
+def acquire_first_lease(nicknames: Iterable[str]) -> str | None:
+    """Lease the first name of `nicknames` nobody else holds, in order."""
+    for nickname in nicknames:
+        if acquire_lease(nickname):
+            return nickname
+    return None
+
+
+def acquire_leases(nicknames: Iterable[str]) -> list[str]:
+    """
+    Bulk acquire_lease: lease every name nobody else holds, in a fixed
+    number of queries (reclaim dead leases, one INSERT, read back the winners).
+    """
+    nicknames = list(dict.fromkeys(nicknames))
+    if not nicknames:
+        return []
+
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.NICKNAME_LEASE_TTL)
+
+    NicknameLease.objects.filter(nickname__in=nicknames, expires_at__lte=now).delete()
+    NicknameLease.objects.bulk_create(
+        [NicknameLease(nickname=n, expires_at=expires_at) for n in nicknames],
+        ignore_conflicts=True,
+    )
+    # ours are the rows carrying our deadline
+    held = set(
+        NicknameLease.objects.filter(nickname__in=nicknames, expires_at=expires_at).values_list("nickname", flat=True)
+    )
+    return [n for n in nicknames if n in held]
+
+
+def release_leases(nicknames: Iterable[str]) -> None:
+    NicknameLease.objects.filter(nickname__in=list(nicknames)).delete()
+
+
+def release_lease(nickname: str) -> None:
+    """Give a leased name back (the request failed before using it)."""
+    NicknameLease.objects.filter(nickname=nickname).delete()
+
+
+def sweep_expired_leases() -> int:
+    """Delete dead leases. Returns how many were removed."""
+    deleted, _rows = NicknameLease.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+# savepoints need the sync ORM
+aacquire_lease = sync_to_async(acquire_lease)
+aacquire_first_lease = sync_to_async(acquire_first_lease)
+
+
+async def arelease_lease(nickname: str) -> None:
+    await NicknameLease.objects.filter(nickname=nickname).adelete()
@@ -0,0 +1,108 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+
+from minecraft.models import MinecraftAccount
+
+# index name -> bytes, per backend; None where the engine can't tell
+_INDEX_SIZE_SQL = {
+    "mysql": (
+        "SELECT index_name, stat_value * @@innodb_page_size FROM mysql.innodb_index_stats "
+        "WHERE database_name = DATABASE() AND table_name = %s AND stat_name = 'size'"
+    ),
+    "postgresql": "SELECT indexrelname, pg_relation_size(indexrelid) FROM pg_stat_user_indexes WHERE relname = %s",
+    # needs SQLITE_ENABLE_DBSTAT_VTAB, which most builds have
+    "sqlite": (
+        "SELECT name, SUM(pgsize) FROM dbstat WHERE name IN "
+        "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s) GROUP BY name"
+    ),
+}
+
+
+def index_sizes(table: str) -> list[tuple[str, int]] | None:
+    sql = _INDEX_SIZE_SQL.get(connection.vendor)
+    if sql is None:
+        return None
+    if connection.vendor == "mysql":
+        with connection.cursor() as cursor:
+            # innodb_index_stats is only as fresh as the last ANALYZE
+            cursor.execute(f"ANALYZE TABLE {connection.ops.quote_name(table)}")
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            return sorted((name, int(size)) for name, size in cursor.fetchall())
+    except DatabaseError:
+        return None
+
+
+def sample_keys(table: str, limit: int) -> list[tuple]:
+    """
+    Up to `limit` stored (uuid, nickname) pairs, read from a random starting
+    id so keys of every age get hit.
+
+    Raw SQL throughout: values go back exactly as the column stores them, so
+    the same command measures the schema before and after a migration.
+    """
+    quote = connection.ops.quote_name
+    query = (
+        f"SELECT {quote('uuid')}, {quote('nickname')} FROM {quote(table)} "
+        f"WHERE {quote('uuid')} IS NOT NULL AND {quote('id')} {{}} %s ORDER BY {quote('id')} LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MAX({quote('id')}) FROM {quote(table)}")
+        start = random.randint(0, cursor.fetchone()[0] or 0)
+        cursor.execute(query.format(">="), [start, limit])
+        rows = cursor.fetchall()
+        if len(rows) < limit:
+            cursor.execute(query.format("<"), [start, limit - len(rows)])
+            rows += cursor.fetchall()
+    return rows
+
+
+def time_lookups(table: str, column: str, values: list) -> list[float]:
+    """Seconds per single-row lookup by `column`, one query per value."""
+    quote = connection.ops.quote_name
+    query = f"SELECT {quote('id')} FROM {quote(table)} WHERE {quote(column)} = %s"
+    timings = []
+    with connection.cursor() as cursor:
+        for value in values:
+            started = time.perf_counter()
+            cursor.execute(query, [value])
+            cursor.fetchone()
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+class Command(BaseCommand):
+    help = (
+        "Report MinecraftAccount index sizes and time point lookups by uuid and nickname. "
+        "Run it before and after a storage migration to compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lookups", type=int, default=1000, help="Lookups per column (default 1000).")
+
+    def handle(self, *args, **options):
+        table = MinecraftAccount._meta.db_table
+        sizes = index_sizes(table)
+        if sizes is None:
+            self.stdout.write(f"[INFO] index sizes unavailable on {connection.vendor}")
+        else:
+            for name, size in sizes:
+                self.stdout.write(f"[INFO] index {name}: {size / 1024:.1f} KiB")
+
+        sample = sample_keys(table, options["lookups"])
+        if not sample:
+            raise CommandError("No MinecraftAccount with a uuid to look up.")
+
+        for column, values in (("uuid", [row[0] for row in sample]), ("nickname", [row[1] for row in sample])):
+            timings = sorted(time_lookups(table, column, values))
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(self.style.SUCCESS(
+                f"[INFO] lookup by {column}: {len(timings)} queries, "
+                f"mean {statistics.mean(timings) * 1000:.3f} ms, "
+                f"p50 {statistics.median(timings) * 1000:.3f} ms, p95 {p95 * 1000:.3f} ms"
+            ))
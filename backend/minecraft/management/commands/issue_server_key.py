@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from minecraft.models import MinecraftServer
+from minecraft.servers import issue_key, rotate_key
+
+
+class Command(BaseCommand):
+    help = (
+        "Issue an API key for a Minecraft server (created if missing) and print it once. "
+        "With --rotate the server's other keys expire after the grace period."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", help="Server name, e.g. survival-1")
+        parser.add_argument("--rotate", action="store_true", help="Retire the server's current keys after --grace seconds.")
+        parser.add_argument("--grace", type=int, default=None, help="Override MINECRAFT_SERVER_KEY_ROTATION_GRACE (seconds).")
+
+    def handle(self, *args, **options):
+        server, created = MinecraftServer.objects.get_or_create(name=options["name"])
+        raw_key = rotate_key(server, options["grace"]) if options["rotate"] else issue_key(server)
+
+        if created:
+            self.stdout.write(self.style.SUCCESS(f"[INFO] created server {server.name}"))
+        # the only time the key is ever shown
+        self.stdout.write(raw_key)
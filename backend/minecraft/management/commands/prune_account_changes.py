@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from minecraft.changes import prune_changes
+
+
+class Command(BaseCommand):
+    help = "Delete change feed entries older than MINECRAFT_CHANGES_RETENTION_DAYS (see changes.py). Safe to run from cron."
+
+    def handle(self, *args, **options):
+        count = prune_changes()
+        self.stdout.write(self.style.SUCCESS(f"[INFO] pruned {count} change feed row(s)"))
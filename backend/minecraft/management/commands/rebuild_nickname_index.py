@@ -0,0 +1,49 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections
+
+from minecraft.availability import get_nickname_index, taken_nicknames
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the node-wide nickname availability index (Bloom filter) from MinecraftAccount "
+        "(one-shot or --loop). Requests never rebuild it themselves."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Run forever as the node's background rebuilder")
+        parser.add_argument(
+            "--interval", type=float, default=settings.NICKNAME_INDEX_MAX_AGE / 2,
+            help="Seconds between rebuilds in --loop mode (default: half of NICKNAME_INDEX_MAX_AGE)",
+        )
+
+    def handle(self, *args, **options):
+        index = get_nickname_index()
+        if index is None:
+            raise CommandError("Nickname index is disabled (NICKNAME_INDEX_ENABLED=False).")
+
+        while True:
+            try:
+                self._rebuild(index)
+            except DatabaseError as exc:
+                if not options["loop"]:
+                    raise
+                # DB hiccup: keep the loop alive, next tick will retry
+                self.stdout.write(self.style.WARNING(f"[fail] {exc}"))
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+            close_old_connections()
+
+    def _rebuild(self, index):
+        started = time.perf_counter()
+        count = index.rebuild(taken_nicknames())
+        elapsed = time.perf_counter() - started
+
+        where = index.path or "process memory"
+        self.stdout.write(self.style.SUCCESS(
+            f"[INFO] indexed {count} nickname(s) in {elapsed:.2f}s -> {where}"
+        ))
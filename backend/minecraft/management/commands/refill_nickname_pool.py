@@ -0,0 +1,56 @@
+import time
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from minecraft.pool import bucket_key, pool_size, refill_pool
+
+
+class Command(BaseCommand):
+    help = "Keep the pre-generated nickname pool above its low-water mark (one-shot or --loop)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--bucket",
+            nargs="+",
+            default=None,
+            help='Buckets as "gender:nationality" (e.g. "male:UA", ":US", ":"). Default: NICKNAME_POOL_BUCKETS',
+        )
+        parser.add_argument("--low-water", type=int, default=settings.NICKNAME_POOL_LOW_WATER, help="Refill when a bucket drops below this size")
+        parser.add_argument("--target", type=int, default=settings.NICKNAME_POOL_TARGET, help="Size to refill a bucket up to")
+        parser.add_argument("--loop", action="store_true", help="Run forever as a background refiller")
+        parser.add_argument("--interval", type=float, default=30.0, help="Seconds between checks in --loop mode")
+
+    def handle(self, *args, **options):
+        if options["target"] < options["low_water"]:
+            raise CommandError("--target must be >= --low-water")
+
+        buckets = []
+        for raw in options["bucket"] or settings.NICKNAME_POOL_BUCKETS:
+            gender, _sep, nationality = raw.partition(":")
+            buckets.append(bucket_key(gender, nationality))
+
+        while True:
+            for gender, nationality in buckets:
+                self._refill_bucket(gender, nationality, options["low_water"], options["target"])
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+    def _refill_bucket(self, gender, nationality, low_water, target):
+        label = f"{gender or '*'}:{nationality or '*'}"
+        size = pool_size(gender, nationality)
+
+        if size >= low_water:
+            self.stdout.write(f"[skip] {label} has {size} candidate(s)")
+            return
+
+        try:
+            added = refill_pool(gender, nationality, target)
+        except (requests.RequestException, RuntimeError) as exc:
+            # provider hiccup: keep the loop alive, next tick will retry
+            self.stdout.write(self.style.WARNING(f"[fail] {label}: {exc}"))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"[ok] {label}: +{added} candidate(s)"))
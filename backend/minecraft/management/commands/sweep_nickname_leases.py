@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from minecraft.leases import sweep_expired_leases
+
+
+class Command(BaseCommand):
+    help = "Delete expired nickname leases (see minecraft/leases.py). Safe to run from cron."
+
+    def handle(self, *args, **options):
+        count = sweep_expired_leases()
+        self.stdout.write(self.style.SUCCESS(f"[INFO] swept {count} expired lease(s)"))
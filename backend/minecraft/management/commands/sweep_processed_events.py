@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from minecraft.services import sweep_processed_events
+
+
+class Command(BaseCommand):
+    help = "Forget event idempotency keys older than MINECRAFT_EVENT_KEY_TTL (see services.apply_events). Safe to run from cron."
+
+    def handle(self, *args, **options):
+        count = sweep_processed_events()
+        self.stdout.write(self.style.SUCCESS(f"[INFO] swept {count} processed event key(s)"))
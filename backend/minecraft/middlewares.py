@@ -0,0 +1,42 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .servers import log_server_request
+
+
+class ServerAccountingMiddleware:
+    """
+    Logs method, path, status and duration of every request a Minecraft server
+    made (one the server-key permission tagged with `minecraft_server`), so
+    traffic and latency can be broken down per server.
+
+    Sync and async capable, so async views under ASGI don't pay a thread hop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.account(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.account(request, response, started)
+        return response
+
+    @staticmethod
+    def account(request, response, started):
+        identity = getattr(request, "minecraft_server", None)
+        if identity is not None:
+            log_server_request(identity, request.method, request.path, response.status_code, time.perf_counter() - started)
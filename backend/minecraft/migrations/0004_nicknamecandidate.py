@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecraft', '0003_minecraftaccount_owner_alter_minecraftaccount_uuid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NicknameCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nickname', models.CharField(max_length=255, unique=True)),
+                ('gender', models.CharField(blank=True, default='', max_length=16)),
+                ('nationality', models.CharField(blank=True, default='', max_length=8)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['gender', 'nationality', 'id'], name='mc_nickpool_bucket_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecraft', '0005_nicknamelease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='minecraftaccount',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecraft', '0009_minecraftserver_serverkey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountPlaytime',
+            fields=[
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='playtime', serialize=False, to='minecraft.minecraftaccount')),
+                ('seconds', models.BigIntegerField(default=0)),
+                ('last_seen_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
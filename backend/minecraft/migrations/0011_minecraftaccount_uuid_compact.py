@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:55
+
+from django.db import migrations
+
+import minecraft.fields
+from ._nickname_renames import NICKNAME_PATTERN, rename_accounts
+
+
+def fix_nicknames(apps, schema_editor):
+    """
+    0013 narrows nickname to 16 ASCII characters, which MySQL would truncate
+    or reject half-way through. Rename what doesn't fit first: invalid
+    characters become "_", long names are cut, and a `_N` suffix keeps the
+    result unique.
+    """
+    rename_accounts(apps, schema_editor, lambda MinecraftAccount: MinecraftAccount.objects.exclude(nickname__regex=NICKNAME_PATTERN))
+
+
+class Migration(migrations.Migration):
+    # one transaction per chunk of renames instead of one for the whole table
+    atomic = False
+
+    dependencies = [
+        ('minecraft', '0010_accountplaytime'),
+    ]
+
+    operations = [
+        migrations.RunPython(fix_nicknames, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='minecraftaccount',
+            name='uuid_compact',
+            field=minecraft.fields.CompactUUIDField(blank=True, null=True),
+        ),
+    ]
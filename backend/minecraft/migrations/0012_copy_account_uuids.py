@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:55
+"""
+Copy MinecraftAccount.uuid into uuid_compact in id order, CHUNK rows per
+transaction: the table stays writable, and an interrupted run simply
+starts over (the copy is idempotent).
+"""
+import uuid
+
+from django.db import migrations
+
+CHUNK = 2000
+
+
+def _copy(apps, source, target, convert):
+    MinecraftAccount = apps.get_model("minecraft", "MinecraftAccount")
+    last_id = 0
+    while True:
+        rows = list(
+            MinecraftAccount.objects
+            .filter(pk__gt=last_id, **{f"{source}__isnull": False})
+            .order_by("pk")
+            .values_list("pk", source)[:CHUNK]
+        )
+        if not rows:
+            return
+        MinecraftAccount.objects.bulk_update(
+            [MinecraftAccount(pk=pk, **{target: convert(pk, value)}) for pk, value in rows],
+            [target],
+        )
+        last_id = rows[-1][0]
+
+
+def _canonical(pk, value):
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        raise RuntimeError(f"MinecraftAccount {pk} has a malformed uuid {value!r}; fix or clear it first")
+
+
+def forwards(apps, schema_editor):
+    _copy(apps, "uuid", "uuid_compact", _canonical)
+
+
+def backwards(apps, schema_editor):
+    _copy(apps, "uuid_compact", "uuid", lambda pk, value: value)
+
+
+class Migration(migrations.Migration):
+    # one transaction per chunk instead of one for the whole table
+    atomic = False
+
+    dependencies = [
+        ('minecraft', '0011_minecraftaccount_uuid_compact'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards, elidable=True),
+    ]
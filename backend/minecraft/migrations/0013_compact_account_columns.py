@@ -0,0 +1,84 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:55
+
+import uuid
+
+from django.db import migrations
+
+import minecraft.fields
+
+CHUNK = 2000
+
+
+def _canonical(pk, value):
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        raise RuntimeError(f"MinecraftAccount {pk} has a malformed uuid {value!r}; fix or clear it first")
+
+
+def recopy_changed_uuids(apps, schema_editor):
+    """
+    0012 copied chunk by chunk while the table stayed writable, so a uuid
+    set, changed or cleared after its chunk was copied is stale in
+    uuid_compact. Compare both columns once more and fix those rows before
+    the old column goes.
+
+    On PostgreSQL writes are held off from here until this migration
+    commits, past RemoveField. MySQL can't do DDL inside a transaction: run
+    this one with account writes stopped, or accept the seconds between
+    the recopy and the ALTER.
+    """
+    MinecraftAccount = apps.get_model("minecraft", "MinecraftAccount")
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            "LOCK TABLE %s IN SHARE MODE" % schema_editor.quote_name(MinecraftAccount._meta.db_table)
+        )
+
+    last_id = 0
+    while True:
+        rows = list(
+            MinecraftAccount.objects
+            .filter(pk__gt=last_id)
+            .order_by("pk")
+            .values_list("pk", "uuid", "uuid_compact")[:CHUNK]
+        )
+        if not rows:
+            return
+        stale = []
+        for pk, old, compact in rows:
+            expected = _canonical(pk, old) if old else None
+            if expected != compact:
+                stale.append(MinecraftAccount(pk=pk, uuid_compact=expected))
+        if stale:
+            MinecraftAccount.objects.bulk_update(stale, ["uuid_compact"])
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecraft', '0012_copy_account_uuids'),
+    ]
+
+    operations = [
+        migrations.RunPython(recopy_changed_uuids, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='minecraftaccount',
+            name='uuid',
+        ),
+        migrations.RenameField(
+            model_name='minecraftaccount',
+            old_name='uuid_compact',
+            new_name='uuid',
+        ),
+        migrations.AlterField(
+            model_name='minecraftaccount',
+            name='uuid',
+            field=minecraft.fields.CompactUUIDField(blank=True, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='minecraftaccount',
+            name='nickname',
+            field=minecraft.fields.AsciiCharField(max_length=16, unique=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:58
+
+import django.db.models.functions.text
+import minecraft.constraints
+from django.db import migrations
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Lower
+
+from ._nickname_renames import rename_accounts
+
+
+def _case_duplicates(MinecraftAccount):
+    """Accounts whose nickname an older account already has in another case."""
+    older = MinecraftAccount.objects.filter(pk__lt=OuterRef("pk")).alias(
+        nickname_ci=Lower("nickname"),
+    ).filter(nickname_ci=Lower(OuterRef("nickname")))
+    return MinecraftAccount.objects.filter(Exists(older))
+
+
+def rename_case_duplicates(apps, schema_editor):
+    """
+    Keep each name with its oldest account and give the others a `_N`
+    suffix, the same way 0011 renames names that don't fit.
+    """
+    rename_accounts(apps, schema_editor, _case_duplicates)
+
+
+class Migration(migrations.Migration):
+    # one transaction per chunk of renames instead of one for the whole table
+    atomic = False
+
+    dependencies = [
+        ('minecraft', '0013_compact_account_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_case_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='minecraftaccount',
+            constraint=minecraft.constraints.CaseInsensitiveUniqueConstraint(django.db.models.functions.text.Lower('nickname'), name='minecraft_account_nickname_ci_unique'),
+        ),
+    ]
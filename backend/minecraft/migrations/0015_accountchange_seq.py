@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:05
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def number_existing_changes(apps, schema_editor):
+    """Entries already in the table are committed: their seq is their id, so cursors servers hold stay valid."""
+    AccountChange = apps.get_model("minecraft", "AccountChange")
+    ChangeSequence = apps.get_model("minecraft", "ChangeSequence")
+    last = AccountChange.objects.aggregate(last=Max("id"))["last"] or 0
+    AccountChange.objects.filter(id__lte=last).update(seq=F("id"))
+    ChangeSequence.objects.update_or_create(pk=1, defaults={"last": last})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecraft', '0014_minecraftaccount_nickname_ci_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accountchange',
+            name='seq',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last', models.BigIntegerField(default=0)),
+                ('pruned_through', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(number_existing_changes, migrations.RunPython.noop),
+    ]
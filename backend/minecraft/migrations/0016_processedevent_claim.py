@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecraft', '0015_accountchange_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processedevent',
+            name='claim',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='processedevent',
+            name='key',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
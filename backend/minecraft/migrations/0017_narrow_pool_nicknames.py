@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:40
+
+import minecraft.fields
+from django.db import migrations
+
+from ._nickname_renames import NICKNAME_PATTERN
+
+
+def purge_unusable_names(apps, schema_editor):
+    """
+    Pooled candidates and leases are disposable: the pool refills and a lease
+    only lives for one link attempt. Names that could never become an
+    account are dropped instead of renamed, so the columns can shrink.
+    """
+    for model_name in ("NicknameCandidate", "NicknameLease"):
+        model = apps.get_model("minecraft", model_name)
+        model.objects.exclude(nickname__regex=NICKNAME_PATTERN).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minecraft', '0016_processedevent_claim'),
+    ]
+
+    operations = [
+        migrations.RunPython(purge_unusable_names, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='nicknamecandidate',
+            name='nickname',
+            field=minecraft.fields.AsciiCharField(max_length=16, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='nicknamelease',
+            name='nickname',
+            field=minecraft.fields.AsciiCharField(max_length=16, unique=True),
+        ),
+    ]
@@ -0,0 +1,56 @@
+"""
+Account renames shared by the data migrations that make nicknames fit a new
+rule (0011: Minecraft's charset and length, 0014: unique in any case).
+
+Works on the historical models it is handed. The leading underscore keeps
+the migration loader from taking this module for a migration.
+"""
+import logging
+import re
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# frozen copies of minecraft.models constants
+NICKNAME_MAX_LENGTH = 16
+NICKNAME_PATTERN = rf"^[A-Za-z0-9_]{{1,{NICKNAME_MAX_LENGTH}}}$"
+TRACKED_FIELDS = ("nickname", "uuid", "is_dead", "dead_at", "is_active", "deactivated_at")
+CHUNK = 500
+
+
+def free_nickname(MinecraftAccount, nickname: str) -> str:
+    """`nickname` cut down to what Minecraft accepts, with `_N` appended until no account has it in any case."""
+    base = re.sub(r"[^A-Za-z0-9_]+", "_", nickname).strip("_")[:NICKNAME_MAX_LENGTH] or "player"
+    candidate, n = base, 1
+    while MinecraftAccount.objects.filter(nickname__iexact=candidate).exists():
+        n += 1
+        suffix = f"_{n}"
+        candidate = base[:NICKNAME_MAX_LENGTH - len(suffix)] + suffix
+    return candidate
+
+
+def rename_accounts(apps, schema_editor, pending) -> None:
+    """
+    Give every account of `pending(MinecraftAccount)` a free_nickname(), in
+    chunks of CHUNK per transaction. Every rename is logged and lands in the
+    change feed, so servers mirroring the roster pick it up.
+    """
+    MinecraftAccount = apps.get_model("minecraft", "MinecraftAccount")
+    AccountChange = apps.get_model("minecraft", "AccountChange")
+    last_id = 0
+    while True:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            accounts = list(pending(MinecraftAccount).filter(pk__gt=last_id).order_by("pk")[:CHUNK])
+            if not accounts:
+                return
+            for account in accounts:
+                old = account.nickname
+                account.nickname = free_nickname(MinecraftAccount, old)
+                account.save(update_fields=["nickname", "updated_at"])
+                AccountChange.objects.create(
+                    account_id=account.pk, action="updated", fields=["nickname"],
+                    state={name: getattr(account, name) for name in TRACKED_FIELDS},
+                )
+                logger.warning("MinecraftAccount %s renamed: %r -> %r", account.pk, old, account.nickname)
+        last_id = accounts[-1].pk
@@ -1,9 +1,31 @@
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, models, transaction
+from django.db.models.functions import Lower
 from accounts.models import GameToken, User
+from .constraints import CaseInsensitiveUniqueConstraint
+from .fields import AsciiCharField, CompactUUIDField
+
+# Minecraft's own limit; suffixed names (`base_N`) are trimmed to fit too
+NICKNAME_MAX_LENGTH = 16
+# what a Minecraft name may look like; migrations 0011 / 0017 hold existing rows to the same rule
+# (frozen copy in migrations/_nickname_renames.py)
+NICKNAME_PATTERN = rf"^[A-Za-z0-9_]{{1,{NICKNAME_MAX_LENGTH}}}$"
+# name appears in IntegrityError reports, see services.is_nickname_clash()
+NICKNAME_CI_CONSTRAINT = "minecraft_account_nickname_ci_unique"
+
+
+class MinecraftAccountQuerySet(models.QuerySet):
+    def nicknamed(self, *nicknames):
+        """Accounts having any of `nicknames`, in any case, through the case-insensitive unique index."""
+        if connections[self.db].vendor == "mysql":
+            # the ascii_general_ci column compares case-insensitively on its own
+            return self.filter(nickname__in=nicknames)
+        return self.alias(nickname_ci=Lower("nickname")).filter(nickname_ci__in={n.lower() for n in nicknames})
+
 
 class MinecraftAccount(models.Model):
-    nickname = models.CharField(max_length=255, unique=True)
-    uuid = models.CharField(max_length=64, unique=True, blank=True, null=True)
+    nickname = AsciiCharField(max_length=NICKNAME_MAX_LENGTH, unique=True)
+    uuid = CompactUUIDField(unique=True, blank=True, null=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="minecraft_accounts")
     token = models.OneToOneField(GameToken, on_delete=models.CASCADE, related_name='minecraft_account')
 
@@ -13,6 +35,176 @@ class MinecraftAccount(models.Model):
     is_active = models.BooleanField(default=True)
     deactivated_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # bulk writes (bulk_update, .update()) must set it themselves
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # fields whose changes land in the AccountChange feed
+    TRACKED_FIELDS = ("nickname", "uuid", "is_dead", "dead_at", "is_active", "deactivated_at")
+
+    objects = MinecraftAccountQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Minecraft names are case-insensitive; also the index behind nicknamed()
+            CaseInsensitiveUniqueConstraint(Lower("nickname"), name=NICKNAME_CI_CONSTRAINT),
+        ]
+
+    def __str__(self):
+        return self.nickname
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember what was loaded, so post_save can tell what a save changed
+        instance._loaded_state = instance.tracked_state()
+        return instance
+
+    def tracked_state(self) -> dict:
+        # deferred fields are left out instead of being fetched one by one
+        deferred = self.get_deferred_fields()
+        return {name: getattr(self, name) for name in self.TRACKED_FIELDS if name not in deferred}
+
+    def save(self, *args, **kwargs):
+        # the change log row (post_save) commits or rolls back with the save
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+class NicknameCandidate(models.Model):
+    """
+    Pre-generated nickname waiting to be handed out by the link-token flow.
+
+    Rows are already normalized and were free at refill time. They are
+    bucketed by the same `gender`/`nationality` params the view accepts
+    ("" means the candidate was generated without that filter).
+    """
+    nickname = AsciiCharField(max_length=NICKNAME_MAX_LENGTH, unique=True)
+    gender = models.CharField(max_length=16, blank=True, default="")
+    nationality = models.CharField(max_length=8, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["gender", "nationality", "id"], name="mc_nickpool_bucket_idx"),
+        ]
+
+    def __str__(self):
+        return self.nickname
+
+
+class NicknameLease(models.Model):
+    """
+    Short-lived claim on a nickname that a link-token request is about to use.
+
+    The unique constraint makes acquiring atomic: whoever inserts the row
+    owns the name until `expires_at`, so concurrent requests never pick the
+    same free name. Expired rows are dead and get swept.
+    """
+    nickname = AsciiCharField(max_length=NICKNAME_MAX_LENGTH, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.nickname
+
+
+class AccountChange(models.Model):
+    """
+    Append-only log of MinecraftAccount state changes, written in the same
+    transaction as the change itself. `seq` is the cursor of
+    GET /api/minecraft/changes/: it is handed out after commit, in commit
+    order (see changes.py), and stays NULL until then.
+
+    `state` is the account's tracked fields after the change, so replaying
+    the feed in order reproduces the current state; `fields` names what changed.
+    """
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    ACTIONS = [(CREATED, "created"), (UPDATED, "updated"), (DELETED, "deleted")]
+
+    # no FK: entries must outlive deleted accounts
+    account_id = models.BigIntegerField(db_index=True)
+    action = models.CharField(max_length=8, choices=ACTIONS)
+    fields = models.JSONField(default=list)
+    state = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    seq = models.BigIntegerField(null=True, blank=True, unique=True)
+
+    def __str__(self):
+        return f"{self.action} #{self.account_id}"
+
+
+class ChangeSequence(models.Model):
+    """
+    Single row: the last AccountChange.seq handed out, and the highest one
+    pruned (cursors below it can't be resumed). Locking it serializes
+    changes.sequence_changes().
+    """
+    last = models.BigIntegerField(default=0)
+    pruned_through = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"seq {self.last}"
+
+
+class ProcessedEvent(models.Model):
+    """
+    Idempotency key of a state event a server already sent (see
+    services.apply_events), prefixed with the server's namespace. The unique
+    key makes a retried event a no-op; rows are swept after
+    MINECRAFT_EVENT_KEY_TTL. `claim` tells the call that stored a key apart
+    from concurrent ones.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    processed_at = models.DateTimeField(db_index=True)
+    claim = models.UUIDField(null=True, blank=True)
+
+    def __str__(self):
+        return self.key
+
+
+class MinecraftServer(models.Model):
+    """
+    A game server allowed to call the server-only endpoints.
+
+    Authenticates with any of its ServerKeys; more than one is valid at a
+    time while a key is being rotated.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    is_active = models.BooleanField(default=True)
+    # e.g. "600/min"; empty = MINECRAFT_SERVER_THROTTLE_RATE
+    throttle_rate = models.CharField(max_length=32, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ServerKey(models.Model):
+    """
+    API key of a MinecraftServer. Only the SHA-256 of the key is stored
+    (keys are random 256-bit strings, so a fast hash is enough); `prefix`
+    is kept to tell keys apart.
+    """
+    server = models.ForeignKey(MinecraftServer, on_delete=models.CASCADE, related_name="keys")
+    key_hash = models.CharField(max_length=64, unique=True)
+    prefix = models.CharField(max_length=8)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # set on rotation: the old key keeps working until then
+    expires_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.server.name}:{self.prefix}…"
+
+
+class AccountPlaytime(models.Model):
+    """
+    Accumulated playtime of a MinecraftAccount, fed by server heartbeats
+    through the write-behind buffer in playtime.py (kept out of
+    MinecraftAccount so heartbeats don't touch its updated_at / change feed).
+    """
+    account = models.OneToOneField(MinecraftAccount, on_delete=models.CASCADE, primary_key=True, related_name="playtime")
+    seconds = models.BigIntegerField(default=0)
+    last_seen_at = models.DateTimeField(blank=True, null=True)
 
     def __str__(self):
-        return self.nickname
\ No newline at end of file
+        return f"{self.account_id}: {self.seconds}s"
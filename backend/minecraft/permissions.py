@@ -0,0 +1,25 @@
+from rest_framework.permissions import BasePermission
+
+from .servers import lookup_server, tag_request
+
+
+class HasMinecraftServerKey(BasePermission):
+    """
+    Allows access only if request contains the key of an active MinecraftServer
+    (or the legacy global MINECRAFT_API_KEY), see servers.py.
+    This is *not* per-user auth. This is per-server auth.
+
+    The server is tagged on the request as `request.minecraft_server`.
+    """
+
+    # Incoming header should be:  X-Server-Key: <key>
+    # Django/DRF exposes that as request.META["HTTP_X_SERVER_KEY"]
+    header_name = "HTTP_X_SERVER_KEY"
+
+    def has_permission(self, request, view):
+        identity = lookup_server(request.META.get(self.header_name))
+        if identity is None:
+            return False
+
+        tag_request(request, identity)
+        return True
@@ -0,0 +1,221 @@
+"""
+Write-behind buffer for playtime heartbeats.
+
+Servers send, every few seconds, one heartbeat per online player
+(POST heartbeats/). Instead of one UPDATE each, heartbeats are merged per
+account in a per-process buffer and written in bulk: a couple of statements
+per MINECRAFT_PLAYTIME_FLUSH_INTERVAL seconds, or as soon as
+MINECRAFT_PLAYTIME_FLUSH_MAX_ACCOUNTS accounts are pending.
+
+Exactly-once bookkeeping:
+
+- every heartbeat batch carries a key (per server). Batches stay apart in
+  the buffer until the flush, which stores their keys (ProcessedEvent) in
+  the same transaction as the seconds: a key is only ever stored together
+  with its playtime, and a batch whose key another worker stored first is
+  dropped there;
+- a retry of a batch that is already flushed, or still pending in this
+  process, is answered as a duplicate right away;
+- a failed flush puts its batches back into the buffer;
+- the buffer is flushed when the worker exits (atexit, which graceful
+  shutdowns run). Only a hard kill loses the last interval's heartbeats,
+  and their keys with them, so the server may resend those.
+"""
+import atexit
+import logging
+import threading
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Case, DateTimeField, F, Q, Value, When
+from django.utils import timezone
+
+from .models import AccountPlaytime, MinecraftAccount, ProcessedEvent
+from .servers import ServerIdentity
+
+logger = logging.getLogger(__name__)
+
+# rows per UPDATE ... CASE statement
+_FLUSH_CHUNK = 500
+
+
+def heartbeat_key(server: ServerIdentity, key: str) -> str:
+    """The ProcessedEvent key of batch `key` from `server`."""
+    return f"heartbeat:{server.namespace}:{key}"
+
+
+def batch_flushed(key: str) -> bool:
+    """Has a batch with this heartbeat_key() been written already (by any worker)?"""
+    return ProcessedEvent.objects.filter(key=key).exists()
+
+
+def _merge(batch: dict, ref, seconds, seen_at) -> None:
+    entry = batch.setdefault(ref, [0, None])
+    entry[0] += seconds
+    if entry[1] is None or seen_at > entry[1]:
+        entry[1] = seen_at
+
+
+class PlaytimeBuffer:
+    """
+    Pending playtime per batch key, then per account, keyed by
+    ("id", account_id) or ("uuid", uuid) (uuids are resolved at flush time,
+    with one query for all of them). Heartbeats added without a key are
+    merged into one batch that is never deduplicated.
+    """
+
+    def __init__(self):
+        self._batches: dict[str | None, dict] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+
+    def add(self, heartbeats: list[dict], key: str | None = None) -> bool:
+        """
+        Buffer validated heartbeats (`account_id` or `uuid`, `seconds`,
+        optional `at`) as batch `key`. False if that batch is already pending.
+        """
+        now = timezone.now()
+        with self._lock:
+            if key is not None and key in self._batches:
+                return False
+            batch = self._batches.setdefault(key, {})
+            for beat in heartbeats:
+                ref = ("id", beat["account_id"]) if "account_id" in beat else ("uuid", beat["uuid"])
+                _merge(batch, ref, beat["seconds"], beat.get("at") or now)
+            size = self._size()
+            self._schedule()
+
+        if size >= settings.MINECRAFT_PLAYTIME_FLUSH_MAX_ACCOUNTS:
+            self.flush()
+        return True
+
+    def _size(self) -> int:
+        # caller holds _lock
+        return sum(len(batch) for batch in self._batches.values())
+
+    def _schedule(self) -> None:
+        # caller holds _lock
+        if self._timer is None:
+            self._timer = threading.Timer(settings.MINECRAFT_PLAYTIME_FLUSH_INTERVAL, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            # totals are back in the buffer and another flush is scheduled
+            logger.exception("playtime flush failed")
+        finally:
+            # every timer is a new thread with its own connection
+            connection.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._size()
+
+    def flush(self) -> int:
+        """Write everything pending. Returns the number of accounts updated."""
+        # one flush at a time, so batches put back by a failed one aren't raced by another
+        with self._flush_lock:
+            with self._lock:
+                batches, self._batches = self._batches, {}
+            if not batches:
+                return 0
+            try:
+                return self._write(batches)
+            except Exception:
+                with self._lock:
+                    for key, batch in batches.items():
+                        if key is None:
+                            for ref, (seconds, seen_at) in batch.items():
+                                _merge(self._batches.setdefault(None, {}), ref, seconds, seen_at)
+                        else:
+                            # a resend accepted meanwhile holds the same heartbeats
+                            self._batches.setdefault(key, batch)
+                    self._schedule()
+                raise
+
+    @staticmethod
+    def _write(batches: dict) -> int:
+        with transaction.atomic():
+            keys = [key for key in batches if key is not None]
+            if keys:
+                # stored with the seconds below; keys another worker stored first are its batches
+                now, claim = timezone.now(), uuid4()
+                ProcessedEvent.objects.bulk_create(
+                    [ProcessedEvent(key=key, processed_at=now, claim=claim) for key in keys], ignore_conflicts=True,
+                )
+                claimed = set(ProcessedEvent.objects.filter(key__in=keys, claim=claim).values_list("key", flat=True))
+            else:
+                claimed = set()
+
+            pending: dict = {}
+            for key, batch in batches.items():
+                if key is None or key in claimed:
+                    for ref, (seconds, seen_at) in batch.items():
+                        _merge(pending, ref, seconds, seen_at)
+            return PlaytimeBuffer._credit(pending)
+
+    @staticmethod
+    def _credit(pending: dict) -> int:
+        # inside _write's transaction
+        totals: dict[int, list] = {}
+        uuids = [value for kind, value in pending if kind == "uuid"]
+        ids = [value for kind, value in pending if kind == "id"]
+        if not uuids and not ids:
+            return 0
+        rows = list(MinecraftAccount.objects.filter(Q(uuid__in=uuids) | Q(pk__in=ids)).values_list("pk", "uuid"))
+        by_uuid = {uuid: pk for pk, uuid in rows if uuid}
+        existing = {pk for pk, _uuid in rows}
+
+        for (kind, value), (seconds, seen_at) in pending.items():
+            pk = by_uuid.get(value) if kind == "uuid" else (value if value in existing else None)
+            if pk is None:
+                continue  # unknown account: nothing to credit
+            total = totals.setdefault(pk, [0, seen_at])
+            total[0] += seconds
+            total[1] = max(total[1], seen_at)
+
+        pks = list(totals)
+        if not pks:
+            return 0
+        AccountPlaytime.objects.bulk_create([AccountPlaytime(account_id=pk) for pk in pks], ignore_conflicts=True)
+        for start in range(0, len(pks), _FLUSH_CHUNK):
+            chunk = pks[start:start + _FLUSH_CHUNK]
+            AccountPlaytime.objects.filter(account_id__in=chunk).update(
+                seconds=F("seconds") + Case(
+                    *[When(account_id=pk, then=Value(totals[pk][0])) for pk in chunk],
+                    output_field=BigIntegerField(),
+                ),
+                last_seen_at=Case(
+                    *[When(account_id=pk, then=Value(totals[pk][1])) for pk in chunk],
+                    output_field=DateTimeField(),
+                ),
+            )
+        return len(pks)
+
+
+_buffer: PlaytimeBuffer | None = None
+_buffer_lock = threading.Lock()
+
+
+def get_playtime_buffer() -> PlaytimeBuffer:
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = PlaytimeBuffer()
+            atexit.register(_flush_on_exit)
+    return _buffer
+
+
+def _flush_on_exit() -> None:
+    if _buffer is not None and len(_buffer):
+        try:
+            _buffer.flush()
+        except Exception:
+            logger.exception("playtime flush on shutdown failed, %d account(s) lost", len(_buffer))
@@ -0,0 +1,142 @@
+from django.conf import settings
+
+from .availability import ais_available, filter_available, is_available
+from .leases import aacquire_lease, acquire_lease, acquire_leases
+from .models import NicknameCandidate
+from .utils import _engine_with_fallback
+
+
+def bucket_key(gender: str | None, nationality: str | None) -> tuple[str, str]:
+    """Normalize view params into the (gender, nationality) pool bucket."""
+    return (gender or "").strip().lower(), (nationality or "").strip().upper()
+
+
+def _bucket_queryset(gender: str | None, nationality: str | None):
+    """
+    Candidates that can serve a request with these params.
+
+    An unset param matches every bucket, so a request without `gender`
+    can take a name that was pre-generated as "male" or "female".
+    """
+    gender, nationality = bucket_key(gender, nationality)
+    qs = NicknameCandidate.objects.all()
+    if gender:
+        qs = qs.filter(gender=gender)
+    if nationality:
+        qs = qs.filter(nationality=nationality)
+    return qs
+
+
+def pool_size(gender: str | None, nationality: str | None) -> int:
+    """Number of candidates stored in exactly this bucket."""
+    gender, nationality = bucket_key(gender, nationality)
+    return NicknameCandidate.objects.filter(gender=gender, nationality=nationality).count()
+
+
+def pop_pooled_nickname(gender: str | None, nationality: str | None, max_tries: int = 5) -> str | None:
+    """
+    Take the oldest pooled candidate for the bucket and remove it from the pool.
+
+    The pick is a single read on the (gender, nationality, id) index followed
+    by a conditional delete. If another worker deleted the same row first we
+    simply move on to the next head, so no row locks are needed.
+
+    The returned name is leased (see leases.py).
+    Returns None when the bucket is empty (caller falls back to the provider).
+    """
+    qs = _bucket_queryset(gender, nationality).order_by("id")
+
+    for _ in range(max_tries):
+        head = qs.values_list("id", "nickname").first()
+        if head is None:
+            return None
+
+        pk, nickname = head
+        deleted, _rows = NicknameCandidate.objects.filter(pk=pk).delete()
+        if not deleted:
+            # lost the race for this row, try the new head
+            continue
+
+        # candidates were free at refill time; re-check in case the
+        # provider path handed out the same name in the meantime
+        if not is_available(nickname) or not acquire_lease(nickname):
+            continue
+
+        return nickname
+
+    return None
+
+
+async def apop_pooled_nickname(gender: str | None, nationality: str | None, max_tries: int = 5) -> str | None:
+    """Async pop_pooled_nickname, same read + conditional delete pick."""
+    qs = _bucket_queryset(gender, nationality).order_by("id")
+
+    for _ in range(max_tries):
+        head = await qs.values_list("id", "nickname").afirst()
+        if head is None:
+            return None
+
+        pk, nickname = head
+        deleted, _rows = await NicknameCandidate.objects.filter(pk=pk).adelete()
+        if not deleted or not await ais_available(nickname) or not await aacquire_lease(nickname):
+            continue
+
+        return nickname
+
+    return None
+
+
+def pop_pooled_nicknames(gender: str | None, nationality: str | None, count: int) -> list[str]:
+    """
+    Bulk pop_pooled_nickname: up to `count` of the oldest pooled candidates,
+    leased and removed from the pool in a fixed number of queries.
+
+    Heads another request leased first are dropped from the pool too, they
+    are about to be used anyway.
+    """
+    heads = list(_bucket_queryset(gender, nationality).order_by("id").values_list("id", "nickname")[:count])
+    if not heads:
+        return []
+
+    leased = acquire_leases(filter_available(nickname for _pk, nickname in heads))
+    NicknameCandidate.objects.filter(pk__in=[pk for pk, _nickname in heads]).delete()
+    return leased
+
+
+def refill_pool(gender: str | None, nationality: str | None, target: int, batch_size: int | None = None) -> int:
+    """
+    Top the bucket up to `target` candidates from NICKNAME_ENGINE, switching
+    to NICKNAME_FALLBACK_ENGINE for the rest of the refill if it fails.
+
+    Every batch is filtered against taken names (availability index) and the
+    pool itself (one `nickname__in` query), then inserted with a single
+    bulk_create.
+    Returns the number of candidates added.
+    """
+    gender, nationality = bucket_key(gender, nationality)
+    batch_size = batch_size or settings.NICKNAME_POOL_BATCH_SIZE
+
+    fetch = _engine_with_fallback()
+    missing = target - pool_size(gender, nationality)
+    added = 0
+    idle_rounds = 0
+
+    while missing > 0 and idle_rounds < 3:
+        names = filter_available(
+            fetch(min(batch_size, missing), gender or None, nationality or None)
+        )
+
+        pooled = set(NicknameCandidate.objects.filter(nickname__in=names).values_list("nickname", flat=True))
+        fresh = [n for n in names if n not in pooled]
+
+        created = NicknameCandidate.objects.bulk_create(
+            [NicknameCandidate(nickname=n, gender=gender, nationality=nationality) for n in fresh],
+            ignore_conflicts=True,
+        )
+
+        # engine kept returning taken names -> don't spin forever
+        idle_rounds = 0 if fresh else idle_rounds + 1
+        added += len(created)
+        missing -= len(created)
+
+    return added
@@ -0,0 +1,236 @@
+"""
+HTTP clients for the identity provider (randomuser.me).
+
+One keep-alive `requests.Session` per process (and one `httpx.AsyncClient`
+per event loop for the async link flow), so consecutive batches reuse the
+same TCP/TLS connection, plus a circuit breaker shared by both: after a run
+of failures the provider is skipped outright for a cool-down period instead
+of letting every request sit in the full timeout.
+"""
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+class ProviderUnavailable(requests.RequestException):
+    """Raised without any network I/O while the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker, state kept per process.
+
+    - closed: calls go through, consecutive failures are counted
+    - open: calls fail fast until `reset_timeout` has passed
+    - half-open: a single trial call decides whether to close or re-open; a
+      trial that never reports back is replaced after another `reset_timeout`
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # let exactly one caller probe the provider (again, if the last
+                # trial was lost without recording anything)
+                self.state = self.HALF_OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class IdentityProviderClient:
+
+    def __init__(self, base_url: str, connect_timeout: float, read_timeout: float, pool_size: int, breaker: CircuitBreaker):
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker
+
+        self.session = requests.Session()
+        # no transparent retries: a slow provider must cost one timeout, not three
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get_people(self, batch_size: int, gender: str | None, nationality: str | None) -> list[dict]:
+        """
+        Return the raw `results` list for a batch.
+
+        Raises ProviderUnavailable while the circuit is open,
+        requests.RequestException on network failure and
+        RuntimeError("identity_provider_error") on a non-200 answer.
+        """
+        if not self.breaker.allow():
+            raise ProviderUnavailable("identity provider circuit is open")
+
+        # randomuser.me supports ?results=#
+        params = {"results": batch_size}
+        if gender:
+            params["gender"] = gender
+        if nationality:
+            params["nat"] = nationality
+
+        try:
+            resp = self.session.get(self.base_url, params=params, timeout=self.timeout)
+        except BaseException:
+            # RequestException, or anything else: a half-open trial must report back
+            self.breaker.record_failure()
+            raise
+
+        if resp.status_code != 200:
+            self.breaker.record_failure()
+            raise RuntimeError("identity_provider_error")
+
+        self.breaker.record_success()
+        return resp.json().get("results", []) or []
+
+
+class AsyncIdentityProviderClient:
+    """
+    asyncio twin of IdentityProviderClient, same contract and error types:
+    httpx failures are re-raised as requests.RequestException so callers
+    handle both clients the same way.
+    """
+
+    def __init__(self, base_url: str, connect_timeout: float, read_timeout: float, pool_size: int, max_connections: int, breaker: CircuitBreaker):
+        self.base_url = base_url
+        self.breaker = breaker
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=pool_size),
+        )
+
+    async def get_people(self, batch_size: int, gender: str | None, nationality: str | None) -> list[dict]:
+        if not self.breaker.allow():
+            raise ProviderUnavailable("identity provider circuit is open")
+
+        params = {"results": batch_size}
+        if gender:
+            params["gender"] = gender
+        if nationality:
+            params["nat"] = nationality
+
+        try:
+            resp = await self.client.get(self.base_url, params=params)
+        except httpx.TimeoutException as exc:
+            self.breaker.record_failure()
+            raise requests.Timeout(str(exc)) from exc
+        except httpx.HTTPError as exc:
+            self.breaker.record_failure()
+            raise requests.ConnectionError(str(exc)) from exc
+        except BaseException:
+            # cancelled (the caller went away) or anything else: a half-open trial must report back
+            self.breaker.record_failure()
+            raise
+
+        if resp.status_code != 200:
+            self.breaker.record_failure()
+            raise RuntimeError("identity_provider_error")
+
+        self.breaker.record_success()
+        return resp.json().get("results", []) or []
+
+
+_client: IdentityProviderClient | None = None
+_client_pid: int | None = None
+_breaker: CircuitBreaker | None = None
+_breaker_pid: int | None = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncIdentityProviderClient]" = weakref.WeakKeyDictionary()
+_client_lock = threading.Lock()
+
+
+def _get_breaker() -> CircuitBreaker:
+    """Process-wide breaker shared by the sync and async clients."""
+    global _breaker, _breaker_pid
+    pid = os.getpid()
+    if _breaker is None or _breaker_pid != pid:
+        _breaker = CircuitBreaker(
+            failure_threshold=settings.NICKNAME_PROVIDER_FAILURE_THRESHOLD,
+            reset_timeout=settings.NICKNAME_PROVIDER_RESET_TIMEOUT,
+        )
+        _breaker_pid = pid
+    return _breaker
+
+
+def get_provider_client() -> IdentityProviderClient:
+    """
+    The process-wide client. Re-created after a fork so workers never share
+    pooled sockets inherited from a preloading master.
+    """
+    global _client, _client_pid
+
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = IdentityProviderClient(
+                    base_url=settings.NICKNAME_PROVIDER_URL,
+                    connect_timeout=settings.NICKNAME_PROVIDER_CONNECT_TIMEOUT,
+                    read_timeout=settings.NICKNAME_PROVIDER_READ_TIMEOUT,
+                    pool_size=settings.NICKNAME_PROVIDER_POOL_SIZE,
+                    breaker=_get_breaker(),
+                )
+                _client_pid = pid
+    return _client
+
+
+def get_async_provider_client() -> AsyncIdentityProviderClient:
+    """The client for the running event loop (httpx clients are loop-bound)."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        with _client_lock:
+            client = _async_clients.get(loop)
+            if client is None:
+                client = AsyncIdentityProviderClient(
+                    base_url=settings.NICKNAME_PROVIDER_URL,
+                    connect_timeout=settings.NICKNAME_PROVIDER_CONNECT_TIMEOUT,
+                    read_timeout=settings.NICKNAME_PROVIDER_READ_TIMEOUT,
+                    pool_size=settings.NICKNAME_PROVIDER_POOL_SIZE,
+                    max_connections=settings.NICKNAME_PROVIDER_ASYNC_MAX_CONNECTIONS,
+                    breaker=_get_breaker(),
+                )
+                _async_clients[loop] = client
+    return client
+
+
+def reset_provider_client() -> None:
+    """Drop the process-wide clients and breaker state (settings changes, tests)."""
+    global _client, _breaker
+    with _client_lock:
+        if _client is not None:
+            _client.session.close()
+        _client = None
+        _breaker = None
+        _async_clients.clear()
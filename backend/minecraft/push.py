@@ -0,0 +1,208 @@
+"""
+Push side of the change feed: AccountChange entries streamed to connected
+servers as Server-Sent Events (GET /api/minecraft/stream/, ASGI only).
+
+Per event loop (i.e. per uvicorn worker) one ChangeHub reads new entries
+and fans them out to every connection, so N connected servers cost one
+query per tick instead of N polls. The hub ticks every
+MINECRAFT_PUSH_POLL_INTERVAL, and right away when this process commits a
+change (notify(), via changes.changes_committed).
+
+Each entry's seq is its SSE id: a reconnecting client sends Last-Event-ID
+and first catches up from the table, then switches to the live feed.
+A connection whose buffer (MINECRAFT_PUSH_BUFFER entries) fills up is
+closed rather than slowing the hub down; it resumes the same way.
+
+Entries are read in seq order like on the polling endpoint, so an entry
+goes out as soon as its transaction has committed and been numbered.
+"""
+import asyncio
+import json
+import logging
+import threading
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .changes import current_cursor, cursor_expired, sequence_changes
+from .models import AccountChange
+
+logger = logging.getLogger(__name__)
+
+_FIELDS = ("seq", "account_id", "action", "fields", "state")
+
+
+def read_after(cursor: int, limit: int) -> tuple[list[dict], int]:
+    """Up to `limit` entries after `cursor`, in seq order; returns `(entries, new_cursor)`."""
+    sequence_changes()
+    entries = list(AccountChange.objects.filter(seq__gt=cursor).order_by("seq").values(*_FIELDS)[:limit])
+    return entries, (entries[-1]["seq"] if entries else cursor)
+
+
+aread_after = sync_to_async(read_after)
+acurrent_cursor = sync_to_async(current_cursor)
+acursor_expired = sync_to_async(cursor_expired)
+
+
+def encode(entry: dict) -> bytes:
+    data = {
+        "cursor": entry["seq"],
+        "account_id": entry["account_id"],
+        "action": entry["action"],
+        "fields": entry["fields"],
+        "state": entry["state"],
+    }
+    return f"id: {entry['seq']}\nevent: change\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+class Overflow(Exception):
+    """The subscriber fell MINECRAFT_PUSH_BUFFER entries behind."""
+
+
+class Subscription:
+    def __init__(self, hub: "ChangeHub"):
+        self.hub = hub
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.MINECRAFT_PUSH_BUFFER)
+        self.overflowed = False
+
+    def offer(self, entries: list[dict]) -> None:
+        for entry in entries:
+            try:
+                self.queue.put_nowait(entry)
+            except asyncio.QueueFull:
+                self.overflowed = True
+                return
+
+    async def next(self, timeout: float) -> dict | None:
+        """Next live entry, or None after `timeout` seconds without one."""
+        if self.overflowed and self.queue.empty():
+            raise Overflow
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def end(self) -> None:
+        """End the stream once drained, like an overflow; the client resumes with Last-Event-ID."""
+        self.overflowed = True
+        try:
+            # wake a waiting next() now rather than at the next heartbeat
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class ChangeHub:
+    """Reads new entries once per tick and hands them to every Subscription."""
+
+    def __init__(self):
+        self.subscribers: set[Subscription] = set()
+        self.loop = asyncio.get_running_loop()
+        self.wake = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self)
+        self.subscribers.add(subscription)
+        if self.task is None or self.task.done():
+            self.task = self.loop.create_task(self.run())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscribers.discard(subscription)
+        if not self.subscribers and self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def start(self) -> int:
+        """Where the feed stands, retried every tick while the DB can't say."""
+        while True:
+            try:
+                return await acurrent_cursor()
+            except Exception:
+                logger.exception("push hub: reading the current cursor failed")
+                # the hub would start past whatever is committed meanwhile:
+                # let the connected clients catch up from the table instead
+                for subscription in list(self.subscribers):
+                    subscription.end()
+            await asyncio.sleep(settings.MINECRAFT_PUSH_POLL_INTERVAL)
+
+    async def run(self) -> None:
+        cursor = await self.start()
+        while True:
+            try:
+                await asyncio.wait_for(self.wake.wait(), settings.MINECRAFT_PUSH_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+
+            try:
+                entries, cursor = await aread_after(cursor, settings.MINECRAFT_PUSH_BUFFER)
+            except Exception:
+                # DB hiccup: keep the connections, try again next tick
+                logger.exception("push hub: reading changes failed")
+                continue
+            if entries:
+                for subscription in list(self.subscribers):
+                    subscription.offer(entries)
+
+
+_hubs: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ChangeHub]" = weakref.WeakKeyDictionary()
+_hubs_lock = threading.Lock()
+
+
+def get_hub() -> ChangeHub:
+    """The hub of the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _hubs_lock:
+        hub = _hubs.get(loop)
+        if hub is None:
+            hub = _hubs[loop] = ChangeHub()
+    return hub
+
+
+def notify() -> None:
+    """Wake every hub of this process; thread-safe (called from on_commit in sync code)."""
+    with _hubs_lock:
+        hubs = list(_hubs.values())
+    for hub in hubs:
+        if hub.subscribers and not hub.loop.is_closed():
+            hub.loop.call_soon_threadsafe(hub.wake.set)
+
+
+async def stream(since: int | None):
+    """
+    SSE body for one connection: catch up from `since` (default: the
+    latest entry), then follow the hub. Ends on overflow; the client reconnects with Last-Event-ID.
+    """
+    subscription = get_hub().subscribe()
+    try:
+        cursor = await acurrent_cursor() if since is None else since
+        # tells the client where it is, even before the first change
+        yield b"retry: 1000\n" + f"id: {cursor}\n\n".encode()
+
+        while True:
+            entries, cursor_after = await aread_after(cursor, settings.MINECRAFT_PUSH_BUFFER)
+            if not entries:
+                break
+            for entry in entries:
+                yield encode(entry)
+            cursor = cursor_after
+
+        while True:
+            try:
+                entry = await subscription.next(settings.MINECRAFT_PUSH_HEARTBEAT)
+            except Overflow:
+                return
+            if entry is None:
+                yield b": ping\n\n"
+            elif entry["seq"] > cursor:
+                # live entries the catch-up already sent are skipped
+                yield encode(entry)
+                cursor = entry["seq"]
+    finally:
+        subscription.close()
@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.utils.translation import gettext
+from rest_framework import serializers
+
+from .models import NICKNAME_MAX_LENGTH
+
+
+class BulkLinkQuerySerializer(serializers.Serializer):
+    """Query params of the bulk link-token endpoint. No `count` = link every free token."""
+    count = serializers.IntegerField(required=False, min_value=1)
+    gender = serializers.CharField(required=False, allow_blank=True)
+    nationality = serializers.CharField(required=False, allow_blank=True)
+
+
+class AttachUUIDItemSerializer(serializers.Serializer):
+    """One `(token or account_id, uuid)` pair sent by a Minecraft server."""
+    token = serializers.CharField(required=False, max_length=64)
+    account_id = serializers.IntegerField(required=False, min_value=1)
+    uuid = serializers.UUIDField()
+
+    def validate(self, attrs):
+        if ("token" in attrs) == ("account_id" in attrs):
+            raise serializers.ValidationError(gettext("Provide exactly one of token or account_id."))
+        attrs["uuid"] = str(attrs["uuid"])
+        return attrs
+
+
+class AttachUUIDBatchSerializer(serializers.Serializer):
+    """
+    Envelope of the batch attach call. Only the shape is checked here, every
+    item is validated on its own so one bad row doesn't fail the batch.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["items"] = serializers.ListField(
+            child=serializers.DictField(),
+            allow_empty=False,
+            max_length=settings.MINECRAFT_ATTACH_MAX_ITEMS,
+        )
+
+
+class HandshakeQuerySerializer(serializers.Serializer):
+    """Query params of the join handshake: the player's token or uuid."""
+    token = serializers.CharField(required=False, max_length=64)
+    uuid = serializers.UUIDField(required=False)
+
+    def validate(self, attrs):
+        if ("token" in attrs) == ("uuid" in attrs):
+            raise serializers.ValidationError(gettext("Provide exactly one of token or uuid."))
+        if "uuid" in attrs:
+            attrs["uuid"] = str(attrs["uuid"])
+        return attrs
+
+
+class ResolveQuerySerializer(serializers.Serializer):
+    """Query params of the nickname resolver."""
+    nickname = serializers.CharField(max_length=NICKNAME_MAX_LENGTH)
+
+
+class ChangesQuerySerializer(serializers.Serializer):
+    """Query params of the change feed: resume after `since`, at most `limit` entries."""
+    since = serializers.IntegerField(required=False, min_value=0, default=0)
+    limit = serializers.IntegerField(required=False, min_value=1)
+
+    def validate_limit(self, value):
+        return min(value, settings.MINECRAFT_CHANGES_PAGE_SIZE)
+
+
+class StateEventSerializer(serializers.Serializer):
+    """One death / deactivation event sent by a Minecraft server."""
+    key = serializers.CharField(max_length=128)
+    type = serializers.ChoiceField(choices=["death", "deactivation"])
+    account_id = serializers.IntegerField(required=False, min_value=1)
+    uuid = serializers.UUIDField(required=False)
+    at = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        if ("account_id" in attrs) == ("uuid" in attrs):
+            raise serializers.ValidationError(gettext("Provide exactly one of account_id or uuid."))
+        if "uuid" in attrs:
+            attrs["uuid"] = str(attrs["uuid"])
+        return attrs
+
+
+class StateEventBatchSerializer(serializers.Serializer):
+    """Envelope of the events call; like AttachUUIDBatchSerializer, items are validated one by one."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["items"] = serializers.ListField(
+            child=serializers.DictField(),
+            allow_empty=False,
+            max_length=settings.MINECRAFT_EVENTS_MAX_ITEMS,
+        )
+
+
+class HeartbeatSerializer(serializers.Serializer):
+    """One online player: `seconds` played since the server's previous heartbeat for them."""
+    account_id = serializers.IntegerField(required=False, min_value=1)
+    uuid = serializers.UUIDField(required=False)
+    seconds = serializers.IntegerField(min_value=1)
+    at = serializers.DateTimeField(required=False)
+
+    def validate_seconds(self, value):
+        # a server that was stalled can't credit more than one heartbeat's worth
+        return min(value, settings.MINECRAFT_HEARTBEAT_MAX_SECONDS)
+
+    def validate(self, attrs):
+        if ("account_id" in attrs) == ("uuid" in attrs):
+            raise serializers.ValidationError(gettext("Provide exactly one of account_id or uuid."))
+        if "uuid" in attrs:
+            attrs["uuid"] = str(attrs["uuid"])
+        return attrs
+
+
+class HeartbeatBatchSerializer(serializers.Serializer):
+    """A server's heartbeats for one tick; `key` makes resending the batch harmless."""
+    key = serializers.CharField(max_length=100)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["items"] = HeartbeatSerializer(many=True, allow_empty=False, max_length=settings.MINECRAFT_HEARTBEAT_MAX_ITEMS)
@@ -0,0 +1,151 @@
+"""
+Per-server API keys.
+
+Every MinecraftServer authenticates with X-Server-Key. Only the SHA-256 of
+each key is stored, and a lookup is one indexed query by that hash. Results,
+negative ones included, are kept in a per-process TTL+LRU cache, so a server
+hammering the API costs a hash and a dict lookup per request.
+
+Rotation is overlapping: rotate_key() issues a new key and gives the old
+ones MINECRAFT_SERVER_KEY_ROTATION_GRACE seconds to be replaced.
+
+The global settings.MINECRAFT_API_KEY still works and maps to LEGACY, so
+servers can move over one at a time; set it empty to turn it off.
+"""
+import hashlib
+import hmac
+import logging
+import secrets
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from infrastructure.cache import MISSING, TTLLRUCache
+from .models import MinecraftServer, ServerKey
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ServerIdentity:
+    """What a request learns about the server that sent it."""
+    pk: int | None
+    name: str
+    throttle_rate: str = ""
+
+    @property
+    def namespace(self) -> str:
+        """Prefix that keeps this server's idempotency keys apart from other servers'."""
+        return f"server:{self.pk}" if self.pk is not None else self.name
+
+
+LEGACY = ServerIdentity(pk=None, name="legacy")
+
+_UNKNOWN = "unknown"
+
+_cache: TTLLRUCache | None = None
+
+
+def get_server_key_cache() -> TTLLRUCache:
+    global _cache
+    if _cache is None:
+        _cache = TTLLRUCache(maxsize=10_000, ttl=settings.MINECRAFT_SERVER_KEY_CACHE_TTL)
+    return _cache
+
+
+def hash_key(raw_key: str) -> str:
+    return hashlib.sha256(raw_key.encode()).hexdigest()
+
+
+def _legacy(raw_key: str) -> bool:
+    expected = getattr(settings, "MINECRAFT_API_KEY", None)
+    return bool(expected) and hmac.compare_digest(raw_key, expected)
+
+
+def cached_server(raw_key: str | None):
+    """Cache-only lookup: ServerIdentity, None (known bad key) or MISSING."""
+    if not raw_key:
+        return None
+    if _legacy(raw_key):
+        return LEGACY
+
+    entry = get_server_key_cache().get(hash_key(raw_key))
+    if entry is MISSING:
+        return MISSING
+    if entry == _UNKNOWN:
+        return None
+
+    identity, expires_at = entry
+    if expires_at is not None and expires_at <= timezone.now():
+        return None
+    return identity
+
+
+def lookup_server(raw_key: str | None) -> ServerIdentity | None:
+    """The server owning `raw_key`, or None if the key is unknown, expired or its server is disabled."""
+    cached = cached_server(raw_key)
+    if cached is not MISSING:
+        return cached
+
+    key_hash = hash_key(raw_key)
+    row = (
+        ServerKey.objects
+        .filter(key_hash=key_hash, server__is_active=True)
+        .values("expires_at", "server_id", "server__name", "server__throttle_rate")
+        .first()
+    )
+    cache = get_server_key_cache()
+    if row is None:
+        cache.set(key_hash, _UNKNOWN, ttl=settings.MINECRAFT_SERVER_KEY_NEGATIVE_TTL)
+        return None
+
+    identity = ServerIdentity(pk=row["server_id"], name=row["server__name"], throttle_rate=row["server__throttle_rate"])
+    cache.set(key_hash, (identity, row["expires_at"]))
+    if row["expires_at"] is not None and row["expires_at"] <= timezone.now():
+        return None
+    return identity
+
+
+def invalidate_server_keys() -> None:
+    """Drop every cached lookup once the current transaction commits (key and server edits are rare)."""
+    transaction.on_commit(lambda: get_server_key_cache().clear())
+
+
+def issue_key(server: MinecraftServer, expires_at=None) -> str:
+    """Create a key for `server`. Returns the raw key; it can't be recovered later."""
+    raw_key = secrets.token_urlsafe(32)
+    ServerKey.objects.create(server=server, key_hash=hash_key(raw_key), prefix=raw_key[:8], expires_at=expires_at)
+    return raw_key
+
+
+@transaction.atomic
+def rotate_key(server: MinecraftServer, grace: int | None = None) -> str:
+    """
+    Issue a new key and let the server's other keys expire after `grace`
+    seconds (default MINECRAFT_SERVER_KEY_ROTATION_GRACE), so it can switch
+    without downtime. Returns the new raw key.
+    """
+    grace = settings.MINECRAFT_SERVER_KEY_ROTATION_GRACE if grace is None else grace
+    deadline = timezone.now() + timedelta(seconds=grace)
+    server.keys.filter(Q(expires_at__isnull=True) | Q(expires_at__gt=deadline)).update(expires_at=deadline)
+    # .update() skips the signals that normally clear the cache
+    invalidate_server_keys()
+    return issue_key(server)
+
+
+def tag_request(request, identity: ServerIdentity) -> None:
+    """Remember the calling server on the request (on the Django request under a DRF one)."""
+    getattr(request, "_request", request).minecraft_server = identity
+
+
+def log_server_request(identity: ServerIdentity, method: str, path: str, status: int, duration: float) -> None:
+    """One line per server request, for per-server throughput / latency breakdowns."""
+    logger.info(
+        "server=%s method=%s path=%s status=%s duration_ms=%.1f",
+        identity.name, method, path, status, duration * 1000,
+        extra={"minecraft_server": identity.name, "duration_ms": duration * 1000},
+    )
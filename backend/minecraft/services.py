@@ -0,0 +1,461 @@
+"""
+Link-token flow, split so no transaction is open during network I/O:
+
+1. reserve_token(s): claim the user's oldest free token(s) (SKIP LOCKED or compare-and-set)
+2. network phase: pool / identity provider, no transaction, no row locks;
+   the picked names are leased (see leases.py)
+3. link_account(s): burn the token(s) and create the account(s) (one short transaction)
+
+A request that fails in phase 2 hands its tokens back with release_token(s);
+one that dies outright leaves reservations that simply expire after
+NICKNAME_TOKEN_RESERVATION_TTL.
+
+Minecraft servers later attach player UUIDs to the shells in bulk (attach_uuids)
+and report deaths / deactivations in idempotent batches (apply_events).
+"""
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, DateTimeField, Q, Value, When
+from django.utils import timezone
+
+from accounts.models import GameToken
+from infrastructure.db import violated_unique
+from .availability import remember_taken
+from .changes import record_changes
+from .handshake import invalidate_handshake
+from .models import NICKNAME_CI_CONSTRAINT, AccountChange, MinecraftAccount, NicknameLease, ProcessedEvent
+from .servers import ServerIdentity
+
+
+class ReservationLost(Exception):
+    """A token's reservation expired and somebody else took it over."""
+
+
+def _unreserved(now):
+    return Q(reserved_until__isnull=True) | Q(reserved_until__lte=now)
+
+
+def _free_tokens(user, now):
+    # "free" means:
+    #   - user owns it
+    #   - it's still active
+    #   - it is NOT already attached to a MinecraftAccount
+    #   - no other link-token request holds it right now
+    return (
+        GameToken.objects
+        .filter(user=user, is_active=True, minecraft_account__isnull=True)
+        .filter(_unreserved(now))
+        .order_by("generated_at")
+    )
+
+
+def reserve_tokens(user, limit: int | None = None) -> list[GameToken]:
+    """
+    Reserve up to `limit` (default: all) of the user's free tokens, oldest first.
+
+    Concurrent requests of the same user each get distinct tokens without
+    waiting on each other: MySQL/Postgres lock the rows with SKIP LOCKED,
+    so a parallel request just takes the next ones. Backends without it
+    (SQLite) fall back to a compare-and-set loop.
+    """
+    if connection.features.has_select_for_update_skip_locked:
+        return _reserve_skip_locked(user, limit)
+    return _reserve_cas(user, limit)
+
+
+def reserve_token(user) -> GameToken | None:
+    """Reserve the user's oldest free token. Returns None if there is none."""
+    tokens = reserve_tokens(user, 1)
+    return tokens[0] if tokens else None
+
+
+def _reserve_skip_locked(user, limit):
+    now = timezone.now()
+    until = now + timedelta(seconds=settings.NICKNAME_TOKEN_RESERVATION_TTL)
+    qs = _free_tokens(user, now)
+    if connection.features.has_select_for_update_of:
+        # only lock the tokens, not the (outer-joined) account side
+        qs = qs.select_for_update(skip_locked=True, of=("self",))
+    else:
+        qs = qs.select_for_update(skip_locked=True)
+    if limit is not None:
+        qs = qs[:limit]
+
+    # the row locks live for this SELECT + UPDATE only, a few milliseconds
+    with transaction.atomic():
+        tokens = list(qs)
+        if tokens:
+            GameToken.objects.filter(pk__in=[t.pk for t in tokens]).update(reserved_until=until)
+
+    for token in tokens:
+        token.reserved_until = until
+    return tokens
+
+
+def _reserve_cas(user, limit):
+    # lock-free: every lost CAS means a competitor claimed that row, so the
+    # free set shrinks each round and the loop ends
+    claimed = []
+    while limit is None or len(claimed) < limit:
+        now = timezone.now()
+        until = now + timedelta(seconds=settings.NICKNAME_TOKEN_RESERVATION_TTL)
+        qs = _free_tokens(user, now)
+        candidates = list(qs if limit is None else qs[:limit - len(claimed)])
+        if not candidates:
+            break
+
+        pks = [t.pk for t in candidates]
+        # compare-and-set: only rows nobody reserved or burned since our read
+        won = GameToken.objects.filter(_unreserved(now), pk__in=pks, is_active=True).update(reserved_until=until)
+        if won == len(candidates):
+            won_pks = set(pks)
+        else:
+            won_pks = set(GameToken.objects.filter(pk__in=pks, reserved_until=until).values_list("pk", flat=True))
+
+        for token in candidates:
+            if token.pk in won_pks:
+                token.reserved_until = until
+                claimed.append(token)
+    return claimed
+
+
+async def areserve_token(user) -> GameToken | None:
+    # row locks need a transaction, which the async ORM can't hold open
+    return await sync_to_async(reserve_token)(user)
+
+
+def _held(tokens):
+    # matching on our own deadlines leaves reservations someone else took over alone
+    by_deadline = defaultdict(list)
+    for token in tokens:
+        by_deadline[token.reserved_until].append(token.pk)
+    held = reduce(or_, (Q(pk__in=pks, reserved_until=until) for until, pks in by_deadline.items()))
+    return GameToken.objects.filter(held, is_active=True)
+
+
+def release_tokens(tokens: list[GameToken]) -> None:
+    """Hand reserved tokens back after a failed attempt."""
+    if tokens:
+        _held(tokens).update(reserved_until=None)
+
+
+def release_token(token: GameToken) -> None:
+    release_tokens([token])
+
+
+async def arelease_token(token: GameToken) -> None:
+    await _held([token]).aupdate(reserved_until=None)
+
+
+@transaction.atomic
+def link_accounts(user, tokens: list[GameToken], nicknames: list[str]) -> list[MinecraftAccount]:
+    """
+    Burn the reserved tokens and create one account shell per (token, nickname).
+
+    One UPDATE burns every token, one bulk INSERT creates the accounts.
+    Raises ReservationLost if any reservation is no longer ours and
+    IntegrityError if a nickname got taken in the meantime; either way
+    nothing is written, so the caller can retry.
+    """
+    if _held(tokens).update(is_active=False, reserved_until=None) != len(tokens):
+        raise ReservationLost([t.pk for t in tokens])
+
+    MinecraftAccount.objects.bulk_create([
+        MinecraftAccount(
+            owner=user,
+            nickname=nickname,
+            uuid=None,  # will be filled in by POST from server
+            token=token,
+            is_dead=False,
+            dead_at=None,
+            is_active=True,
+            deactivated_at=None,
+        )
+        for token, nickname in zip(tokens, nicknames)
+    ])
+    # the account rows guard the names from here on
+    NicknameLease.objects.filter(nickname__in=nicknames).delete()
+    # bulk_create skips post_save, so feed the availability index and handshake cache ourselves
+    transaction.on_commit(lambda: remember_taken(nicknames))
+    invalidate_handshake(tokens=[t.value for t in tokens])
+
+    # only now: a failed insert rolls the burn back and the caller retries with these tokens
+    for token in tokens:
+        token.is_active = False
+        token.reserved_until = None
+
+    # MySQL can't return ids from a bulk insert: read the rows back
+    accounts = list(MinecraftAccount.objects.filter(token__in=tokens).order_by("id"))
+    record_changes(accounts, AccountChange.CREATED)
+    return accounts
+
+
+@transaction.atomic
+def link_account(user, token: GameToken, nickname: str) -> MinecraftAccount:
+    """
+    Burn the reserved token and create the account shell for it.
+
+    Raises ReservationLost if the reservation is no longer ours and
+    IntegrityError if `nickname` got taken in the meantime (the burn is
+    rolled back with it, so the caller can retry with another name).
+    """
+    if not _held([token]).update(is_active=False, reserved_until=None):
+        raise ReservationLost(token.pk)
+
+    account = MinecraftAccount.objects.create(
+        owner=user,
+        nickname=nickname,
+        uuid=None,  # will be filled in by POST from server
+        token=token,
+        is_dead=False,
+        dead_at=None,
+        is_active=True,
+        deactivated_at=None,
+    )
+    # the account row guards the name from here on
+    NicknameLease.objects.filter(nickname=nickname).delete()
+
+    # only now: a failed insert rolls the burn back and the caller retries with this token
+    token.is_active = False
+    token.reserved_until = None
+    return account
+
+
+def is_nickname_clash(exc: IntegrityError) -> bool:
+    """Did link_account(s) fail because a name is taken (not on the token or anything else)?"""
+    return violated_unique(exc, MinecraftAccount) in ("nickname", NICKNAME_CI_CONSTRAINT)
+
+
+def taken_among(nicknames: list[str]) -> set[str]:
+    """The names of `nicknames` that an account already has, compared like the unique index does."""
+    taken = set(MinecraftAccount.objects.nicknamed(*nicknames).values_list("nickname", flat=True))
+    taken = {n.lower() for n in taken}
+    return {n for n in nicknames if n.lower() in taken}
+
+
+# per-item outcomes of attach_uuids
+ATTACHED = "attached"
+UNCHANGED = "unchanged"  # already had this uuid: re-registering after a restart is a no-op
+NOT_FOUND = "not_found"
+CONFLICT = "conflict"  # account has another uuid, or the uuid belongs to another account
+
+
+def attach_uuids(items: list[dict]) -> list[tuple[str, int | None]]:
+    """
+    Attach server-side UUIDs to account shells in bulk.
+
+    `items` are validated dicts with `uuid` and either `token` (GameToken.value)
+    or `account_id`. Returns `(status, account_id)` per item, in order.
+
+    One SELECT resolves every token, id and uuid of the batch, one
+    bulk_update writes the new uuids and one INSERT logs them (changes.py).
+    """
+    token_values = {item["token"] for item in items if "token" in item}
+    account_ids = {item["account_id"] for item in items if "account_id" in item}
+    uuids = {item["uuid"] for item in items}
+
+    accounts = list(
+        MinecraftAccount.objects
+        .filter(Q(token__value__in=token_values) | Q(pk__in=account_ids) | Q(uuid__in=uuids))
+        .select_related("token")
+        .only("id", "token__value", *MinecraftAccount.TRACKED_FIELDS)
+    )
+    by_token = {a.token.value: a for a in accounts}
+    by_id = {a.pk: a for a in accounts}
+    uuid_owner = {a.uuid: a.pk for a in accounts if a.uuid}
+
+    results = []
+    dirty = {}
+    now = timezone.now()
+    for item in items:
+        account = by_token.get(item["token"]) if "token" in item else by_id.get(item["account_id"])
+        uuid = item["uuid"]
+
+        if account is None:
+            results.append((NOT_FOUND, None))
+        elif account.uuid == uuid:
+            results.append((UNCHANGED, account.pk))
+        elif account.uuid is not None or uuid_owner.get(uuid, account.pk) != account.pk:
+            results.append((CONFLICT, account.pk))
+        else:
+            account.uuid = uuid
+            account.updated_at = now
+            uuid_owner[uuid] = account.pk
+            dirty[account.pk] = account
+            results.append((ATTACHED, account.pk))
+
+    if dirty:
+        try:
+            with transaction.atomic():
+                MinecraftAccount.objects.bulk_update(dirty.values(), ["uuid", "updated_at"], batch_size=500)
+                record_changes(dirty.values(), AccountChange.UPDATED, ["uuid"])
+        except IntegrityError:
+            # somebody attached one of these uuids since our SELECT: redo row by row
+            lost = _attach_one_by_one(dirty.values())
+            results = [(CONFLICT, pk) if pk in lost and status == ATTACHED else (status, pk) for status, pk in results]
+        # bulk_update skips post_save
+        invalidate_handshake(account_ids=dirty.keys(), uuids=[a.uuid for a in dirty.values()])
+
+    return results
+
+
+def _attach_one_by_one(accounts) -> set[int]:
+    lost = set()
+    for account in accounts:
+        try:
+            with transaction.atomic():
+                updated = MinecraftAccount.objects.filter(pk=account.pk, uuid__isnull=True).update(
+                    uuid=account.uuid, updated_at=account.updated_at,
+                )
+                if updated:
+                    record_changes([account], AccountChange.UPDATED, ["uuid"])
+        except IntegrityError:
+            updated = 0
+        if not updated:
+            lost.add(account.pk)
+    return lost
+
+
+# event types of apply_events
+DEATH = "death"
+DEACTIVATION = "deactivation"
+
+# per-event outcomes of apply_events (plus NOT_FOUND above)
+APPLIED = "applied"
+DUPLICATE = "duplicate"  # key seen before (earlier call or earlier in this batch): nothing done
+ALREADY = "already"  # new key, but the account was already dead / inactive
+
+
+def _per_row(values: dict):
+    # one CASE picks every row's own timestamp, so a single UPDATE covers the batch
+    return Case(*[When(pk=pk, then=Value(at)) for pk, at in values.items()], output_field=DateTimeField())
+
+
+def apply_events(events: list[dict], server: ServerIdentity) -> list[tuple[str, int | None]]:
+    """
+    Apply death / deactivation events sent by `server`.
+
+    `events` are validated dicts with `key` (idempotency key, unique per
+    server), `type`, either `account_id` or `uuid`, and an optional `at`.
+    Returns `(status, account_id)` per event, in order.
+
+    One transaction, whatever the batch size: SELECT (locking) the accounts,
+    INSERT the new keys and read them back, one UPDATE per event type and one
+    change-log INSERT. Keys of events whose account doesn't exist (yet) are
+    not stored, so a retry can still apply them.
+    """
+    now = timezone.now()
+    results = [None] * len(events)
+
+    first = {}
+    for index, event in enumerate(events):
+        if event["key"] in first:
+            results[index] = (DUPLICATE, None)
+        else:
+            first[event["key"]] = index
+
+    account_ids = {events[i]["account_id"] for i in first.values() if "account_id" in events[i]}
+    uuids = {events[i]["uuid"] for i in first.values() if "uuid" in events[i]}
+
+    with transaction.atomic():
+        accounts = list(
+            MinecraftAccount.objects
+            .select_for_update()
+            .filter(Q(pk__in=account_ids) | Q(uuid__in=uuids))
+            .only("id", *MinecraftAccount.TRACKED_FIELDS)
+        )
+        by_id = {a.pk: a for a in accounts}
+        by_uuid = {a.uuid: a for a in accounts if a.uuid}
+
+        found = []
+        for index in first.values():
+            event = events[index]
+            account = by_id.get(event["account_id"]) if "account_id" in event else by_uuid.get(event["uuid"])
+            if account is None:
+                results[index] = (NOT_FOUND, None)
+            else:
+                found.append((index, event, account))
+
+        # claim the keys: rows another call stored first are duplicates
+        claim = uuid4()
+        keys = [f"{server.namespace}:{event['key']}" for _index, event, _account in found]
+        ProcessedEvent.objects.bulk_create(
+            [ProcessedEvent(key=k, processed_at=now, claim=claim) for k in keys], ignore_conflicts=True,
+        )
+        claimed = set(ProcessedEvent.objects.filter(key__in=keys, claim=claim).values_list("key", flat=True))
+
+        died, deactivated = {}, {}
+        for (index, event, account), key in zip(found, keys):
+            at = event.get("at") or now
+            if key not in claimed:
+                results[index] = (DUPLICATE, account.pk)
+            elif event["type"] == DEATH and not account.is_dead:
+                account.is_dead, account.dead_at = True, at
+                died[account.pk] = at
+                results[index] = (APPLIED, account.pk)
+            elif event["type"] == DEACTIVATION and account.is_active:
+                account.is_active, account.deactivated_at = False, at
+                deactivated[account.pk] = at
+                results[index] = (APPLIED, account.pk)
+            else:
+                results[index] = (ALREADY, account.pk)
+
+        # the row locks above keep these filters in line with what we decided
+        if died:
+            MinecraftAccount.objects.filter(pk__in=died, is_dead=False).update(
+                is_dead=True, dead_at=_per_row(died), updated_at=now,
+            )
+        if deactivated:
+            MinecraftAccount.objects.filter(pk__in=deactivated, is_active=True).update(
+                is_active=False, deactivated_at=_per_row(deactivated), updated_at=now,
+            )
+
+        # .update() skips post_save: log and invalidate ourselves
+        changes = defaultdict(list)
+        for pk in died.keys() | deactivated.keys():
+            fields = (["is_dead", "dead_at"] if pk in died else []) + (["is_active", "deactivated_at"] if pk in deactivated else [])
+            changes[tuple(fields)].append(by_id[pk])
+        for fields, changed in changes.items():
+            record_changes(changed, AccountChange.UPDATED, fields)
+        invalidate_handshake(account_ids=died.keys() | deactivated.keys())
+
+    return results
+
+
+def sweep_processed_events() -> int:
+    """Forget event keys older than MINECRAFT_EVENT_KEY_TTL. Returns how many were removed."""
+    cutoff = timezone.now() - timedelta(seconds=settings.MINECRAFT_EVENT_KEY_TTL)
+    deleted, _rows = ProcessedEvent.objects.filter(processed_at__lt=cutoff).delete()
+    return deleted
+
+
+def resolve_nickname(nickname: str) -> dict | None:
+    """
+    Account state for `nickname`, whatever its case, or None.
+
+    nicknamed() compares the way the case-insensitive unique index does, so
+    this is one index probe (`nickname__iexact` compiles to UPPER / LIKE on
+    some backends and would scan the table).
+    """
+    row = (
+        MinecraftAccount.objects
+        .nicknamed(nickname)
+        .values("id", "nickname", "uuid", "is_dead", "is_active")
+        .first()
+    )
+    if row is None:
+        return None
+    return {
+        "account_id": row["id"],
+        "nickname": row["nickname"],
+        "uuid": row["uuid"],
+        "is_dead": row["is_dead"],
+        "is_active": row["is_active"],
+    }
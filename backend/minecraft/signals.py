@@ -0,0 +1,85 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import GameToken
+from .availability import forget_taken, remember_taken
+from . import push
+from .changes import changes_committed, record_changes
+from .handshake import invalidate_handshake
+from .models import AccountChange, MinecraftAccount, MinecraftServer, ServerKey
+from .servers import invalidate_server_keys
+
+
+@receiver(post_save, sender=MinecraftAccount)
+def index_saved_nickname(sender, instance, created, update_fields=None, **kwargs):
+    # counting filter: add a name once per account holding it, or discard() can never clear it.
+    # Connected before log_saved_account, which moves _loaded_state on to the saved values.
+    if created:
+        remember_taken([instance.nickname])
+        return
+    if update_fields is not None and "nickname" not in update_fields:
+        return
+    previous = getattr(instance, "_loaded_state", {}).get("nickname")
+    if previous == instance.nickname:
+        return
+    if previous is not None:
+        forget_taken([previous])
+    # previous unknown (not loaded from the DB, or nickname deferred): may be a rename, index it
+    remember_taken([instance.nickname])
+
+
+@receiver(post_delete, sender=MinecraftAccount)
+def unindex_deleted_nickname(sender, instance, **kwargs):
+    forget_taken([instance.nickname])
+
+
+@receiver(post_save, sender=MinecraftAccount)
+def invalidate_saved_account(sender, instance, created, **kwargs):
+    # a new account also ends the "unknown token" answer cached for its token
+    tokens = [instance.token.value] if created else []
+    invalidate_handshake(account_ids=[instance.pk], tokens=tokens, uuids=[instance.uuid])
+
+
+@receiver(post_delete, sender=MinecraftAccount)
+def invalidate_deleted_account(sender, instance, **kwargs):
+    invalidate_handshake(account_ids=[instance.pk])
+
+
+@receiver(post_save, sender=MinecraftAccount)
+def log_saved_account(sender, instance, created, update_fields=None, **kwargs):
+    # runs inside MinecraftAccount.save()'s transaction
+    state = instance.tracked_state()
+    if created:
+        record_changes([instance], AccountChange.CREATED)
+    else:
+        loaded = getattr(instance, "_loaded_state", None)
+        names = [n for n in state if update_fields is None or n in update_fields]
+        # an instance that wasn't loaded from the DB can't be diffed: log everything
+        changed = [n for n in names if loaded is None or n not in loaded or loaded[n] != state[n]]
+        if changed:
+            record_changes([instance], AccountChange.UPDATED, changed)
+    instance._loaded_state = state
+
+
+@receiver(post_delete, sender=MinecraftAccount)
+def log_deleted_account(sender, instance, **kwargs):
+    record_changes([instance], AccountChange.DELETED, [])
+
+
+@receiver(post_save, sender=GameToken)
+@receiver(post_delete, sender=GameToken)
+def invalidate_token(sender, instance, **kwargs):
+    invalidate_handshake(tokens=[instance.value])
+
+
+@receiver(changes_committed)
+def wake_push_hubs(sender, **kwargs):
+    push.notify()
+
+
+@receiver(post_save, sender=MinecraftServer)
+@receiver(post_delete, sender=MinecraftServer)
+@receiver(post_save, sender=ServerKey)
+@receiver(post_delete, sender=ServerKey)
+def invalidate_server_key_cache(sender, **kwargs):
+    invalidate_server_keys()
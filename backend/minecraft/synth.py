@@ -0,0 +1,55 @@
+import json
+import random
+from functools import lru_cache
+from pathlib import Path
+
+from .models import NICKNAME_MAX_LENGTH
+
+
+NAMES_PATH = Path(__file__).resolve().parent / "data" / "names.json"
+
+# Bundled tables are already normalized (lowercase ASCII, no separators),
+# so a candidate is just `first + "_" + last` - no slugify on the hot path.
+
+
+@lru_cache(maxsize=1)
+def _corpora() -> dict[str, dict[str, tuple[str, ...]]]:
+    with open(NAMES_PATH, encoding="utf-8") as fh:
+        raw = json.load(fh)
+    return {nat.upper(): {part: tuple(names) for part, names in tables.items()} for nat, tables in raw.items()}
+
+
+def available_nationalities() -> list[str]:
+    return sorted(_corpora())
+
+
+@lru_cache(maxsize=128)
+def _tables(gender: str, nationality: str) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    """
+    First/last name tables for a (gender, nationality) partition.
+
+    Unknown or empty nationality mixes every bundled corpus, unknown or
+    empty gender mixes male and female first names - the same "unset means
+    any" semantics randomuser.me has.
+    """
+    corpora = _corpora()
+    nations = [corpora[nationality]] if nationality in corpora else list(corpora.values())
+    parts = [gender] if gender in ("male", "female") else ["male", "female"]
+
+    firsts = tuple(dict.fromkeys(name for tables in nations for part in parts for name in tables[part]))
+    lasts = tuple(dict.fromkeys(name for tables in nations for name in tables["last"]))
+    return firsts, lasts
+
+
+def synthesize_candidates(batch_size: int, gender: str | None, nationality: str | None) -> list[str]:
+    """
+    Offline counterpart of `utils.fetch_candidates`: build `batch_size`
+    random `first_last` nicknames from the bundled name tables.
+
+    No I/O after the first call, so it never raises provider errors.
+    """
+    firsts, lasts = _tables((gender or "").lower(), (nationality or "").upper())
+    return [
+        f"{first}_{last}"[:NICKNAME_MAX_LENGTH].rstrip("_")
+        for first, last in zip(random.choices(firsts, k=batch_size), random.choices(lasts, k=batch_size))
+    ]
@@ -1,4 +1,6 @@
 import secrets
+import uuid
+
 import factory
 
 from accounts.models import User, GameToken
@@ -41,8 +43,8 @@ class MinecraftAccountFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = MinecraftAccount
 
-    nickname = factory.Faker("user_name")
-    uuid = factory.LazyFunction(lambda: secrets.token_hex(16))
+    nickname = factory.Sequence(lambda n: f"player_{n}")
+    uuid = factory.LazyFunction(lambda: str(uuid.uuid4()))
 
     token = factory.SubFactory(GameTokenFactory)
 
@@ -0,0 +1,76 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubIdentityProvider:
+    """
+    Local stand-in for randomuser.me, served on 127.0.0.1 from a thread.
+
+    Usage:
+        with StubIdentityProvider(people=[("Alex", "Stone")]) as stub:
+            ... point NICKNAME_PROVIDER_URL at stub.url ...
+
+    Knobs (can be changed while running): `people`, `status`, `delay`.
+    Records `requests` (parsed query params) and `connections` (TCP
+    connections accepted) so tests can assert on keep-alive reuse.
+    """
+
+    def __init__(self, people=None, status=200, delay=0.0):
+        self.people = people or [("Alex", "Stone")]
+        self.status = status
+        self.delay = delay
+        self.requests = []
+        self.connections = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/api/"
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def setup(self):
+                stub.connections += 1
+                super().setup()
+
+            def do_GET(self):
+                params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                stub.requests.append(params)
+                if stub.delay:
+                    time.sleep(stub.delay)
+
+                count = int(params.get("results", 1))
+                results = [{"name": {"first": f, "last": l}} for f, l in stub.people[:count]]
+                body = json.dumps({"results": results}).encode()
+
+                try:
+                    self.send_response(stub.status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client already gave up (timeout tests)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
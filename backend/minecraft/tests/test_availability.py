@@ -0,0 +1,163 @@
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+
+from minecraft.availability import NicknameIndex, afilter_available, bloom_parameters, filter_available, get_nickname_index
+from minecraft.models import MinecraftAccount
+from .factories import MinecraftAccountFactory
+
+
+class NicknameIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        size, hashes = bloom_parameters(1000, 0.01)
+        self.index = NicknameIndex(size, hashes)
+
+    def test_added_names_are_members(self):
+        self.index.add("alex_stone")
+
+        self.assertIn("alex_stone", self.index)
+        self.assertNotIn("john_doe", self.index)
+
+    def test_membership_ignores_case(self):
+        self.index.add("Alex_Stone")
+
+        self.assertIn("alex_stone", self.index)
+
+    def test_discard_removes_membership(self):
+        self.index.add("alex_stone")
+        self.index.discard("alex_stone")
+
+        self.assertNotIn("alex_stone", self.index)
+
+    def test_rebuild_replaces_contents(self):
+        self.index.add("alex_stone")
+        count = self.index.rebuild(["john_doe", "maria_lopez"])
+
+        self.assertEqual(count, 2)
+        self.assertIn("john_doe", self.index)
+        self.assertNotIn("alex_stone", self.index)
+        self.assertGreater(self.index.built_at, 0)
+
+    def test_shared_file_is_visible_to_other_instances(self):
+        """Two handles on the same file behave like two workers on one node."""
+        path = os.path.join(tempfile.mkdtemp(), "nicknames.bloom")
+        size, hashes = bloom_parameters(1000, 0.01)
+
+        worker_a = NicknameIndex(size, hashes, path)
+        worker_b = NicknameIndex(size, hashes, path)
+        worker_a.add("alex_stone")
+
+        self.assertIn("alex_stone", worker_b)
+
+    def test_bloom_parameters_match_textbook_values(self):
+        size, hashes = bloom_parameters(1_000_000, 0.01)
+
+        self.assertAlmostEqual(size / 1_000_000, 9.59, places=2)
+        self.assertEqual(hashes, 7)
+
+
+class FilterAvailableTests(TestCase):
+
+    def setUp(self):
+        size, hashes = bloom_parameters(1000, 0.01)
+        self.index = NicknameIndex(size, hashes)
+        self.index.rebuild([])
+        patcher = patch("minecraft.availability.get_nickname_index", return_value=self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unknown_names_skip_the_database(self):
+        with self.assertNumQueries(0):
+            result = filter_available(["alex_stone", "john_doe", "alex_stone"])
+
+        self.assertEqual(result, ["alex_stone", "john_doe"])
+
+    def test_suspects_are_confirmed_in_one_query(self):
+        MinecraftAccountFactory(nickname="alex_stone")
+        self.index.add("alex_stone")
+        self.index.add("john_doe")  # false positive: in the filter, not in the table
+
+        with self.assertNumQueries(1):
+            result = filter_available(["alex_stone", "john_doe", "maria_lopez"])
+
+        self.assertEqual(result, ["john_doe", "maria_lopez"])
+
+    def test_without_index_every_batch_is_one_query(self):
+        MinecraftAccountFactory(nickname="alex_stone")
+
+        with patch("minecraft.availability.get_nickname_index", return_value=None):
+            with self.assertNumQueries(1):
+                result = filter_available(["alex_stone", "john_doe"])
+
+        self.assertEqual(result, ["john_doe"])
+
+    def test_names_taken_in_another_case_are_not_available(self):
+        MinecraftAccountFactory(nickname="Alex_Stone")
+
+        self.assertEqual(filter_available(["alex_stone", "ALEX_STONE", "john_doe"]), ["john_doe"])
+        self.assertEqual(async_to_sync(afilter_available)(["ALEX_stone", "john_doe"]), ["john_doe"])
+
+    def test_account_create_and_delete_update_the_index(self):
+        account = MinecraftAccountFactory(nickname="alex_stone")
+        self.assertIn("alex_stone", self.index)
+
+        account.delete()
+        self.assertNotIn("alex_stone", self.index)
+
+    def test_resaving_an_account_does_not_count_its_name_again(self):
+        account = MinecraftAccountFactory(nickname="alex_stone")
+        account = MinecraftAccount.objects.get(pk=account.pk)
+        account.is_active = False
+        account.save()
+        account.save()
+
+        account.delete()
+        self.assertNotIn("alex_stone", self.index)
+
+    def test_rename_moves_the_name(self):
+        account = MinecraftAccount.objects.get(pk=MinecraftAccountFactory(nickname="alex_stone").pk)
+
+        account.nickname = "john_doe"
+        account.save()
+
+        self.assertNotIn("alex_stone", self.index)
+        self.assertIn("john_doe", self.index)
+
+    @override_settings(NICKNAME_INDEX_MAX_AGE=-1)
+    def test_stale_index_is_bypassed(self):
+        MinecraftAccountFactory(nickname="alex_stone")
+
+        with self.assertNumQueries(1):
+            result = filter_available(["alex_stone", "john_doe"])
+
+        self.assertEqual(result, ["john_doe"])
+
+
+class NicknameIndexBuildTests(TestCase):
+
+    def test_requests_never_build_the_index(self):
+        index = get_nickname_index()
+        index.rebuild([])
+        MinecraftAccountFactory(nickname="alex_stone")
+
+        with override_settings(NICKNAME_INDEX_MAX_AGE=-1), patch.object(NicknameIndex, "rebuild") as rebuild:
+            self.assertEqual(filter_available(["alex_stone", "john_doe"]), ["john_doe"])
+        rebuild.assert_not_called()
+
+    def test_command_builds_the_index(self):
+        index = get_nickname_index()
+        MinecraftAccountFactory(nickname="alex_stone")
+        index.rebuild([])  # as if the account came in behind the ORM's back
+
+        call_command("rebuild_nickname_index", stdout=StringIO())
+
+        self.assertIn("alex_stone", index)
+
+    def test_tests_use_a_scratch_index_file(self):
+        self.assertFalse(get_nickname_index().path.startswith("/dev/shm"))
@@ -0,0 +1,158 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from minecraft.changes import CursorExpired, changes_since, current_cursor, prune_changes
+from minecraft.models import AccountChange, ChangeSequence, MinecraftAccount
+from minecraft.services import attach_uuids, link_accounts, reserve_tokens
+from .factories import GameTokenFactory, MinecraftAccountFactory, UserFactory
+
+
+class ChangeLogTests(TestCase):
+    def test_create_and_state_changes_are_logged(self):
+        account = MinecraftAccountFactory(uuid=None)
+
+        account = MinecraftAccount.objects.get(pk=account.pk)
+        account.is_dead = True
+        account.dead_at = timezone.now()
+        account.save()
+
+        entries = list(AccountChange.objects.order_by("id"))
+        self.assertEqual([e.action for e in entries], [AccountChange.CREATED, AccountChange.UPDATED])
+        self.assertEqual(entries[1].fields, ["is_dead", "dead_at"])
+        self.assertTrue(entries[1].state["is_dead"])
+
+    def test_save_without_tracked_changes_is_not_logged(self):
+        account = MinecraftAccount.objects.get(pk=MinecraftAccountFactory().pk)
+
+        account.save()
+
+        self.assertEqual(AccountChange.objects.filter(action=AccountChange.UPDATED).count(), 0)
+
+    def test_delete_is_logged(self):
+        account = MinecraftAccountFactory()
+        pk = account.pk
+
+        account.delete()
+
+        self.assertEqual(AccountChange.objects.latest("id").action, AccountChange.DELETED)
+        self.assertEqual(AccountChange.objects.latest("id").account_id, pk)
+
+    def test_log_rolls_back_with_the_change(self):
+        account = MinecraftAccount.objects.get(pk=MinecraftAccountFactory().pk)
+        other = MinecraftAccountFactory()
+        before = AccountChange.objects.count()
+
+        account.nickname = other.nickname
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            account.save()
+
+        self.assertEqual(AccountChange.objects.count(), before)
+
+    def test_bulk_link_and_attach_are_logged(self):
+        user = UserFactory()
+        GameTokenFactory.create_batch(2, user=user)
+
+        accounts = link_accounts(user, reserve_tokens(user), ["Alpha", "Beta"])
+        attach_uuids([{"account_id": accounts[0].pk, "uuid": "9b0d2f3e-0d6e-4d43-a1c5-4a2e5b9f1c11"}])
+
+        entries = list(AccountChange.objects.order_by("id").values_list("account_id", "action", "fields"))
+        self.assertEqual(entries[:2], [
+            (accounts[0].pk, AccountChange.CREATED, list(MinecraftAccount.TRACKED_FIELDS)),
+            (accounts[1].pk, AccountChange.CREATED, list(MinecraftAccount.TRACKED_FIELDS)),
+        ])
+        self.assertEqual(entries[2], (accounts[0].pk, AccountChange.UPDATED, ["uuid"]))
+        self.assertEqual(AccountChange.objects.latest("id").state["uuid"], "9b0d2f3e-0d6e-4d43-a1c5-4a2e5b9f1c11")
+
+
+class ChangesSinceTests(TestCase):
+    def test_pages_in_order(self):
+        MinecraftAccountFactory.create_batch(3)
+
+        first, cursor, has_more = changes_since(0, 2)
+        self.assertEqual(len(first), 2)
+        self.assertTrue(has_more)
+
+        rest, cursor, has_more = changes_since(cursor, 2)
+        self.assertEqual(len(rest), 1)
+        self.assertFalse(has_more)
+        self.assertEqual(changes_since(cursor, 2), ([], cursor, False))
+        self.assertEqual(cursor, current_cursor())
+
+    def make(self, pk, days_old=0):
+        AccountChange.objects.create(id=pk, account_id=1, action=AccountChange.UPDATED, fields=[], state={})
+        if days_old:
+            AccountChange.objects.filter(pk=pk).update(created_at=timezone.now() - timedelta(days=days_old))
+
+    def test_late_commit_is_served_after_what_was_already_read(self):
+        # id 2 is still in flight while 1 and 3 are read
+        self.make(1)
+        self.make(3)
+        first, cursor, _more = changes_since(0, 10)
+        self.assertEqual([c["cursor"] for c in first], [1, 2])
+
+        self.make(2)
+        late, cursor, _more = changes_since(cursor, 10)
+
+        self.assertEqual([c["cursor"] for c in late], [3])
+        self.assertEqual(AccountChange.objects.get(pk=2).seq, 3)
+        self.assertEqual(cursor, current_cursor())
+
+    @override_settings(MINECRAFT_CHANGES_RETENTION_DAYS=30)
+    def test_pruned_cursors_expire(self):
+        self.make(1, days_old=40)
+        self.make(2, days_old=40)
+        self.make(3)
+
+        self.assertEqual(prune_changes(), 2)
+
+        self.assertEqual(list(AccountChange.objects.values_list("seq", flat=True)), [3])
+        self.assertEqual([c["cursor"] for c in changes_since(2, 10)[0]], [3])
+        with self.assertRaises(CursorExpired):
+            changes_since(1, 10)
+        self.assertEqual(prune_changes(), 0)
+
+
+@override_settings(MINECRAFT_API_KEY="server-key")
+class ChangesViewTests(TestCase):
+    url = "/api/minecraft/changes/"
+
+    def get(self, **params):
+        return self.client.get(self.url, params, headers={"X-Server-Key": "server-key"})
+
+    def test_requires_server_key(self):
+        response = self.client.get(self.url, headers={"X-Server-Key": "wrong"})
+        self.assertEqual(response.status_code, 403)
+
+    def test_returns_deltas_after_cursor(self):
+        account = MinecraftAccountFactory()
+        cursor = self.get().json()["cursor"]
+
+        account = MinecraftAccount.objects.get(pk=account.pk)
+        account.is_active = False
+        account.save()
+        data = self.get(since=cursor).json()
+
+        self.assertEqual([c["fields"] for c in data["changes"]], [["is_active"]])
+        self.assertEqual(data["changes"][0]["account_id"], account.pk)
+        self.assertFalse(data["has_more"])
+
+    def test_rejects_bad_cursor(self):
+        self.assertEqual(self.get(since="abc").status_code, 400)
+
+    def test_pruned_cursor_is_gone(self):
+        ChangeSequence.objects.update_or_create(pk=1, defaults={"last": 10, "pruned_through": 5})
+
+        response = self.get(since=4)
+
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(self.get(since=5).status_code, 200)
+
+    def test_roster_hands_out_starting_cursor(self):
+        MinecraftAccountFactory()
+
+        response = self.client.get("/api/minecraft/roster/", headers={"X-Server-Key": "server-key"})
+
+        self.assertEqual(response["X-Changes-Cursor"], str(current_cursor()))
@@ -0,0 +1,140 @@
+from datetime import timedelta
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from minecraft.models import AccountChange, MinecraftAccount, ProcessedEvent
+from minecraft.services import (
+    ALREADY, APPLIED, DEATH, DEACTIVATION, DUPLICATE, NOT_FOUND, apply_events, sweep_processed_events,
+)
+from minecraft.servers import ServerIdentity
+from .factories import MinecraftAccountFactory
+
+SERVER = ServerIdentity(pk=1, name="survival")
+
+
+class ApplyEventsTests(TestCase):
+    def test_applies_deaths_with_their_own_timestamps(self):
+        accounts = MinecraftAccountFactory.create_batch(3, uuid=None)
+        base = timezone.now() - timedelta(minutes=5)
+        events = [
+            {"key": f"k{i}", "type": DEATH, "account_id": a.pk, "at": base + timedelta(seconds=i)}
+            for i, a in enumerate(accounts)
+        ]
+
+        results = apply_events(events, SERVER)
+
+        self.assertEqual([r[0] for r in results], [APPLIED] * 3)
+        for i, account in enumerate(accounts):
+            account.refresh_from_db()
+            self.assertTrue(account.is_dead)
+            self.assertEqual(account.dead_at, base + timedelta(seconds=i))
+
+    def test_query_count_does_not_grow_with_batch(self):
+        accounts = MinecraftAccountFactory.create_batch(50)
+        events = [{"key": str(uuid4()), "type": DEATH, "uuid": a.uuid} for a in accounts]
+        events += [{"key": str(uuid4()), "type": DEACTIVATION, "uuid": a.uuid} for a in accounts]
+
+        # savepoint, SELECT, key INSERT + read back, 2 UPDATEs, 1 change-log INSERT, release
+        with self.assertNumQueries(8):
+            results = apply_events(events, SERVER)
+
+        self.assertEqual({r[0] for r in results}, {APPLIED})
+        self.assertEqual(MinecraftAccount.objects.filter(is_dead=True, is_active=False).count(), 50)
+
+    def test_retry_is_a_noop(self):
+        account = MinecraftAccountFactory()
+        events = [{"key": "same", "type": DEACTIVATION, "account_id": account.pk}]
+
+        apply_events(events, SERVER)
+        changes = AccountChange.objects.count()
+        results = apply_events(events, SERVER)
+
+        self.assertEqual(results, [(DUPLICATE, account.pk)])
+        self.assertEqual(AccountChange.objects.count(), changes)
+
+    def test_keys_are_per_server(self):
+        accounts = MinecraftAccountFactory.create_batch(2)
+
+        apply_events([{"key": "1", "type": DEATH, "account_id": accounts[0].pk}], SERVER)
+        other = ServerIdentity(pk=2, name="creative")
+        results = apply_events([{"key": "1", "type": DEATH, "account_id": accounts[1].pk}], other)
+
+        self.assertEqual(results, [(APPLIED, accounts[1].pk)])
+
+    def test_key_stored_by_another_call_in_the_same_instant_is_a_duplicate(self):
+        account = MinecraftAccountFactory()
+        now = timezone.now()
+        # a concurrent call got there first, with the very same timestamp
+        ProcessedEvent.objects.create(key=f"{SERVER.namespace}:race", processed_at=now, claim=uuid4())
+
+        with patch("minecraft.services.timezone.now", return_value=now):
+            results = apply_events([{"key": "race", "type": DEATH, "account_id": account.pk}], SERVER)
+
+        self.assertEqual(results, [(DUPLICATE, account.pk)])
+        account.refresh_from_db()
+        self.assertFalse(account.is_dead)
+
+    def test_duplicate_key_in_batch_and_already_dead(self):
+        account = MinecraftAccountFactory(is_dead=True)
+        events = [
+            {"key": "a", "type": DEATH, "account_id": account.pk},
+            {"key": "a", "type": DEATH, "account_id": account.pk},
+        ]
+
+        self.assertEqual(apply_events(events, SERVER), [(ALREADY, account.pk), (DUPLICATE, None)])
+
+    def test_unknown_account_keeps_key_free_for_retry(self):
+        results = apply_events([{"key": "later", "type": DEATH, "account_id": 999999}], SERVER)
+
+        self.assertEqual(results, [(NOT_FOUND, None)])
+        self.assertFalse(ProcessedEvent.objects.exists())
+
+    def test_changes_are_logged(self):
+        account = MinecraftAccountFactory()
+
+        apply_events([{"key": "k", "type": DEATH, "account_id": account.pk}], SERVER)
+
+        entry = AccountChange.objects.latest("id")
+        self.assertEqual((entry.account_id, entry.fields), (account.pk, ["is_dead", "dead_at"]))
+        self.assertTrue(entry.state["is_dead"])
+
+    @override_settings(MINECRAFT_EVENT_KEY_TTL=60)
+    def test_sweep_forgets_old_keys(self):
+        ProcessedEvent.objects.create(key="old", processed_at=timezone.now() - timedelta(minutes=5))
+        ProcessedEvent.objects.create(key="new", processed_at=timezone.now())
+
+        self.assertEqual(sweep_processed_events(), 1)
+        self.assertEqual(list(ProcessedEvent.objects.values_list("key", flat=True)), ["new"])
+
+
+@override_settings(MINECRAFT_API_KEY="server-key")
+class StateEventsViewTests(TestCase):
+    url = "/api/minecraft/events/"
+
+    def post(self, items, key="server-key"):
+        return self.client.post(self.url, {"items": items}, content_type="application/json", headers={"X-Server-Key": key})
+
+    def test_requires_server_key(self):
+        self.assertEqual(self.post([], key="wrong").status_code, 403)
+
+    def test_mixed_batch(self):
+        account = MinecraftAccountFactory()
+
+        response = self.post([
+            {"key": "1", "type": "death", "account_id": account.pk},
+            {"key": "2", "type": "death"},
+            {"key": "3", "type": "explode", "account_id": account.pk},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([r["status"] for r in data["results"]], ["applied", "invalid", "invalid"])
+        self.assertEqual(data["summary"], {"applied": 1, "invalid": 2})
+
+    @override_settings(MINECRAFT_EVENTS_MAX_ITEMS=1)
+    def test_rejects_oversized_batch(self):
+        response = self.post([{"key": "1"}, {"key": "2"}])
+        self.assertEqual(response.status_code, 400)
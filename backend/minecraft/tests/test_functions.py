@@ -1,8 +1,15 @@
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, override_settings
 from unittest.mock import patch, MagicMock
 import requests
 
-from minecraft.utils import generate_unique_nickname
+from minecraft.provider import reset_provider_client
+from minecraft.leases import acquire_lease
+from minecraft.models import NicknameLease
+from minecraft.utils import (
+    allocate_suffixed_nickname, generate_unique_nickname, generate_unique_nicknames, lease_suffixed_nickname,
+    normalize_nickname,
+)
+from .factories import MinecraftAccountFactory
 
 
 def make_randomuser_response(names):
@@ -14,45 +21,64 @@ def make_randomuser_response(names):
     return mock_resp
 
 
-class GenerateUniqueNicknameTests(SimpleTestCase):
+class GenerateUniqueNicknameTests(TestCase):
 
-    @patch("minecraft.utils.MinecraftAccount")
-    @patch("minecraft.utils.requests.get")
-    def test_returns_first_unique_name(self, mock_get, MockMinecraftAccount):
+    def setUp(self):
+        # fresh client per test so breaker state doesn't leak between tests
+        reset_provider_client()
+        self.addCleanup(reset_provider_client)
+
+    @patch("minecraft.utils.filter_available")
+    @patch("minecraft.provider.requests.Session.get")
+    def test_returns_first_unique_name(self, mock_get, mock_available):
         mock_get.return_value = make_randomuser_response([
             ("Alex", "Stone"),
             ("John", "Doe"),
         ])
 
-        MockMinecraftAccount.objects.filter.return_value.exists.return_value = False
+        mock_available.side_effect = lambda names: list(names)
 
         result = generate_unique_nickname(10, "male", "US")
 
         self.assertEqual(result, "alex_stone")
         mock_get.assert_called_once()
-        MockMinecraftAccount.objects.filter.assert_called_with(nickname="alex_stone")
+        # the whole batch is checked in one go
+        mock_available.assert_called_once_with(["alex_stone", "john_doe"])
 
-    @patch("minecraft.utils.MinecraftAccount")
-    @patch("minecraft.utils.requests.get")
-    def test_skips_taken_name_and_returns_next_free(self, mock_get, MockMinecraftAccount):
+    @patch("minecraft.utils.filter_available")
+    @patch("minecraft.provider.requests.Session.get")
+    def test_skips_taken_name_and_returns_next_free(self, mock_get, mock_available):
         mock_get.return_value = make_randomuser_response([
             ("Alex", "Stone"),
             ("John", "Doe"),
         ])
 
-        MockMinecraftAccount.objects.filter.return_value.exists.side_effect = [
-            True,   # alex_stone taken
-            False,  # john_doe free
-        ]
+        # alex_stone taken, john_doe free
+        mock_available.return_value = ["john_doe"]
 
         result = generate_unique_nickname(10, None, None)
 
         self.assertEqual(result, "john_doe")
         mock_get.assert_called_once()
 
-    @patch("minecraft.utils.MinecraftAccount")
-    @patch("minecraft.utils.requests.get")
-    def test_multiple_batches_until_found(self, mock_get, MockMinecraftAccount):
+    @patch("minecraft.utils.filter_available")
+    @patch("minecraft.provider.requests.Session.get")
+    def test_skips_name_leased_by_a_parallel_request(self, mock_get, mock_available):
+        mock_get.return_value = make_randomuser_response([
+            ("Alex", "Stone"),
+            ("John", "Doe"),
+        ])
+        mock_available.side_effect = lambda names: list(names)
+        acquire_lease("alex_stone")
+
+        result = generate_unique_nickname(10, None, None)
+
+        self.assertEqual(result, "john_doe")
+        self.assertTrue(NicknameLease.objects.filter(nickname="john_doe").exists())
+
+    @patch("minecraft.utils.filter_available")
+    @patch("minecraft.provider.requests.Session.get")
+    def test_multiple_batches_until_found(self, mock_get, mock_available):
         first_batch = make_randomuser_response([
             ("Alex", "Stone"),
             ("John", "Doe"),
@@ -63,9 +89,9 @@ class GenerateUniqueNicknameTests(SimpleTestCase):
         ])
         mock_get.side_effect = [first_batch, second_batch]
 
-        MockMinecraftAccount.objects.filter.return_value.exists.side_effect = [
-            True, True, True,
-            False,
+        mock_available.side_effect = [
+            [],                    # whole first batch taken
+            ["sasha_petrenko"],
         ]
 
         result = generate_unique_nickname(6, "female", "UA")
@@ -82,28 +108,43 @@ class GenerateUniqueNicknameTests(SimpleTestCase):
         second_call_args, second_call_kwargs = mock_get.call_args_list[1]
         self.assertEqual(second_call_kwargs["params"]["results"], 1)
 
-    @patch("minecraft.utils.MinecraftAccount")
-    @patch("minecraft.utils.requests.get")
-    def test_returns_none_if_all_exhausted(self, mock_get, MockMinecraftAccount):
+    @patch("minecraft.utils.allocate_suffixed_nickname")
+    @patch("minecraft.utils.filter_available")
+    @patch("minecraft.provider.requests.Session.get")
+    def test_suffixes_first_candidate_if_all_exhausted(self, mock_get, mock_available, mock_allocate):
         mock_get.return_value = make_randomuser_response([
             ("Alex", "Stone"),
             ("John", "Doe"),
         ])
-        MockMinecraftAccount.objects.filter.return_value.exists.return_value = True
+        mock_available.return_value = []
+        mock_allocate.return_value = "alex_stone_3"
 
         result = generate_unique_nickname(2, None, None)
 
-        self.assertIsNone(result)
+        self.assertEqual(result, "alex_stone_3")
+        mock_allocate.assert_called_once_with("alex_stone")
         self.assertGreaterEqual(mock_get.call_count, 1)
 
-    @patch("minecraft.utils.requests.get")
+    @patch("minecraft.utils.allocate_suffixed_nickname")
+    @patch("minecraft.provider.requests.Session.get")
+    def test_returns_none_if_provider_gives_no_usable_names(self, mock_get, mock_allocate):
+        mock_get.return_value = make_randomuser_response([("", "")])
+
+        result = generate_unique_nickname(2, None, None)
+
+        self.assertIsNone(result)
+        mock_allocate.assert_not_called()
+
+    @override_settings(NICKNAME_FALLBACK_ENGINE="")
+    @patch("minecraft.provider.requests.Session.get")
     def test_raises_if_requests_exception(self, mock_get):
         mock_get.side_effect = requests.RequestException("network down")
 
         with self.assertRaises(requests.RequestException):
             generate_unique_nickname(10, None, None)
 
-    @patch("minecraft.utils.requests.get")
+    @override_settings(NICKNAME_FALLBACK_ENGINE="")
+    @patch("minecraft.provider.requests.Session.get")
     def test_raises_if_non_200_response(self, mock_get):
         bad_resp = MagicMock()
         bad_resp.status_code = 500
@@ -112,4 +153,127 @@ class GenerateUniqueNicknameTests(SimpleTestCase):
         with self.assertRaises(RuntimeError) as ctx:
             generate_unique_nickname(10, None, None)
 
-        self.assertIn("identity_provider_error", str(ctx.exception))
\ No newline at end of file
+        self.assertIn("identity_provider_error", str(ctx.exception))
+
+    @override_settings(NICKNAME_FALLBACK_ENGINE="local")
+    @patch("minecraft.utils.filter_available")
+    @patch("minecraft.provider.requests.Session.get")
+    def test_falls_back_to_local_engine_when_provider_is_down(self, mock_get, mock_available):
+        mock_get.side_effect = requests.Timeout("provider is slow")
+        mock_available.side_effect = lambda names: list(names)
+        mock_synth = MagicMock(return_value=["olena_shevchenko"])
+
+        with patch.dict("minecraft.utils.NICKNAME_ENGINES", {"local": mock_synth}):
+            result = generate_unique_nickname(10, "female", "UA")
+
+        self.assertEqual(result, "olena_shevchenko")
+        mock_synth.assert_called_once_with(5, "female", "UA")
+
+    @override_settings(NICKNAME_FALLBACK_ENGINE="local")
+    @patch("minecraft.utils.filter_available")
+    @patch("minecraft.provider.requests.Session.get")
+    def test_fallback_sticks_for_the_rest_of_the_call(self, mock_get, mock_available):
+        mock_get.side_effect = requests.Timeout("provider is slow")
+        mock_available.side_effect = [[], ["alex_stone"]]
+
+        result = generate_unique_nickname(10, None, None)
+
+        self.assertIsNotNone(result)
+        mock_get.assert_called_once()
+
+    @override_settings(NICKNAME_ENGINE="local")
+    @patch("minecraft.utils.filter_available")
+    @patch("minecraft.provider.requests.Session.get")
+    def test_local_engine_as_primary_never_calls_provider(self, mock_get, mock_available):
+        mock_available.side_effect = lambda names: list(names)
+
+        result = generate_unique_nickname(10, "male", "US")
+
+        self.assertRegex(result, r"^[a-z]+_[a-z]+$")
+        mock_get.assert_not_called()
+
+
+class GenerateUniqueNicknamesTests(TestCase):
+    def setUp(self):
+        reset_provider_client()
+
+    @patch("minecraft.provider.requests.Session.get")
+    def test_asks_for_the_whole_batch_in_one_call(self, mock_get):
+        mock_get.return_value = make_randomuser_response([("Alex", "Stone"), ("John", "Doe"), ("Mary", "Jane")])
+
+        result = generate_unique_nicknames(3, None, None)
+
+        self.assertEqual(result, ["alex_stone", "john_doe", "mary_jane"])
+        mock_get.assert_called_once()
+        self.assertEqual(mock_get.call_args.kwargs["params"]["results"], 3)
+        self.assertEqual(NicknameLease.objects.count(), 3)
+
+    @patch("minecraft.provider.requests.Session.get")
+    def test_tops_up_taken_and_leased_names(self, mock_get):
+        MinecraftAccountFactory(nickname="alex_stone")
+        acquire_lease("john_doe")
+        mock_get.side_effect = [
+            make_randomuser_response([("Alex", "Stone"), ("John", "Doe"), ("Mary", "Jane")]),
+            make_randomuser_response([("Olena", "Shevchenko"), ("Ivan", "Franko")]),
+        ]
+
+        result = generate_unique_nicknames(3, None, None)
+
+        self.assertEqual(result, ["mary_jane", "olena_shevchenko", "ivan_franko"])
+        self.assertEqual(mock_get.call_args.kwargs["params"]["results"], 2)
+
+    @patch("minecraft.provider.requests.Session.get")
+    def test_suffixes_popular_names_when_attempts_run_out(self, mock_get):
+        MinecraftAccountFactory(nickname="alex_stone")
+        mock_get.return_value = make_randomuser_response([("Alex", "Stone")])
+
+        result = generate_unique_nicknames(2, None, None, max_attempts=2)
+
+        self.assertEqual(result, ["alex_stone_1"])
+
+
+class AllocateSuffixedNicknameTests(TestCase):
+
+    def test_first_suffix_is_one(self):
+        MinecraftAccountFactory(nickname="alex_stone")
+
+        self.assertEqual(allocate_suffixed_nickname("alex_stone"), "alex_stone_1")
+
+    def test_picks_numerically_highest_suffix(self):
+        for nickname in ["alex_stone", "alex_stone_2", "alex_stone_9", "alex_stone_10"]:
+            MinecraftAccountFactory(nickname=nickname)
+
+        self.assertEqual(allocate_suffixed_nickname("alex_stone"), "alex_stone_11")
+
+    def test_ignores_other_names_sharing_the_prefix(self):
+        for nickname in ["alex_stone_3", "alex_stone_7x", "alex_stone_jr", "alex_stone_99_1", "alex_stoneman_50"]:
+            MinecraftAccountFactory(nickname=nickname)
+
+        self.assertEqual(allocate_suffixed_nickname("alex_stone"), "alex_stone_4")
+
+    def test_is_a_single_query(self):
+        MinecraftAccountFactory(nickname="alex_stone_1")
+
+        with self.assertNumQueries(1):
+            allocate_suffixed_nickname("alex_stone")
+
+    def test_leased_suffix_moves_on_to_the_next_one(self):
+        MinecraftAccountFactory(nickname="alex_stone_1")
+        acquire_lease("alex_stone_2")  # a parallel request got there first
+
+        self.assertEqual(lease_suffixed_nickname("alex_stone"), "alex_stone_3")
+
+    def test_long_base_is_trimmed_to_fit_the_suffix(self):
+        MinecraftAccountFactory(nickname="alexandra_stonem")
+
+        self.assertEqual(allocate_suffixed_nickname("alexandra_stonem"), "alexandra_st_1")
+        self.assertEqual(lease_suffixed_nickname("alexandra_stonem"), "alexandra_st_1")
+
+
+class NormalizeNicknameTests(SimpleTestCase):
+
+    def test_cut_to_minecraft_length_without_trailing_underscore(self):
+        self.assertEqual(normalize_nickname("Ålex", "Stone"), "alex_stone")
+        self.assertEqual(normalize_nickname("Maximiliano", "Rodriguez"), "maximiliano_rodr")
+        self.assertEqual(normalize_nickname("Bartholomew", "Yu"), "bartholomew_yu")
+        self.assertEqual(normalize_nickname("Bartholomewwwww", "Yu"), "bartholomewwwww")
@@ -0,0 +1,171 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+
+from minecraft.asgi import HandshakeFastPath
+from minecraft.handshake import get_handshake_cache
+from minecraft.models import MinecraftServer
+from minecraft.servers import get_server_key_cache, issue_key, lookup_server
+from minecraft.services import attach_uuids, link_account, reserve_token
+from minecraft.views import HandshakeView
+from .factories import GameTokenFactory, MinecraftAccountFactory
+
+
+@override_settings(MINECRAFT_API_KEY="server-key")
+class HandshakeViewTests(TestCase):
+    def setUp(self):
+        get_handshake_cache().clear()
+        self.factory = APIRequestFactory()
+        self.view = HandshakeView.as_view()
+
+    def get(self, key="server-key", **params):
+        request = self.factory.get("/fake-endpoint", params, HTTP_X_SERVER_KEY=key)
+        return self.view(request)
+
+    def test_requires_server_key(self):
+        account = MinecraftAccountFactory()
+
+        response = self.get(key="wrong", uuid=account.uuid)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_requires_exactly_one_of_token_or_uuid(self):
+        self.assertEqual(self.get().status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get(token="t", uuid="u").status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_second_lookup_is_served_from_cache(self):
+        account = MinecraftAccountFactory()
+
+        with self.assertNumQueries(1):
+            first = self.get(token=account.token.value)
+        with self.assertNumQueries(0):
+            second = self.get(token=account.token.value)
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(second.data["account_id"], account.pk)
+        self.assertEqual(second.data["uuid"], account.uuid)
+        self.assertNotIn("token", second.data)
+
+    def test_unknown_uuid_is_negatively_cached(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(uuid="00000000-0000-4000-8000-000000000000").status_code, status.HTTP_404_NOT_FOUND)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(uuid="00000000-0000-4000-8000-000000000000").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_state_change_invalidates(self):
+        account = MinecraftAccountFactory()
+        self.get(uuid=account.uuid)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            account.is_dead = True
+            account.save()
+
+        response = self.get(uuid=account.uuid)
+        self.assertTrue(response.data["is_dead"])
+
+    def test_bulk_uuid_attach_invalidates(self):
+        account = MinecraftAccountFactory(uuid=None)
+        self.assertEqual(self.get(token=account.token.value).data["uuid"], None)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            attach_uuids([{"account_id": account.pk, "uuid": "9b0d2f3e-0d6e-4d43-a1c5-4a2e5b9f1c11"}])
+
+        self.assertEqual(self.get(token=account.token.value).data["uuid"], "9b0d2f3e-0d6e-4d43-a1c5-4a2e5b9f1c11")
+        self.assertEqual(self.get(uuid="9b0d2f3e-0d6e-4d43-a1c5-4a2e5b9f1c11").data["account_id"], account.pk)
+
+    def test_linking_clears_negative_entry_for_token(self):
+        token = GameTokenFactory()
+        self.assertEqual(self.get(token=token.value).status_code, status.HTTP_404_NOT_FOUND)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            account = link_account(token.user, reserve_token(token.user), "FreshName")
+
+        response = self.get(token=token.value)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["account_id"], account.pk)
+
+
+@override_settings(MINECRAFT_API_KEY="server-key", MAINTENANCE_MODE=False)
+class HandshakeFastPathTests(TestCase):
+    def setUp(self):
+        get_handshake_cache().clear()
+        self.inner = AsyncMock()
+        self.app = HandshakeFastPath(self.inner)
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    def call(self, query, key=b"server-key", path="/api/minecraft/handshake/"):
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": query,
+            "headers": [(b"x-server-key", key)],
+        }
+        asyncio.run(self.app(scope, AsyncMock(), self.send))
+
+    def warm(self, account):
+        request = APIRequestFactory().get("/fake-endpoint", {"uuid": account.uuid}, HTTP_X_SERVER_KEY="server-key")
+        HandshakeView.as_view()(request)
+
+    def test_cache_hit_is_answered_without_django(self):
+        account = MinecraftAccountFactory()
+        self.warm(account)
+
+        self.call(f"uuid={account.uuid}".encode())
+
+        self.inner.assert_not_called()
+        self.assertEqual(self.sent[0]["status"], 200)
+        self.assertIn(f'"account_id": {account.pk}'.encode(), self.sent[1]["body"])
+
+    def test_miss_goes_to_django(self):
+        self.call(b"uuid=unknown")
+
+        self.inner.assert_awaited_once()
+
+    def test_wrong_key_goes_to_django(self):
+        account = MinecraftAccountFactory()
+        self.warm(account)
+
+        self.call(f"uuid={account.uuid}".encode(), key=b"wrong")
+
+        self.inner.assert_awaited_once()
+
+    def test_cached_server_key_is_answered_and_logged(self):
+        get_server_key_cache().clear()
+        key = issue_key(MinecraftServer.objects.create(name="survival-1"))
+        lookup_server(key)
+        account = MinecraftAccountFactory()
+        self.warm(account)
+
+        with self.assertLogs("minecraft.servers", "INFO") as logs:
+            self.call(f"uuid={account.uuid}".encode(), key=key.encode())
+
+        self.inner.assert_not_called()
+        self.assertIn("server=survival-1", logs.output[0])
+
+    def test_throttled_server_goes_to_django(self):
+        get_server_key_cache().clear()
+        key = issue_key(MinecraftServer.objects.create(name="survival-1", throttle_rate="10/min"))
+        lookup_server(key)
+        account = MinecraftAccountFactory()
+        self.warm(account)
+
+        self.call(f"uuid={account.uuid}".encode(), key=key.encode())
+
+        self.inner.assert_awaited_once()
+
+    def test_maintenance_mode_goes_to_django(self):
+        account = MinecraftAccountFactory()
+        self.warm(account)
+
+        with self.settings(MAINTENANCE_MODE=True):
+            self.call(f"uuid={account.uuid}".encode())
+
+        self.inner.assert_awaited_once()
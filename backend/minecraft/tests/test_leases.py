@@ -0,0 +1,89 @@
+import threading
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from minecraft.leases import acquire_first_lease, acquire_lease, acquire_leases, release_lease, sweep_expired_leases
+from minecraft.models import NicknameLease
+
+
+class NicknameLeaseTests(TestCase):
+
+    def test_only_one_holder_at_a_time(self):
+        self.assertTrue(acquire_lease("alex_stone"))
+        self.assertFalse(acquire_lease("alex_stone"))
+
+    def test_expired_lease_can_be_taken_over(self):
+        NicknameLease.objects.create(nickname="alex_stone", expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertTrue(acquire_lease("alex_stone"))
+        self.assertGreater(NicknameLease.objects.get().expires_at, timezone.now())
+
+    def test_release_frees_the_name(self):
+        acquire_lease("alex_stone")
+        release_lease("alex_stone")
+
+        self.assertTrue(acquire_lease("alex_stone"))
+
+    def test_first_lease_skips_held_names(self):
+        acquire_lease("alex_stone")
+
+        self.assertEqual(acquire_first_lease(["alex_stone", "john_doe"]), "john_doe")
+        self.assertIsNone(acquire_first_lease(["alex_stone", "john_doe"]))
+
+    def test_bulk_acquire_returns_only_the_names_won(self):
+        acquire_lease("john_doe")
+        NicknameLease.objects.create(nickname="dead", expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(acquire_leases(["alex_stone", "john_doe", "dead", "alex_stone"]), ["alex_stone", "dead"])
+
+    def test_sweep_removes_only_expired(self):
+        NicknameLease.objects.create(nickname="old", expires_at=timezone.now() - timedelta(seconds=1))
+        acquire_lease("fresh")
+
+        self.assertEqual(sweep_expired_leases(), 1)
+        self.assertEqual(list(NicknameLease.objects.values_list("nickname", flat=True)), ["fresh"])
+
+    def test_sweep_command(self):
+        NicknameLease.objects.create(nickname="old", expires_at=timezone.now() - timedelta(seconds=1))
+
+        call_command("sweep_nickname_leases", verbosity=0)
+
+        self.assertFalse(NicknameLease.objects.exists())
+
+
+@skipUnless(
+    connection.features.has_select_for_update,
+    "needs row-level locking: SQLite writers contend on table locks instead",
+)
+class ConcurrentLeaseTests(TransactionTestCase):
+    """A link storm where every request sees the same free candidates."""
+
+    workers = 8
+
+    def test_parallel_requests_lease_distinct_names(self):
+        candidates = [f"player_{i}" for i in range(self.workers)]
+        barrier = threading.Barrier(self.workers)
+        picked, errors = [], []
+
+        def pick():
+            try:
+                barrier.wait()
+                picked.append(acquire_first_lease(candidates))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=pick) for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertCountEqual(picked, candidates)
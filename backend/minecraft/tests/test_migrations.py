@@ -0,0 +1,97 @@
+from datetime import timedelta
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase, skipUnlessDBFeature
+from django.utils import timezone
+
+from minecraft.models import NICKNAME_CI_CONSTRAINT, AccountChange, MinecraftAccount, NicknameCandidate, NicknameLease
+from .factories import MinecraftAccountFactory
+
+
+def historical_apps(migration: str):
+    """Models as `migration` left them; columns they share with the current schema can be used."""
+    return MigrationLoader(connection).project_state(("minecraft", migration)).apps
+
+
+class FixNicknamesMigrationTests(TestCase):
+    migration = import_module("minecraft.migrations.0011_minecraftaccount_uuid_compact")
+
+    def test_renames_what_does_not_fit_without_clashing(self):
+        MinecraftAccountFactory(nickname="john_doe")
+        spaced = MinecraftAccountFactory(nickname="John Doe")
+        long = MinecraftAccountFactory(nickname="Alexander_Stonebridge")
+        other_long = MinecraftAccountFactory(nickname="Alexander_Stonebridgeford")
+        symbols = MinecraftAccountFactory(nickname="!!!")
+
+        with self.assertLogs("minecraft.migrations", "WARNING") as logs:
+            self.migration.fix_nicknames(historical_apps("0010_accountplaytime"), SimpleNamespace(connection=connection))
+
+        names = dict(MinecraftAccount.objects.values_list("pk", "nickname"))
+        self.assertEqual(names[spaced.pk], "John_Doe_2")
+        self.assertEqual(names[long.pk], "Alexander_Stoneb")
+        self.assertEqual(names[other_long.pk], "Alexander_Ston_2")
+        self.assertEqual(names[symbols.pk], "player")
+        self.assertIn(f"MinecraftAccount {long.pk} renamed: 'Alexander_Stonebridge' -> 'Alexander_Stoneb'", logs.output[1])
+        renamed = AccountChange.objects.filter(fields=["nickname"])
+        self.assertEqual(
+            {(c.account_id, c.state["nickname"]) for c in renamed},
+            {
+                (spaced.pk, "John_Doe_2"), (long.pk, "Alexander_Stoneb"),
+                (other_long.pk, "Alexander_Ston_2"), (symbols.pk, "player"),
+            },
+        )
+
+
+class RenameCaseDuplicatesMigrationTests(TestCase):
+    migration = import_module("minecraft.migrations.0014_minecraftaccount_nickname_ci_unique")
+
+    def drop_ci_index(self):
+        """Back to 0013's schema, where case-only duplicates could exist; the test transaction restores it."""
+        constraint = next(c for c in MinecraftAccount._meta.constraints if c.name == NICKNAME_CI_CONSTRAINT)
+        sql = constraint.remove_sql(MinecraftAccount, connection.schema_editor())
+        if sql is None:
+            self.skipTest("the column's collation already keeps names unique in any case")
+        with connection.cursor() as cursor:
+            cursor.execute(str(sql))
+
+    @skipUnlessDBFeature("can_rollback_ddl")
+    def test_keeps_the_oldest_and_renames_the_rest(self):
+        self.drop_ci_index()
+        original = MinecraftAccountFactory(nickname="Alex_Stone")
+        upper = MinecraftAccountFactory(nickname="ALEX_STONE")
+        lower = MinecraftAccountFactory(nickname="alex_stone")
+        MinecraftAccountFactory(nickname="ALEX_STONE_2")
+
+        with self.assertLogs("minecraft.migrations", "WARNING") as logs:
+            self.migration.rename_case_duplicates(
+                historical_apps("0013_compact_account_columns"), SimpleNamespace(connection=connection),
+            )
+
+        names = dict(MinecraftAccount.objects.values_list("pk", "nickname"))
+        self.assertEqual(names[original.pk], "Alex_Stone")
+        self.assertEqual(names[upper.pk], "ALEX_STONE_3")
+        self.assertEqual(names[lower.pk], "alex_stone_4")
+        self.assertEqual(len(logs.output), 2)
+        self.assertEqual(
+            set(AccountChange.objects.filter(fields=["nickname"]).values_list("account_id", flat=True)),
+            {upper.pk, lower.pk},
+        )
+
+
+class PurgeUnusableNamesMigrationTests(TestCase):
+    migration = import_module("minecraft.migrations.0017_narrow_pool_nicknames")
+
+    def test_drops_candidates_and_leases_that_cannot_fit(self):
+        NicknameCandidate.objects.create(nickname="Mary_Jane")
+        NicknameCandidate.objects.create(nickname="Mary_Jane_Watson_Parker")
+        expires = timezone.now() + timedelta(minutes=1)
+        NicknameLease.objects.create(nickname="alex_stone", expires_at=expires)
+        NicknameLease.objects.create(nickname="alex stone", expires_at=expires)
+
+        self.migration.purge_unusable_names(historical_apps("0016_processedevent_claim"), None)
+
+        self.assertEqual(list(NicknameCandidate.objects.values_list("nickname", flat=True)), ["Mary_Jane"])
+        self.assertEqual(list(NicknameLease.objects.values_list("nickname", flat=True)), ["alex_stone"])
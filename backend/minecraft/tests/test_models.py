@@ -55,6 +55,11 @@ class MinecraftAccountModelTests(TestCase):
         with self.assertRaises(IntegrityError):
             MinecraftAccountFactory(nickname="SameNick")
 
+    def test_unique_nickname_ignores_case(self):
+        MinecraftAccountFactory(nickname="SameNick")
+        with self.assertRaises(IntegrityError):
+            MinecraftAccountFactory(nickname="samenick")
+
     def test_unique_uuid(self):
         """uuid must be unique."""
         MinecraftAccountFactory(uuid="deadbeef-dead-beef-dead-beefdeadbeef")
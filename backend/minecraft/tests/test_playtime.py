@@ -0,0 +1,146 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from minecraft.models import AccountPlaytime, MinecraftServer, ProcessedEvent
+from minecraft.playtime import PlaytimeBuffer, get_playtime_buffer
+from minecraft.servers import get_server_key_cache, issue_key
+from .factories import MinecraftAccountFactory
+
+
+@override_settings(MINECRAFT_PLAYTIME_FLUSH_INTERVAL=3600)
+class PlaytimeBufferTests(TestCase):
+    def setUp(self):
+        self.buffer = PlaytimeBuffer()
+
+    def tearDown(self):
+        if self.buffer._timer is not None:
+            self.buffer._timer.cancel()
+
+    def test_merges_per_account_and_flushes_in_bulk(self):
+        accounts = MinecraftAccountFactory.create_batch(20)
+        for _tick in range(3):
+            self.buffer.add([{"uuid": a.uuid, "seconds": 10} for a in accounts])
+        self.assertEqual(len(self.buffer), 20)
+
+        # account lookup, savepoint, INSERT ... ON CONFLICT IGNORE, one UPDATE, release
+        with self.assertNumQueries(5):
+            self.assertEqual(self.buffer.flush(), 20)
+
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(set(AccountPlaytime.objects.values_list("seconds", flat=True)), {30})
+
+    def test_flushes_add_up(self):
+        account = MinecraftAccountFactory()
+        later = timezone.now() + timedelta(minutes=1)
+
+        self.buffer.add([{"account_id": account.pk, "seconds": 5}])
+        self.buffer.flush()
+        self.buffer.add([{"account_id": account.pk, "seconds": 7, "at": later}])
+        self.buffer.flush()
+
+        playtime = AccountPlaytime.objects.get(account=account)
+        self.assertEqual((playtime.seconds, playtime.last_seen_at), (12, later))
+
+    def test_failed_flush_keeps_the_time(self):
+        account = MinecraftAccountFactory()
+        self.buffer.add([{"account_id": account.pk, "seconds": 5}])
+
+        with patch.object(PlaytimeBuffer, "_write", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+        self.buffer.add([{"account_id": account.pk, "seconds": 5}])
+        self.buffer.flush()
+
+        self.assertEqual(AccountPlaytime.objects.get(account=account).seconds, 10)
+
+    def test_batch_keys_are_stored_with_the_seconds(self):
+        account = MinecraftAccountFactory()
+        self.buffer.add([{"account_id": account.pk, "seconds": 5}], key="heartbeat:legacy:1")
+        self.assertFalse(ProcessedEvent.objects.exists())
+
+        with patch.object(PlaytimeBuffer, "_credit", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+        # rolled back together: the batch can still be written
+        self.assertFalse(ProcessedEvent.objects.exists())
+
+        self.buffer.flush()
+        self.assertTrue(ProcessedEvent.objects.filter(key="heartbeat:legacy:1").exists())
+        self.assertEqual(AccountPlaytime.objects.get(account=account).seconds, 5)
+
+    def test_batch_another_worker_flushed_is_dropped(self):
+        account = MinecraftAccountFactory()
+        self.assertTrue(self.buffer.add([{"account_id": account.pk, "seconds": 5}], key="heartbeat:legacy:1"))
+        self.assertFalse(self.buffer.add([{"account_id": account.pk, "seconds": 5}], key="heartbeat:legacy:1"))
+        self.buffer.add([{"account_id": account.pk, "seconds": 7}], key="heartbeat:legacy:2")
+        ProcessedEvent.objects.create(key="heartbeat:legacy:1", processed_at=timezone.now())
+
+        self.buffer.flush()
+
+        self.assertEqual(AccountPlaytime.objects.get(account=account).seconds, 7)
+
+    def test_unknown_accounts_are_dropped(self):
+        self.buffer.add([{"uuid": "00000000-0000-4000-8000-000000000000", "seconds": 5}, {"account_id": 999999, "seconds": 5}])
+
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertFalse(AccountPlaytime.objects.exists())
+
+    @override_settings(MINECRAFT_PLAYTIME_FLUSH_MAX_ACCOUNTS=2)
+    def test_size_threshold_triggers_flush(self):
+        accounts = MinecraftAccountFactory.create_batch(2)
+
+        self.buffer.add([{"account_id": a.pk, "seconds": 3} for a in accounts])
+
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(AccountPlaytime.objects.count(), 2)
+
+
+@override_settings(MINECRAFT_API_KEY="server-key", MINECRAFT_PLAYTIME_FLUSH_INTERVAL=3600, MINECRAFT_HEARTBEAT_MAX_SECONDS=60)
+class HeartbeatsViewTests(TestCase):
+    url = "/api/minecraft/heartbeats/"
+
+    def setUp(self):
+        get_server_key_cache().clear()
+        self.buffer = get_playtime_buffer()
+        self.buffer.flush()
+
+    def post(self, payload, key="server-key"):
+        return self.client.post(self.url, payload, content_type="application/json", headers={"X-Server-Key": key})
+
+    def test_requires_server_key(self):
+        self.assertEqual(self.post({}, key="wrong").status_code, 403)
+
+    def test_retried_batch_is_not_double_counted(self):
+        account = MinecraftAccountFactory()
+        payload = {"key": "srv1-tick-1", "items": [{"account_id": account.pk, "seconds": 500}]}
+
+        first = self.post(payload)
+        second = self.post(payload)
+        self.buffer.flush()
+
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(second.json(), {"ok": True, "accepted": 0, "duplicate": True})
+        # capped at MINECRAFT_HEARTBEAT_MAX_SECONDS
+        self.assertEqual(AccountPlaytime.objects.get(account=account).seconds, 60)
+
+    def test_keys_are_per_server(self):
+        account = MinecraftAccountFactory()
+        other = issue_key(MinecraftServer.objects.create(name="survival-2"))
+        payload = {"key": "tick-1", "items": [{"account_id": account.pk, "seconds": 10}]}
+
+        self.assertEqual(self.post(payload).status_code, 202)
+        self.assertEqual(self.post(payload, key=other).status_code, 202)
+        self.buffer.flush()
+
+        self.assertEqual(AccountPlaytime.objects.get(account=account).seconds, 20)
+        # already flushed: a resend is known whichever worker gets it
+        self.assertTrue(self.post(payload).json()["duplicate"])
+
+    def test_invalid_item_rejects_the_batch(self):
+        response = self.post({"key": "k", "items": [{"seconds": 5}]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.buffer), 0)
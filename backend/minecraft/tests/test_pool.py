@@ -0,0 +1,103 @@
+import requests
+from django.test import TestCase, override_settings
+from unittest.mock import MagicMock, patch
+
+from minecraft.models import NicknameCandidate
+from minecraft.leases import acquire_lease
+from minecraft.pool import pop_pooled_nickname, pop_pooled_nicknames, pool_size, refill_pool
+from .factories import MinecraftAccountFactory
+
+
+class PopPooledNicknameTests(TestCase):
+
+    def test_returns_none_when_pool_is_empty(self):
+        self.assertIsNone(pop_pooled_nickname(None, None))
+
+    def test_pops_oldest_candidate_and_removes_it(self):
+        NicknameCandidate.objects.create(nickname="alex_stone")
+        NicknameCandidate.objects.create(nickname="john_doe")
+
+        self.assertEqual(pop_pooled_nickname(None, None), "alex_stone")
+        self.assertFalse(NicknameCandidate.objects.filter(nickname="alex_stone").exists())
+        self.assertEqual(NicknameCandidate.objects.count(), 1)
+
+    def test_respects_gender_and_nationality_bucket(self):
+        NicknameCandidate.objects.create(nickname="john_doe", gender="male", nationality="US")
+        NicknameCandidate.objects.create(nickname="olena_shevchenko", gender="female", nationality="UA")
+
+        self.assertEqual(pop_pooled_nickname("female", "ua"), "olena_shevchenko")
+        self.assertIsNone(pop_pooled_nickname("female", "UA"))
+
+    def test_unset_params_match_any_bucket(self):
+        NicknameCandidate.objects.create(nickname="john_doe", gender="male", nationality="US")
+
+        self.assertEqual(pop_pooled_nickname(None, None), "john_doe")
+
+    def test_skips_candidates_taken_since_refill(self):
+        MinecraftAccountFactory(nickname="alex_stone")
+        NicknameCandidate.objects.create(nickname="alex_stone")
+        NicknameCandidate.objects.create(nickname="john_doe")
+
+        self.assertEqual(pop_pooled_nickname(None, None), "john_doe")
+        self.assertEqual(NicknameCandidate.objects.count(), 0)
+
+
+    def test_bulk_pop_takes_oldest_free_candidates(self):
+        MinecraftAccountFactory(nickname="alex_stone")
+        acquire_lease("john_doe")
+        for nickname in ["alex_stone", "john_doe", "mary_jane", "olena_shevchenko", "ivan_franko"]:
+            NicknameCandidate.objects.create(nickname=nickname)
+
+        with self.assertNumQueries(6):
+            popped = pop_pooled_nicknames(None, None, 4)
+
+        self.assertEqual(popped, ["mary_jane", "olena_shevchenko"])
+        self.assertEqual(list(NicknameCandidate.objects.values_list("nickname", flat=True)), ["ivan_franko"])
+
+@override_settings(NICKNAME_ENGINE="randomuser", NICKNAME_FALLBACK_ENGINE="")
+class RefillPoolTests(TestCase):
+
+    def setUp(self):
+        self.mock_fetch = MagicMock()
+        engines = patch.dict("minecraft.utils.NICKNAME_ENGINES", {"randomuser": self.mock_fetch})
+        engines.start()
+        self.addCleanup(engines.stop)
+
+    def test_fills_bucket_up_to_target_skipping_taken_names(self):
+        MinecraftAccountFactory(nickname="alex_stone")
+        NicknameCandidate.objects.create(nickname="john_doe", gender="male", nationality="US")
+        self.mock_fetch.return_value = ["alex_stone", "john_doe", "maria_lopez", "sasha_petrenko"]
+
+        added = refill_pool("male", "us", target=3)
+
+        self.assertEqual(added, 2)
+        self.assertEqual(pool_size("male", "US"), 3)
+        self.mock_fetch.assert_called_once_with(2, "male", "US")
+
+    def test_stops_when_provider_only_returns_taken_names(self):
+        MinecraftAccountFactory(nickname="alex_stone")
+        self.mock_fetch.return_value = ["alex_stone"]
+
+        added = refill_pool(None, None, target=10)
+
+        self.assertEqual(added, 0)
+        self.assertEqual(self.mock_fetch.call_count, 3)
+
+    def test_noop_when_bucket_already_full(self):
+        NicknameCandidate.objects.create(nickname="john_doe")
+
+        self.assertEqual(refill_pool(None, None, target=1), 0)
+        self.mock_fetch.assert_not_called()
+
+    @override_settings(NICKNAME_ENGINE="local")
+    @patch("minecraft.provider.requests.Session.get")
+    def test_local_engine_refills_without_the_provider(self, mock_get):
+        self.assertEqual(refill_pool(None, None, target=5), 5)
+        mock_get.assert_not_called()
+
+    @override_settings(NICKNAME_FALLBACK_ENGINE="local")
+    def test_falls_back_when_the_provider_is_down(self):
+        self.mock_fetch.side_effect = requests.ConnectionError("provider is down")
+
+        self.assertEqual(refill_pool(None, None, target=5), 5)
+        self.mock_fetch.assert_called_once()
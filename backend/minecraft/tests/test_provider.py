@@ -0,0 +1,171 @@
+import asyncio
+import time
+import requests
+from django.test import SimpleTestCase
+
+from minecraft.provider import AsyncIdentityProviderClient, CircuitBreaker, IdentityProviderClient, ProviderUnavailable
+from .provider_stub import StubIdentityProvider
+
+
+def make_client(url, read_timeout=1.0, failure_threshold=2, reset_timeout=30.0):
+    return IdentityProviderClient(
+        base_url=url,
+        connect_timeout=1.0,
+        read_timeout=read_timeout,
+        pool_size=2,
+        breaker=CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=reset_timeout),
+    )
+
+
+class IdentityProviderClientTests(SimpleTestCase):
+
+    def test_returns_people_and_forwards_filters(self):
+        with StubIdentityProvider(people=[("Alex", "Stone"), ("John", "Doe")]) as stub:
+            people = make_client(stub.url).get_people(2, "male", "US")
+
+        self.assertEqual([p["name"]["first"] for p in people], ["Alex", "John"])
+        self.assertEqual(stub.requests, [{"results": "2", "gender": "male", "nat": "US"}])
+
+    def test_reuses_one_keep_alive_connection(self):
+        with StubIdentityProvider() as stub:
+            client = make_client(stub.url)
+            for _ in range(5):
+                client.get_people(1, None, None)
+
+        self.assertEqual(len(stub.requests), 5)
+        self.assertEqual(stub.connections, 1)
+
+    def test_non_200_raises_runtime_error(self):
+        with StubIdentityProvider(status=503) as stub:
+            with self.assertRaises(RuntimeError):
+                make_client(stub.url).get_people(1, None, None)
+
+    def test_circuit_opens_and_fails_fast(self):
+        with StubIdentityProvider(delay=0.3) as stub:
+            client = make_client(stub.url, read_timeout=0.1, failure_threshold=2)
+
+            for _ in range(2):
+                with self.assertRaises(requests.Timeout):
+                    client.get_people(1, None, None)
+
+            started = time.monotonic()
+            with self.assertRaises(ProviderUnavailable):
+                client.get_people(1, None, None)
+            elapsed = time.monotonic() - started
+
+        self.assertEqual(len(stub.requests), 2)
+        self.assertLess(elapsed, 0.05)
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_probe_closes_circuit_on_success(self):
+        with StubIdentityProvider(status=500) as stub:
+            client = make_client(stub.url, failure_threshold=1, reset_timeout=0.05)
+
+            with self.assertRaises(RuntimeError):
+                client.get_people(1, None, None)
+            self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+            stub.status = 200
+            time.sleep(0.06)
+            client.get_people(1, None, None)
+
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_probe_failure_reopens_circuit(self):
+        with StubIdentityProvider(status=500) as stub:
+            client = make_client(stub.url, failure_threshold=1, reset_timeout=0.05)
+
+            with self.assertRaises(RuntimeError):
+                client.get_people(1, None, None)
+            time.sleep(0.06)
+            with self.assertRaises(RuntimeError):
+                client.get_people(1, None, None)
+
+            with self.assertRaises(ProviderUnavailable):
+                client.get_people(1, None, None)
+
+        self.assertEqual(len(stub.requests), 2)
+
+    def test_lost_half_open_trial_is_retried_after_the_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())  # the trial, which never reports back
+
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+
+
+def make_async_client(url, read_timeout=1.0, failure_threshold=2, reset_timeout=30.0):
+    return AsyncIdentityProviderClient(
+        base_url=url,
+        connect_timeout=1.0,
+        read_timeout=read_timeout,
+        pool_size=2,
+        max_connections=10,
+        breaker=CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=reset_timeout),
+    )
+
+
+class AsyncIdentityProviderClientTests(SimpleTestCase):
+
+    async def test_returns_people_and_forwards_filters(self):
+        with StubIdentityProvider(people=[("Alex", "Stone")]) as stub:
+            client = make_async_client(stub.url)
+            people = await client.get_people(1, "female", "UA")
+            await client.client.aclose()
+
+        self.assertEqual(people[0]["name"]["first"], "Alex")
+        self.assertEqual(stub.requests, [{"results": "1", "gender": "female", "nat": "UA"}])
+
+    async def test_concurrent_requests_overlap(self):
+        with StubIdentityProvider(delay=0.2) as stub:
+            client = make_async_client(stub.url)
+            started = time.monotonic()
+            await asyncio.gather(*(client.get_people(1, None, None) for _ in range(5)))
+            elapsed = time.monotonic() - started
+            await client.client.aclose()
+
+        self.assertEqual(len(stub.requests), 5)
+        # five 200ms calls in flight together, not one after another
+        self.assertLess(elapsed, 0.6)
+
+    async def test_timeout_maps_to_requests_timeout_and_opens_circuit(self):
+        with StubIdentityProvider(delay=0.3) as stub:
+            client = make_async_client(stub.url, read_timeout=0.1, failure_threshold=1)
+            with self.assertRaises(requests.Timeout):
+                await client.get_people(1, None, None)
+            with self.assertRaises(ProviderUnavailable):
+                await client.get_people(1, None, None)
+            await client.client.aclose()
+
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+    async def test_non_200_raises_runtime_error(self):
+        with StubIdentityProvider(status=503) as stub:
+            client = make_async_client(stub.url)
+            with self.assertRaises(RuntimeError):
+                await client.get_people(1, None, None)
+            await client.client.aclose()
+
+    async def test_cancelled_half_open_trial_reopens_circuit(self):
+        with StubIdentityProvider(status=500, delay=0.3) as stub:
+            client = make_async_client(stub.url, failure_threshold=1, reset_timeout=0.05)
+            with self.assertRaises(RuntimeError):
+                await client.get_people(1, None, None)
+            await asyncio.sleep(0.06)
+
+            trial = asyncio.create_task(client.get_people(1, None, None))
+            await asyncio.sleep(0.05)
+            trial.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await trial
+            self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+            stub.status, stub.delay = 200, 0
+            await asyncio.sleep(0.06)
+            await client.get_people(1, None, None)
+            await client.client.aclose()
+
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
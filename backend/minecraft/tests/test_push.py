@@ -0,0 +1,125 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+
+from minecraft import push
+from minecraft.models import AccountChange, ChangeSequence
+from .factories import MinecraftAccountFactory
+
+
+class ReadAfterTests(TestCase):
+    def make(self, pk):
+        return AccountChange.objects.create(id=pk, account_id=1, action=AccountChange.UPDATED, fields=[], state={})
+
+    def test_reads_in_commit_order(self):
+        self.make(1)
+        self.make(3)
+        entries, cursor = push.read_after(0, 10)
+        self.assertEqual([e["seq"] for e in entries], [1, 2])
+
+        # committed after 3 was read: comes next rather than being skipped
+        self.make(2)
+        entries, cursor = push.read_after(cursor, 10)
+
+        self.assertEqual([e["seq"] for e in entries], [3])
+        self.assertEqual(cursor, 3)
+
+
+class SubscriptionTests(TestCase):
+    @override_settings(MINECRAFT_PUSH_BUFFER=1)
+    async def test_overflow_ends_the_subscription_after_draining(self):
+        subscription = push.get_hub().subscribe()
+        try:
+            subscription.offer([{"id": 1}, {"id": 2}])
+
+            self.assertEqual(await subscription.next(0.1), {"id": 1})
+            with self.assertRaises(push.Overflow):
+                await subscription.next(0.1)
+        finally:
+            subscription.close()
+        self.assertIsNone(push.get_hub().task)
+
+
+    @override_settings(MINECRAFT_PUSH_POLL_INTERVAL=0.05)
+    async def test_hub_that_cannot_start_ends_subscriptions_and_retries(self):
+        failing = AsyncMock(side_effect=[RuntimeError("db down"), 7])
+        with patch.object(push, "acurrent_cursor", failing), self.assertLogs("minecraft.push", "ERROR"):
+            subscription = push.get_hub().subscribe()
+            try:
+                # woken right away (a ping), then ended
+                self.assertIsNone(await subscription.next(5))
+                with self.assertRaises(push.Overflow):
+                    await subscription.next(5)
+                await asyncio.sleep(0.1)
+
+                self.assertEqual(failing.await_count, 2)
+                self.assertFalse(push.get_hub().task.done())
+            finally:
+                subscription.close()
+
+
+@override_settings(MINECRAFT_PUSH_POLL_INTERVAL=0.05, MINECRAFT_PUSH_HEARTBEAT=5)
+class StreamTests(TestCase):
+    async def frame(self, stream):
+        return await asyncio.wait_for(stream.__anext__(), 2)
+
+    async def test_catches_up_then_follows_live_changes(self):
+        first = await sync_to_async(MinecraftAccountFactory)()
+        stream = push.stream(since=0)
+        try:
+            self.assertTrue((await self.frame(stream)).startswith(b"retry: 1000\nid: 0\n"))
+            caught_up = await self.frame(stream)
+            self.assertIn(f'"account_id":{first.pk}'.encode(), caught_up)
+
+            second = await sync_to_async(MinecraftAccountFactory)()
+            live = await self.frame(stream)
+            self.assertIn(f'"account_id":{second.pk}'.encode(), live)
+            self.assertTrue(live.startswith(b"id: "))
+        finally:
+            await stream.aclose()
+
+    async def test_resume_skips_what_the_client_has(self):
+        await sync_to_async(MinecraftAccountFactory)()
+        cursor = await push.acurrent_cursor()
+        stream = push.stream(since=cursor)
+        try:
+            await self.frame(stream)
+            later = await sync_to_async(MinecraftAccountFactory)()
+            self.assertIn(f'"account_id":{later.pk}'.encode(), await self.frame(stream))
+        finally:
+            await stream.aclose()
+
+
+@override_settings(MINECRAFT_API_KEY="server-key")
+class ChangeStreamViewTests(TestCase):
+    url = "/api/minecraft/stream/"
+
+    def test_requires_server_key(self):
+        response = self.client.get(self.url, headers={"X-Server-Key": "wrong"})
+        self.assertEqual(response.status_code, 403)
+
+    def test_refuses_wsgi(self):
+        response = self.client.get(self.url, headers={"X-Server-Key": "server-key"})
+        self.assertEqual(response.status_code, 501)
+
+    async def test_streams_events_under_asgi(self):
+        response = await self.async_client.get(self.url, headers={"X-Server-Key": "server-key", "Last-Event-ID": "0"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        content = aiter(response.streaming_content)
+        self.assertTrue((await asyncio.wait_for(anext(content), 2)).startswith(b"retry: 1000\nid: 0\n"))
+        await content.aclose()
+
+    async def test_rejects_bad_cursor(self):
+        response = await self.async_client.get(self.url, headers={"X-Server-Key": "server-key", "Last-Event-ID": "x"})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_pruned_cursor_is_gone(self):
+        await ChangeSequence.objects.aupdate_or_create(pk=1, defaults={"last": 10, "pruned_through": 5})
+
+        response = await self.async_client.get(self.url, headers={"X-Server-Key": "server-key", "Last-Event-ID": "4"})
+
+        self.assertEqual(response.status_code, 410)
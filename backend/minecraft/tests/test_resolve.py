@@ -0,0 +1,58 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+
+from minecraft.views import ResolveNicknameView
+from .factories import MinecraftAccountFactory
+
+
+@override_settings(MINECRAFT_API_KEY="server-key")
+class ResolveNicknameViewTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.view = ResolveNicknameView.as_view()
+
+    def get(self, key="server-key", **params):
+        request = self.factory.get("/fake-endpoint", params, HTTP_X_SERVER_KEY=key)
+        return self.view(request)
+
+    def test_requires_server_key(self):
+        MinecraftAccountFactory(nickname="alex_stone")
+
+        self.assertEqual(self.get(key="wrong", nickname="alex_stone").status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_requires_a_nickname_of_minecraft_length(self):
+        self.assertEqual(self.get().status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get(nickname="x" * 17).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_matches_any_case_in_one_query(self):
+        account = MinecraftAccountFactory(nickname="Alex_Stone")
+
+        with self.assertNumQueries(1):
+            response = self.get(nickname="ALEX_stone")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["account_id"], account.pk)
+        self.assertEqual(response.data["nickname"], "Alex_Stone")
+        self.assertEqual(response.data["uuid"], account.uuid)
+
+    def test_unknown_nickname_is_404(self):
+        MinecraftAccountFactory(nickname="alex_stone")
+
+        self.assertEqual(self.get(nickname="alex_ston").status_code, status.HTTP_404_NOT_FOUND)
+
+    @skipUnless(connection.vendor == "sqlite", "reads SQLite's query plan")
+    def test_lookup_uses_the_case_insensitive_index(self):
+        MinecraftAccountFactory(nickname="alex_stone")
+
+        with CaptureQueriesContext(connection) as queries:
+            self.get(nickname="Alex_Stone")
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {queries[0]['sql']}")
+            plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+
+        self.assertIn("minecraft_account_nickname_ci_unique", plan)
@@ -0,0 +1,112 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+
+from minecraft.models import MinecraftAccount
+from minecraft.roster import iter_roster, roster_etag
+from minecraft.services import attach_uuids
+from .factories import MinecraftAccountFactory
+
+
+def parse(content: bytes) -> list[dict]:
+    return [json.loads(line) for line in content.splitlines()]
+
+
+class IterRosterTests(TestCase):
+    def test_pages_by_id_and_skips_inactive(self):
+        accounts = MinecraftAccountFactory.create_batch(5)
+        MinecraftAccountFactory(is_active=False)
+
+        # 3 pages of 2: the last one is short and ends the export
+        with self.assertNumQueries(3):
+            chunks = list(iter_roster(chunk_size=2))
+
+        self.assertEqual(len(chunks), 3)
+        rows = parse(b"".join(chunks))
+        self.assertEqual([r["account_id"] for r in rows], [a.pk for a in accounts])
+        self.assertEqual(set(rows[0]), {"account_id", "nickname", "uuid", "is_dead"})
+
+    def test_empty_table_yields_nothing(self):
+        self.assertEqual(list(iter_roster()), [])
+
+
+class RosterEtagTests(TestCase):
+    def test_changes_on_insert_update_and_delete(self):
+        account = MinecraftAccountFactory(uuid=None)
+        seen = {roster_etag()}
+
+        MinecraftAccountFactory()
+        seen.add(roster_etag())
+
+        attach_uuids([{"account_id": account.pk, "uuid": "9b0d2f3e-0d6e-4d43-a1c5-4a2e5b9f1c11"}])
+        seen.add(roster_etag())
+
+        MinecraftAccount.objects.filter(pk=account.pk).delete()
+        seen.add(roster_etag())
+
+        self.assertEqual(len(seen), 4)
+
+    def test_stable_without_writes(self):
+        MinecraftAccountFactory()
+        self.assertEqual(roster_etag(), roster_etag())
+
+    def test_two_lookups_whatever_the_table_size(self):
+        MinecraftAccountFactory.create_batch(5)
+        roster_etag()
+
+        # pending entries check, then the sequence row
+        with self.assertNumQueries(2):
+            roster_etag()
+
+
+@override_settings(MINECRAFT_API_KEY="server-key", MINECRAFT_ROSTER_PAGE_SIZE=2)
+class RosterViewTests(TestCase):
+    url = "/api/minecraft/roster/"
+
+    def test_requires_server_key(self):
+        response = self.client.get(self.url, headers={"X-Server-Key": "wrong"})
+        self.assertEqual(response.status_code, 403)
+
+    def test_streams_ndjson_with_etag(self):
+        accounts = MinecraftAccountFactory.create_batch(3)
+
+        response = self.client.get(self.url, headers={"X-Server-Key": "server-key"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(response["ETag"], roster_etag())
+        rows = parse(b"".join(response.streaming_content))
+        self.assertEqual([r["account_id"] for r in rows], [a.pk for a in accounts])
+
+    def test_unchanged_roster_returns_304(self):
+        MinecraftAccountFactory()
+        etag = roster_etag()
+
+        response = self.client.get(self.url, headers={"X-Server-Key": "server-key", "If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_stale_etag_gets_full_roster(self):
+        MinecraftAccountFactory()
+        etag = roster_etag()
+        MinecraftAccountFactory()
+
+        response = self.client.get(self.url, headers={"X-Server-Key": "server-key", "If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(parse(b"".join(response.streaming_content))), 2)
+
+    def test_asgi_streams_async_iterator(self):
+        accounts = MinecraftAccountFactory.create_batch(3)
+
+        async def fetch():
+            response = await self.async_client.get(self.url, headers={"X-Server-Key": "server-key"})
+            return response, b"".join([chunk async for chunk in response])
+
+        response, content = async_to_sync(fetch)()
+
+        self.assertTrue(response.is_async)
+        self.assertEqual([r["account_id"] for r in parse(content)], [a.pk for a in accounts])
@@ -0,0 +1,123 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from minecraft.models import MinecraftServer, ServerKey
+from minecraft.servers import LEGACY, get_server_key_cache, hash_key, issue_key, lookup_server, rotate_key
+from .factories import MinecraftAccountFactory
+
+
+@override_settings(MINECRAFT_API_KEY="")
+class LookupServerTests(TestCase):
+    def setUp(self):
+        get_server_key_cache().clear()
+        self.server = MinecraftServer.objects.create(name="survival-1")
+
+    def test_only_the_hash_is_stored(self):
+        raw_key = issue_key(self.server)
+
+        key = ServerKey.objects.get()
+        self.assertEqual(key.key_hash, hash_key(raw_key))
+        self.assertNotIn(raw_key, (key.key_hash, key.prefix))
+
+    def test_lookup_is_cached(self):
+        raw_key = issue_key(self.server)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(lookup_server(raw_key).name, "survival-1")
+        with self.assertNumQueries(0):
+            self.assertEqual(lookup_server(raw_key).pk, self.server.pk)
+
+    def test_unknown_key_is_negatively_cached(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(lookup_server("nope"))
+            self.assertIsNone(lookup_server("nope"))
+
+    def test_disabled_server_is_rejected_once_cache_is_cleared(self):
+        raw_key = issue_key(self.server)
+        lookup_server(raw_key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.server.is_active = False
+            self.server.save()
+
+        self.assertIsNone(lookup_server(raw_key))
+
+    def test_rotation_overlaps(self):
+        old_key = issue_key(self.server)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_key = rotate_key(self.server, grace=60)
+
+        self.assertEqual(lookup_server(old_key).pk, self.server.pk)
+        self.assertEqual(lookup_server(new_key).pk, self.server.pk)
+
+        ServerKey.objects.filter(key_hash=hash_key(old_key)).update(expires_at=timezone.now() - timedelta(seconds=1))
+        get_server_key_cache().clear()
+        self.assertIsNone(lookup_server(old_key))
+        self.assertIsNotNone(lookup_server(new_key))
+
+    @override_settings(MINECRAFT_API_KEY="global-key")
+    def test_legacy_global_key_still_works(self):
+        self.assertIs(lookup_server("global-key"), LEGACY)
+
+    def test_command_prints_the_key_once(self):
+        out = StringIO()
+        call_command("issue_server_key", "creative-1", stdout=out)
+
+        raw_key = out.getvalue().splitlines()[-1]
+        self.assertEqual(lookup_server(raw_key).name, "creative-1")
+
+
+@override_settings(MINECRAFT_API_KEY="")
+class ServerKeyRequestTests(TestCase):
+    def setUp(self):
+        get_server_key_cache().clear()
+        cache.clear()  # throttle history
+        self.server = MinecraftServer.objects.create(name="survival-1", throttle_rate="2/min")
+        self.key = issue_key(self.server)
+
+    def get(self, key):
+        return self.client.get("/api/minecraft/changes/", headers={"X-Server-Key": key})
+
+    def test_server_key_authenticates_and_is_logged(self):
+        with self.assertLogs("minecraft.servers", "INFO") as logs:
+            response = self.get(self.key)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("server=survival-1 method=GET path=/api/minecraft/changes/ status=200", logs.output[0])
+
+    def test_wrong_key_is_rejected(self):
+        self.assertEqual(self.get("wrong").status_code, 403)
+
+    def test_per_server_throttle(self):
+        other = issue_key(MinecraftServer.objects.create(name="survival-2", throttle_rate="2/min"))
+
+        statuses = [self.get(self.key).status_code for _ in range(3)]
+
+        self.assertEqual(statuses, [200, 200, 429])
+        # the other server has its own budget
+        self.assertEqual(self.get(other).status_code, 200)
+
+    @override_settings(MINECRAFT_SERVER_THROTTLE_RATE="1/min")
+    def test_servers_without_their_own_rate_get_the_default(self):
+        default = issue_key(MinecraftServer.objects.create(name="survival-2"))
+
+        statuses = [self.get(default).status_code for _ in range(2)]
+
+        self.assertEqual(statuses, [200, 429])
+
+    def test_attach_posts_are_throttled_per_server_too(self):
+        account = MinecraftAccountFactory(uuid=None)
+        items = {"items": [{"account_id": account.pk, "uuid": "9b0d2f3e-0d6e-4d43-a1c5-4a2e5b9f1c11"}]}
+
+        statuses = [
+            self.client.post("/api/minecraft/link-token/", items, content_type="application/json", headers={"X-Server-Key": self.key}).status_code
+            for _ in range(3)
+        ]
+
+        self.assertEqual(statuses, [200, 200, 429])
@@ -0,0 +1,141 @@
+import threading
+from datetime import timedelta
+
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from accounts.models import GameToken
+from minecraft.models import MinecraftAccount
+from minecraft.services import ReservationLost, link_account, link_accounts, release_token, reserve_token, reserve_tokens
+from .factories import UserFactory, GameTokenFactory, MinecraftAccountFactory
+
+
+class TokenReservationTests(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+
+    def test_reserves_oldest_free_token(self):
+        first = GameTokenFactory(user=self.user)
+        GameTokenFactory(user=self.user)
+
+        token = reserve_token(self.user)
+
+        self.assertEqual(token.pk, first.pk)
+        first.refresh_from_db()
+        self.assertIsNotNone(first.reserved_until)
+        self.assertGreater(first.reserved_until, timezone.now())
+
+    def test_reserved_token_is_skipped_until_it_expires(self):
+        token = GameTokenFactory(user=self.user)
+
+        self.assertIsNotNone(reserve_token(self.user))
+        self.assertIsNone(reserve_token(self.user))
+
+        token.reserved_until = timezone.now() - timedelta(seconds=1)
+        token.save(update_fields=["reserved_until"])
+        self.assertEqual(reserve_token(self.user).pk, token.pk)
+
+    def test_release_makes_token_available_again(self):
+        GameTokenFactory(user=self.user)
+        token = reserve_token(self.user)
+
+        release_token(token)
+
+        token.refresh_from_db()
+        self.assertIsNone(token.reserved_until)
+        self.assertEqual(reserve_token(self.user).pk, token.pk)
+
+    def test_link_burns_token_and_clears_reservation(self):
+        GameTokenFactory(user=self.user)
+        token = reserve_token(self.user)
+
+        account = link_account(self.user, token, "alex_stone")
+
+        token.refresh_from_db()
+        self.assertEqual(account.token_id, token.pk)
+        self.assertFalse(token.is_active)
+        self.assertIsNone(token.reserved_until)
+
+    def test_taken_nickname_rolls_back_the_burn(self):
+        MinecraftAccountFactory(nickname="alex_stone")
+        GameTokenFactory(user=self.user)
+        token = reserve_token(self.user)
+
+        with self.assertRaises(IntegrityError):
+            link_account(self.user, token, "alex_stone")
+
+        # same reservation still usable for the next name
+        account = link_account(self.user, token, "john_doe")
+        self.assertEqual(account.nickname, "john_doe")
+
+    def test_link_fails_once_reservation_was_taken_over(self):
+        GameTokenFactory(user=self.user)
+        stale = reserve_token(self.user)
+        stale.reserved_until -= timedelta(seconds=1)  # what an expired-and-reclaimed reservation looks like
+
+        with self.assertRaises(ReservationLost):
+            link_account(self.user, stale, "alex_stone")
+
+    def test_reserve_many_respects_limit_and_order(self):
+        tokens = [GameTokenFactory(user=self.user) for _ in range(3)]
+
+        reserved = reserve_tokens(self.user, 2)
+
+        self.assertEqual([t.pk for t in reserved], [t.pk for t in tokens[:2]])
+        self.assertEqual([t.pk for t in reserve_tokens(self.user)], [tokens[2].pk])
+
+    def test_link_many_burns_all_tokens_in_one_go(self):
+        for _ in range(3):
+            GameTokenFactory(user=self.user)
+        tokens = reserve_tokens(self.user)
+
+        accounts = link_accounts(self.user, tokens, ["alex_stone", "john_doe", "mary_jane"])
+
+        self.assertEqual([(a.token_id, a.nickname) for a in accounts], [
+            (tokens[0].pk, "alex_stone"), (tokens[1].pk, "john_doe"), (tokens[2].pk, "mary_jane"),
+        ])
+        self.assertFalse(GameToken.objects.filter(is_active=True).exists())
+
+    def test_link_many_writes_nothing_when_one_name_is_taken(self):
+        MinecraftAccountFactory(nickname="john_doe")
+        for _ in range(2):
+            GameTokenFactory(user=self.user)
+        tokens = reserve_tokens(self.user)
+
+        with self.assertRaises(IntegrityError):
+            link_accounts(self.user, tokens, ["alex_stone", "john_doe"])
+
+        self.assertEqual(GameToken.objects.filter(user=self.user, is_active=True).count(), 2)
+        self.assertFalse(MinecraftAccount.objects.filter(owner=self.user).exists())
+
+
+class ConcurrentReservationTests(TransactionTestCase):
+    """Real threads, real connections: parallel claims must never collide."""
+
+    workers = 8
+
+    def test_parallel_reservations_get_distinct_tokens(self):
+        user = UserFactory()
+        tokens = [GameTokenFactory(user=user) for _ in range(self.workers)]
+        barrier = threading.Barrier(self.workers)
+        results, errors = [], []
+
+        def claim():
+            try:
+                barrier.wait()
+                results.append(reserve_token(user).pk)
+            except Exception as exc:  # surfaced below, a thread can't fail the test itself
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=claim) for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertCountEqual(results, [t.pk for t in tokens])
+        self.assertIsNone(reserve_token(user))
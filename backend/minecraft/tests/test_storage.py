@@ -0,0 +1,90 @@
+from io import StringIO
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from minecraft.models import NICKNAME_CI_CONSTRAINT, MinecraftAccount
+from .factories import MinecraftAccountFactory
+
+UUID = "9b0d2f3e-0d6e-4d43-a1c5-4a2e5b9f1c11"
+
+
+class CompactUUIDFieldTests(TestCase):
+
+    def test_round_trips_as_canonical_string(self):
+        account = MinecraftAccountFactory(uuid=UUID.upper().replace("-", ""))
+        account.refresh_from_db()
+
+        self.assertEqual(account.uuid, UUID)
+        self.assertEqual(MinecraftAccount.objects.values_list("uuid", flat=True).get(pk=account.pk), UUID)
+
+    def test_lookups_accept_any_spelling(self):
+        account = MinecraftAccountFactory(uuid=UUID)
+
+        self.assertEqual(MinecraftAccount.objects.get(uuid=UUID.upper()).pk, account.pk)
+        self.assertEqual(MinecraftAccount.objects.filter(uuid__in=[UUID.replace("-", "")]).count(), 1)
+
+    def test_stored_compactly(self):
+        account = MinecraftAccountFactory(uuid=UUID)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT uuid FROM minecraft_minecraftaccount WHERE id = %s", [account.pk])
+            stored = cursor.fetchone()[0]
+
+        self.assertEqual(stored, UUID.replace("-", ""))
+
+    def test_rejects_malformed_values(self):
+        with self.assertRaises(ValidationError):
+            MinecraftAccount._meta.get_field("uuid").to_python("nope")
+
+    def test_null_stays_null(self):
+        account = MinecraftAccountFactory(uuid=None)
+        account.refresh_from_db()
+
+        self.assertIsNone(account.uuid)
+
+
+class NicknameCaseInsensitivityTests(TestCase):
+
+    def constraint(self):
+        return next(c for c in MinecraftAccount._meta.constraints if c.name == NICKNAME_CI_CONSTRAINT)
+
+    def test_lower_index_is_skipped_on_mysql(self):
+        # the ascii_general_ci column's own unique index is case-insensitive there
+        mysql = SimpleNamespace(connection=SimpleNamespace(vendor="mysql"))
+        constraint = self.constraint()
+
+        self.assertIsNone(constraint.create_sql(MinecraftAccount, mysql))
+        self.assertIsNone(constraint.remove_sql(MinecraftAccount, mysql))
+        self.assertIsNone(constraint.constraint_sql(MinecraftAccount, mysql))
+
+    def test_lower_index_is_created_elsewhere(self):
+        sql = self.constraint().create_sql(MinecraftAccount, connection.schema_editor())
+
+        self.assertIn("LOWER", str(sql).upper())
+
+    def test_nicknamed_matches_any_case(self):
+        account = MinecraftAccountFactory(nickname="Notch")
+
+        self.assertEqual(list(MinecraftAccount.objects.nicknamed("notch", "jeb_")), [account])
+
+    def test_nicknamed_compares_the_column_on_mysql(self):
+        with patch.object(connection, "vendor", "mysql"):
+            sql = str(MinecraftAccount.objects.nicknamed("Notch").query)
+
+        self.assertNotIn("LOWER", sql.upper())
+
+
+class BenchmarkAccountStorageCommandTests(TestCase):
+
+    def test_reports_lookup_timings(self):
+        MinecraftAccountFactory.create_batch(3)
+        out = StringIO()
+
+        call_command("benchmark_account_storage", lookups=5, stdout=out)
+
+        self.assertIn("lookup by uuid: 3 queries", out.getvalue())
+        self.assertIn("lookup by nickname: 3 queries", out.getvalue())
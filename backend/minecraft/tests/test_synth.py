@@ -0,0 +1,34 @@
+from django.test import SimpleTestCase
+
+from minecraft.models import NICKNAME_MAX_LENGTH
+from minecraft.synth import _corpora, _tables, available_nationalities, synthesize_candidates
+
+
+class SynthesizeCandidatesTests(SimpleTestCase):
+
+    def test_returns_requested_number_of_first_last_names(self):
+        names = synthesize_candidates(50, None, None)
+
+        self.assertEqual(len(names), 50)
+        for name in names:
+            self.assertRegex(name, r"^[a-z]+_[a-z]+$")
+
+    def test_respects_gender_and_nationality_partition(self):
+        ua = _corpora()["UA"]
+
+        for name in synthesize_candidates(200, "female", "ua"):
+            first, last = name.split("_")
+            self.assertIn(first, ua["female"])
+            # long pairs are cut to Minecraft's 16 chars
+            self.assertLessEqual(len(name), NICKNAME_MAX_LENGTH)
+            self.assertTrue(any(full.startswith(last) for full in ua["last"]))
+
+    def test_unknown_nationality_mixes_all_corpora(self):
+        firsts, lasts = _tables("male", "ZZ")
+        all_lasts = {name for tables in _corpora().values() for name in tables["last"]}
+
+        self.assertEqual(set(lasts), all_lasts)
+        self.assertGreater(len(firsts), len(_corpora()["US"]["male"]))
+
+    def test_bundles_randomuser_nationalities(self):
+        self.assertTrue({"US", "GB", "UA", "DE", "FR"} <= set(available_nationalities()))
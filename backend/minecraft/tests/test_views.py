@@ -1,12 +1,24 @@
-from django.test import TestCase
-from unittest.mock import patch
+from unittest import skipUnless
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+import threading
+from datetime import timedelta
+from uuid import uuid4
+from unittest.mock import AsyncMock, patch
 from rest_framework.test import APIRequestFactory, force_authenticate
 from rest_framework import status
+from rest_framework.throttling import UserRateThrottle
+from rest_framework_simplejwt.tokens import RefreshToken
 import requests
 
-from minecraft.views import LinkMinecraftAccountView
-from minecraft.models import MinecraftAccount
-from .factories import UserFactory, GameTokenFactory
+from accounts.models import GameToken
+from minecraft.views import BulkLinkMinecraftAccountView, LinkMinecraftAccountView
+from minecraft.models import MinecraftAccount, NicknameCandidate, NicknameLease
+from .factories import UserFactory, GameTokenFactory, MinecraftAccountFactory
 
 
 class LinkMinecraftAccountViewTests(TestCase):
@@ -87,6 +99,102 @@ class LinkMinecraftAccountViewTests(TestCase):
             nationality="US",
         )
 
+    def test_pooled_candidate_is_used_without_calling_provider(self):
+        """
+        When the pool has a candidate for the requested bucket, the view
+        consumes it and never reaches generate_unique_nickname.
+        """
+        GameTokenFactory(user=self.user, is_active=True)
+        NicknameCandidate.objects.create(nickname="olena_shevchenko", gender="female", nationality="UA")
+
+        request = self.factory.get("/fake-endpoint", {"gender": "female", "nationality": "UA"})
+        force_authenticate(request, user=self.user)
+
+        with patch("minecraft.views.generate_unique_nickname") as mock_gen:
+            response = self.view(request)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["nickname"], "olena_shevchenko")
+        self.assertFalse(NicknameCandidate.objects.exists())
+        self.assertFalse(NicknameLease.objects.exists())  # dropped once the account exists
+        mock_gen.assert_not_called()
+
+    def test_lost_nickname_race_retries_with_a_fresh_name(self):
+        """
+        If the unique index rejects a name that looked free (another node took
+        it), the view picks a new one instead of failing the request.
+        """
+        GameTokenFactory(user=self.user, is_active=True)
+        MinecraftAccountFactory(nickname="alex_stone")
+
+        request = self.factory.get("/fake-endpoint")
+        force_authenticate(request, user=self.user)
+
+        with patch("minecraft.views.generate_unique_nickname") as mock_gen:
+            mock_gen.side_effect = ["alex_stone", "john_doe"]
+            response = self.view(request)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["nickname"], "john_doe")
+        self.assertEqual(mock_gen.call_count, 2)
+
+    def test_a_token_clash_is_not_retried_with_another_name(self):
+        token = GameTokenFactory(user=self.user, is_active=True)
+
+        request = self.factory.get("/fake-endpoint")
+        force_authenticate(request, user=self.user)
+
+        with patch("minecraft.views.generate_unique_nickname", return_value="john_doe") as mock_gen, \
+                patch("minecraft.views.link_account", side_effect=IntegrityError(
+                    "UNIQUE constraint failed: minecraft_minecraftaccount.token_id"
+                )) as mock_link, \
+                patch("minecraft.views.remember_taken") as mock_remember:
+            response = self.view(request)
+
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+        self.assertEqual((mock_gen.call_count, mock_link.call_count), (1, 1))
+        mock_remember.assert_not_called()
+        self.assertFalse(NicknameLease.objects.exists())
+        token.refresh_from_db()
+        self.assertIsNone(token.reserved_until)
+
+    def test_provider_is_called_outside_of_a_transaction(self):
+        """
+        The token is reserved up front and no transaction stays open while
+        the nickname is being generated.
+        """
+        token = GameTokenFactory(user=self.user, is_active=True)
+        depth = len(connection.atomic_blocks)  # TestCase's own wrapping transaction
+        seen = {}
+
+        def fake_generate(**kwargs):
+            seen["depth"] = len(connection.atomic_blocks)
+            seen["reserved_until"] = type(token).objects.get(pk=token.pk).reserved_until
+            return "alex_stone"
+
+        request = self.factory.get("/fake-endpoint")
+        force_authenticate(request, user=self.user)
+
+        with patch("minecraft.views.generate_unique_nickname", side_effect=fake_generate):
+            response = self.view(request)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(seen["depth"], depth)
+        self.assertIsNotNone(seen["reserved_until"])
+
+    def test_reserved_token_is_not_handed_out_twice(self):
+        """A token held by an in-flight request counts as unavailable."""
+        GameTokenFactory(user=self.user, is_active=True, reserved_until=timezone.now() + timedelta(seconds=30))
+
+        request = self.factory.get("/fake-endpoint")
+        force_authenticate(request, user=self.user)
+
+        with patch("minecraft.views.generate_unique_nickname") as mock_gen:
+            response = self.view(request)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        mock_gen.assert_not_called()
+
     def test_external_request_exception_returns_502_and_does_not_consume_token(self):
         """
         If generate_unique_nickname raises a requests.RequestException:
@@ -116,6 +224,7 @@ class LinkMinecraftAccountViewTests(TestCase):
         # token should still be active (not burned)
         token.refresh_from_db()
         self.assertTrue(token.is_active)
+        self.assertIsNone(token.reserved_until)  # reservation handed back
 
     def test_runtime_error_returns_502_identity_provider_error(self):
         """
@@ -173,4 +282,313 @@ class LinkMinecraftAccountViewTests(TestCase):
 
         # token should still be active (unchanged)
         token.refresh_from_db()
-        self.assertTrue(token.is_active)
\ No newline at end of file
+        self.assertTrue(token.is_active)
+
+
+class AsyncLinkMinecraftAccountViewTests(TestCase):
+    """Goes through the ASGI handler, so the async middleware path is covered too."""
+
+    url = "/api/minecraft/link-token/async/"
+
+    def setUp(self):
+        self.user = UserFactory()
+        access = RefreshToken.for_user(self.user).access_token
+        self.headers = {"Authorization": f"Bearer {access}"}
+
+    async def test_anonymous_returns_401(self):
+        response = await self.async_client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_shares_the_sync_views_rate_limit(self):
+        await sync_to_async(cache.clear)()
+        self.addCleanup(cache.clear)
+
+        with patch.object(UserRateThrottle, "THROTTLE_RATES", {"user": "1/min", "anon": None}):
+            first = await self.async_client.get(self.url, headers=self.headers)
+            second = await self.async_client.get(self.url, headers=self.headers)
+
+        self.assertEqual(first.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(second.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", second.headers)
+
+    async def test_no_available_token_returns_403(self):
+        with patch("minecraft.views.agenerate_unique_nickname", new_callable=AsyncMock) as mock_gen:
+            response = await self.async_client.get(self.url, headers=self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json()["detail"], "No available tokens. Generate one first.")
+        mock_gen.assert_not_called()
+
+    async def test_happy_path_creates_account_and_burns_token(self):
+        token = await sync_to_async(GameTokenFactory)(user=self.user, is_active=True)
+
+        with patch("minecraft.views.agenerate_unique_nickname", new_callable=AsyncMock) as mock_gen:
+            mock_gen.return_value = "alex_stone"
+            response = await self.async_client.get(self.url, {"gender": "male", "nationality": "US"}, headers=self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data = response.json()
+        self.assertEqual(data["nickname"], "alex_stone")
+        self.assertIsNone(data["uuid"])
+
+        account = await MinecraftAccount.objects.aget(pk=data["account_id"])
+        self.assertEqual(account.token_id, token.pk)
+        await token.arefresh_from_db()
+        self.assertFalse(token.is_active)
+        mock_gen.assert_awaited_once_with(max_attempts=10, gender="male", nationality="US")
+
+    async def test_lost_nickname_race_retries_with_a_fresh_name(self):
+        await sync_to_async(GameTokenFactory)(user=self.user, is_active=True)
+        await sync_to_async(MinecraftAccountFactory)(nickname="alex_stone")
+
+        with patch("minecraft.views.agenerate_unique_nickname", new_callable=AsyncMock) as mock_gen:
+            mock_gen.side_effect = ["alex_stone", "john_doe"]
+            response = await self.async_client.get(self.url, headers=self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["nickname"], "john_doe")
+
+    async def test_provider_failure_returns_502_and_keeps_token(self):
+        token = await sync_to_async(GameTokenFactory)(user=self.user, is_active=True)
+
+        with patch("minecraft.views.agenerate_unique_nickname", new_callable=AsyncMock) as mock_gen:
+            mock_gen.side_effect = requests.Timeout("boom")
+            response = await self.async_client.get(self.url, headers=self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+        self.assertEqual(response.json()["detail"], "Failed to generate identity. Please try again.")
+        await token.arefresh_from_db()
+        self.assertTrue(token.is_active)
+        self.assertFalse(await MinecraftAccount.objects.aexists())
+
+
+@skipUnless(
+    connection.features.has_select_for_update_skip_locked,
+    "needs SKIP LOCKED: SQLite writers contend on table locks instead",
+)
+class ConcurrentLinkTests(TransactionTestCase):
+    """Parallel link requests of one user each bind their own token."""
+
+    workers = 6
+
+    def test_parallel_requests_bind_distinct_tokens(self):
+        user = UserFactory()
+        for _ in range(self.workers):
+            GameTokenFactory(user=user, is_active=True)
+
+        view = LinkMinecraftAccountView.as_view()
+        names = iter([f"player_{i}" for i in range(self.workers)])
+        names_lock = threading.Lock()
+        barrier = threading.Barrier(self.workers)
+        statuses, errors = [], []
+
+        def next_name(**kwargs):
+            with names_lock:
+                return next(names)
+
+        def link():
+            try:
+                request = APIRequestFactory().get("/fake-endpoint")
+                force_authenticate(request, user=user)
+                barrier.wait()
+                statuses.append(view(request).status_code)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        with patch("minecraft.views.generate_unique_nickname", side_effect=next_name) as mock_gen:
+            threads = [threading.Thread(target=link) for _ in range(self.workers)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(statuses, [status.HTTP_201_CREATED] * self.workers)
+        # one name per request: nobody had to retry
+        self.assertEqual(mock_gen.call_count, self.workers)
+        self.assertEqual(MinecraftAccount.objects.values("token").distinct().count(), self.workers)
+
+
+class BulkLinkMinecraftAccountViewTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.view = BulkLinkMinecraftAccountView.as_view()
+        self.user = UserFactory(slots=3)
+
+    def get(self, params=None):
+        request = self.factory.get("/fake-endpoint", params or {})
+        force_authenticate(request, user=self.user)
+        return self.view(request)
+
+    def test_links_every_free_token_with_one_engine_call(self):
+        tokens = [GameTokenFactory(user=self.user, is_active=True) for _ in range(3)]
+
+        with patch("minecraft.views.generate_unique_nicknames") as mock_gen:
+            mock_gen.return_value = ["alex_stone", "john_doe", "mary_jane"]
+            response = self.get({"gender": "male"})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([a["nickname"] for a in response.data["accounts"]], ["alex_stone", "john_doe", "mary_jane"])
+        mock_gen.assert_called_once_with(3, gender="male", nationality=None)
+        self.assertEqual(
+            set(MinecraftAccount.objects.values_list("token_id", flat=True)),
+            {t.pk for t in tokens},
+        )
+        self.assertFalse(GameToken.objects.filter(is_active=True).exists())
+
+    def test_count_limits_how_many_tokens_are_linked(self):
+        first, second, third = [GameTokenFactory(user=self.user, is_active=True) for _ in range(3)]
+
+        with patch("minecraft.views.generate_unique_nicknames", return_value=["alex_stone", "john_doe"]):
+            response = self.get({"count": 2})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["accounts"]), 2)
+        third.refresh_from_db()
+        self.assertTrue(third.is_active)
+        self.assertIsNone(third.reserved_until)
+
+    def test_pool_is_used_before_the_engine(self):
+        for _ in range(3):
+            GameTokenFactory(user=self.user, is_active=True)
+        NicknameCandidate.objects.create(nickname="olena_shevchenko")
+
+        with patch("minecraft.views.generate_unique_nicknames", return_value=["alex_stone", "john_doe"]) as mock_gen:
+            response = self.get()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["accounts"][0]["nickname"], "olena_shevchenko")
+        mock_gen.assert_called_once_with(2, gender=None, nationality=None)
+
+    def test_a_token_clash_is_not_retried_with_the_same_names(self):
+        GameTokenFactory(user=self.user, is_active=True)
+
+        with patch("minecraft.views.generate_unique_nicknames", return_value=["alex_stone"]), \
+                patch("minecraft.views.link_accounts", side_effect=IntegrityError(
+                    "UNIQUE constraint failed: minecraft_minecraftaccount.token_id"
+                )) as mock_link:
+            response = self.get()
+
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+        mock_link.assert_called_once()
+        self.assertFalse(NicknameLease.objects.exists())
+        self.assertFalse(GameToken.objects.filter(reserved_until__isnull=False).exists())
+
+    def test_only_taken_names_are_replaced_after_a_lost_race(self):
+        GameTokenFactory(user=self.user, is_active=True)
+        GameTokenFactory(user=self.user, is_active=True)
+        MinecraftAccountFactory(nickname="alex_stone")
+
+        with patch("minecraft.views.generate_unique_nicknames") as mock_gen:
+            mock_gen.side_effect = [["alex_stone", "john_doe"], ["mary_jane"]]
+            response = self.get()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(sorted(a["nickname"] for a in response.data["accounts"]), ["john_doe", "mary_jane"])
+        self.assertEqual(mock_gen.call_args_list[1].args[0], 1)
+
+    def test_invalid_count_returns_400(self):
+        GameTokenFactory(user=self.user, is_active=True)
+
+        response = self.get({"count": 0})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("count", response.data)
+
+    def test_no_available_tokens_returns_403(self):
+        response = self.get()
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_provider_failure_returns_502_and_releases_tokens(self):
+        GameTokenFactory(user=self.user, is_active=True)
+        GameTokenFactory(user=self.user, is_active=True)
+
+        with patch("minecraft.views.generate_unique_nicknames", side_effect=requests.ConnectionError("boom")):
+            response = self.get()
+
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+        self.assertFalse(MinecraftAccount.objects.exists())
+        self.assertFalse(GameToken.objects.filter(reserved_until__isnull=False).exists())
+        self.assertEqual(GameToken.objects.filter(is_active=True).count(), 2)
+
+
+@override_settings(MINECRAFT_API_KEY="server-key")
+class AttachUUIDTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.view = LinkMinecraftAccountView.as_view()
+
+    def post(self, items, key="server-key"):
+        request = self.factory.post("/fake-endpoint", {"items": items}, format="json", HTTP_X_SERVER_KEY=key)
+        return self.view(request)
+
+    def test_requires_server_key(self):
+        response = self.post([], key="wrong")
+
+        # anonymous request + failed permission -> DRF answers 401 (JWT auth has a challenge header)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_attaches_by_token_and_by_account_id_in_one_query(self):
+        by_token = MinecraftAccountFactory(uuid=None)
+        by_id = MinecraftAccountFactory(uuid=None)
+        uuids = [str(uuid4()), str(uuid4())]
+
+        # one SELECT + bulk UPDATE + change-log INSERT inside its savepoint
+        with self.assertNumQueries(5):
+            response = self.post([
+                {"token": by_token.token.value, "uuid": uuids[0]},
+                {"account_id": by_id.pk, "uuid": uuids[1]},
+            ])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["status"] for r in response.data["results"]], ["attached", "attached"])
+        by_token.refresh_from_db()
+        by_id.refresh_from_db()
+        self.assertEqual((by_token.uuid, by_id.uuid), tuple(uuids))
+
+    def test_reattaching_same_uuid_is_a_noop(self):
+        uuid = str(uuid4())
+        account = MinecraftAccountFactory(uuid=uuid)
+
+        with self.assertNumQueries(1):
+            response = self.post([{"account_id": account.pk, "uuid": uuid}])
+
+        self.assertEqual(response.data["results"], [{"status": "unchanged", "account_id": account.pk}])
+
+    def test_per_item_results(self):
+        owner = MinecraftAccountFactory(uuid=str(uuid4()))
+        shell = MinecraftAccountFactory(uuid=None)
+        other_shell = MinecraftAccountFactory(uuid=None)
+
+        response = self.post([
+            {"token": "missing", "uuid": str(uuid4())},
+            {"account_id": shell.pk, "uuid": owner.uuid},      # uuid already used
+            {"account_id": owner.pk, "uuid": str(uuid4())},    # account already has another uuid
+            {"account_id": other_shell.pk, "uuid": "nope"},    # not a uuid
+            {"uuid": str(uuid4())},                            # no reference
+            {"account_id": other_shell.pk, "uuid": str(uuid4())},
+        ])
+
+        statuses = [r["status"] for r in response.data["results"]]
+        self.assertEqual(statuses, ["not_found", "conflict", "conflict", "invalid", "invalid", "attached"])
+        self.assertIn("uuid", response.data["results"][3]["errors"])
+        self.assertEqual(response.data["summary"], {"not_found": 1, "conflict": 2, "invalid": 2, "attached": 1})
+
+    def test_same_uuid_twice_in_one_batch_only_attaches_once(self):
+        first, second = MinecraftAccountFactory(uuid=None), MinecraftAccountFactory(uuid=None)
+        uuid = str(uuid4())
+
+        response = self.post([{"account_id": first.pk, "uuid": uuid}, {"account_id": second.pk, "uuid": uuid}])
+
+        self.assertEqual([r["status"] for r in response.data["results"]], ["attached", "conflict"])
+
+    @override_settings(MINECRAFT_ATTACH_MAX_ITEMS=2)
+    def test_batch_size_is_capped(self):
+        response = self.post([{"account_id": 1, "uuid": str(uuid4())}] * 3)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("items", response.data)
@@ -0,0 +1,28 @@
+from django.conf import settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class MinecraftServerRateThrottle(SimpleRateThrottle):
+    """
+    Per-server request rate: the server's own `throttle_rate`, else
+    MINECRAFT_SERVER_THROTTLE_RATE; no rate = unthrottled.
+
+    Goes after HasMinecraftServerKey, which tags the request with the server.
+    """
+    scope = "minecraft_server"
+
+    def get_rate(self):
+        # the default; allow_request() swaps in the calling server's own rate
+        return settings.MINECRAFT_SERVER_THROTTLE_RATE or None
+
+    def allow_request(self, request, view):
+        identity = getattr(request, "minecraft_server", None)
+        self.rate = (identity.throttle_rate if identity else "") or self.get_rate()
+        if not self.rate:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        identity = request.minecraft_server
+        return self.cache_format % {"scope": self.scope, "ident": identity.pk or identity.name}
@@ -1,8 +1,26 @@
 from django.urls import path
 from minecraft.views import (
-    LinkMinecraftAccountView
+    LinkMinecraftAccountView,
+    BulkLinkMinecraftAccountView,
+    AsyncLinkMinecraftAccountView,
+    HandshakeView,
+    ResolveNicknameView,
+    RosterView,
+    ChangesView,
+    StateEventsView,
+    HeartbeatsView,
+    ChangeStreamView,
 )
 
 urlpatterns = [
-    path('link-token/', LinkMinecraftAccountView.as_view())
+    path('link-token/', LinkMinecraftAccountView.as_view()),
+    path('link-token/bulk/', BulkLinkMinecraftAccountView.as_view()),
+    path('link-token/async/', AsyncLinkMinecraftAccountView.as_view()),
+    path('handshake/', HandshakeView.as_view()),
+    path('resolve/', ResolveNicknameView.as_view()),
+    path('roster/', RosterView.as_view()),
+    path('changes/', ChangesView.as_view()),
+    path('events/', StateEventsView.as_view()),
+    path('heartbeats/', HeartbeatsView.as_view()),
+    path('stream/', ChangeStreamView.as_view()),
 ]
\ No newline at end of file
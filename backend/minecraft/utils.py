@@ -1,65 +1,311 @@
+import logging
+import re
 import requests
+from django.conf import settings
+from django.db.models.functions import Length
 from django.utils.text import slugify
-from .models import MinecraftAccount
+from .models import NICKNAME_MAX_LENGTH, MinecraftAccount
+from .availability import afilter_available, filter_available
+from .leases import aacquire_first_lease, aacquire_lease, acquire_first_lease, acquire_lease, acquire_leases
+from .provider import get_async_provider_client, get_provider_client
+from .synth import synthesize_candidates
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_nickname(first_name: str, last_name: str) -> str | None:
+    """
+    Build a `first_last` nickname from raw name parts.
+
+    Returns None when nothing usable is left after normalization.
+    """
+
+    # fallback if API gave us weird blanks
+    if not first_name and not last_name:
+        return None
+
+    base = f"{first_name}_{last_name}".strip()
+
+    # normalize:
+    # - lower
+    # - replace spaces with _
+    # - keep only safe chars via slugify + tweak
+    #   slugify("Ålex Stone") -> "alex-stone"
+    #   then replace "-" with "_"
+    normalized = slugify(base).replace("-", "_")
+    # - cut to Minecraft's 16 chars (no dangling "_")
+    normalized = normalized[:NICKNAME_MAX_LENGTH].rstrip("_")
+
+    return normalized or None
+
+
+def fetch_candidates(batch_size: int, gender: str | None, nationality: str | None) -> list[str]:
+    """
+    Ask randomuser.me for `batch_size` people and return their normalized
+    nicknames (in provider order, blanks dropped).
+
+    Goes through the pooled, circuit-broken provider client, so it raises
+    requests.RequestException on network failure (or instantly while the
+    circuit is open) and RuntimeError("identity_provider_error") on a
+    non-200 answer.
+    """
+
+    people = get_provider_client().get_people(batch_size, gender, nationality)
+    return _people_to_candidates(people)
+
+
+async def afetch_candidates(batch_size: int, gender: str | None, nationality: str | None) -> list[str]:
+    """Async fetch_candidates over the per-loop httpx client, same errors."""
+    people = await get_async_provider_client().get_people(batch_size, gender, nationality)
+    return _people_to_candidates(people)
+
+
+async def asynthesize_candidates(batch_size: int, gender: str | None, nationality: str | None) -> list[str]:
+    # pure CPU and microseconds long, no point in a thread hop
+    return synthesize_candidates(batch_size, gender, nationality)
+
+
+def _people_to_candidates(people: list[dict]) -> list[str]:
+    candidates = []
+    for p in people:
+        normalized = normalize_nickname(
+            p.get("name", {}).get("first") or "",
+            p.get("name", {}).get("last") or "",
+        )
+        if normalized:
+            candidates.append(normalized)
+
+    return candidates
+
+
+# room kept for "_N" so suffixed names stay within NICKNAME_MAX_LENGTH up to N = 999
+_SUFFIX_ROOM = 4
+
+
+def _suffix_base(base: str) -> str:
+    return base[:NICKNAME_MAX_LENGTH - _SUFFIX_ROOM].rstrip("_")
+
+
+def allocate_suffixed_nickname(base: str) -> str:
+    """
+    Return the next free `base_N` (N = highest existing suffix + 1), with
+    `base` trimmed so the result fits NICKNAME_MAX_LENGTH.
+
+    Single query: the bounds turn into one range scan over the unique index on
+    `nickname` covering only `base_<digit>...` rows, the regex drops names like
+    `base_1x`, and ordering by length then value picks the numerically highest
+    suffix without scanning other names.
+    """
+    prefix = f"{_suffix_base(base)}_"
+    last = _highest_suffix_queryset(prefix).first()
+    suffix = int(last[len(prefix):]) + 1 if last else 1
+    return f"{prefix}{suffix}"
+
+
+async def aallocate_suffixed_nickname(base: str) -> str:
+    prefix = f"{_suffix_base(base)}_"
+    last = await _highest_suffix_queryset(prefix).afirst()
+    suffix = int(last[len(prefix):]) + 1 if last else 1
+    return f"{prefix}{suffix}"
+
+
+def lease_suffixed_nickname(base: str, max_tries: int = 10) -> str | None:
+    """
+    allocate_suffixed_nickname + lease. Parallel requests for the same popular
+    name compute the same `base_N`, so the losers move on to N+1, N+2, ...
+    """
+    base = _suffix_base(base)
+    first = int(allocate_suffixed_nickname(base).rpartition("_")[2])
+    for suffix in range(first, first + max_tries):
+        nickname = f"{base}_{suffix}"
+        if len(nickname) > NICKNAME_MAX_LENGTH:
+            break
+        if acquire_lease(nickname):
+            return nickname
+    return None
+
+
+async def alease_suffixed_nickname(base: str, max_tries: int = 10) -> str | None:
+    base = _suffix_base(base)
+    first = int((await aallocate_suffixed_nickname(base)).rpartition("_")[2])
+    for suffix in range(first, first + max_tries):
+        nickname = f"{base}_{suffix}"
+        if len(nickname) > NICKNAME_MAX_LENGTH:
+            break
+        if await aacquire_lease(nickname):
+            return nickname
+    return None
+
+
+def _highest_suffix_queryset(prefix: str):
+    return (
+        MinecraftAccount.objects
+        # ":" sorts right after "9": the range holds exactly the `prefix` + [1-9]... names
+        .filter(nickname__gte=f"{prefix}1", nickname__lt=f"{prefix}:")
+        .filter(nickname__regex=rf"^{re.escape(prefix)}[1-9][0-9]*$")
+        .annotate(nickname_length=Length("nickname"))
+        .order_by("-nickname_length", "-nickname")
+        .values_list("nickname", flat=True)
+    )
+
+
+# Candidate sources selectable via NICKNAME_ENGINE / NICKNAME_FALLBACK_ENGINE.
+# Every engine takes (batch_size, gender, nationality) and returns normalized names.
+NICKNAME_ENGINES = {
+    "randomuser": fetch_candidates,
+    "local": synthesize_candidates,
+}
+
+ASYNC_NICKNAME_ENGINES = {
+    "randomuser": afetch_candidates,
+    "local": asynthesize_candidates,
+}
+
+
+def get_engine(name: str, engines: dict = NICKNAME_ENGINES):
+    try:
+        return engines[name]
+    except KeyError:
+        raise ValueError(f"Unknown nickname engine: {name!r}") from None
+
+
+def _engine_with_fallback():
+    """
+    The configured engine as a callable that, on the first failure, switches
+    to NICKNAME_FALLBACK_ENGINE for the rest of its lifetime (one call of a
+    generate_* function), so a dead provider costs one timeout, not one per batch.
+    """
+    primary = settings.NICKNAME_ENGINE
+    fallback = settings.NICKNAME_FALLBACK_ENGINE
+    current = get_engine(primary)
+
+    def fetch(batch_size, gender, nationality):
+        nonlocal current
+        try:
+            return current(batch_size, gender, nationality)
+        except (requests.RequestException, RuntimeError) as exc:
+            if not fallback or fallback == primary or current is get_engine(fallback):
+                raise
+            logger.warning("Nickname engine %r failed (%s), falling back to %r", primary, exc, fallback)
+            current = get_engine(fallback)
+            return current(batch_size, gender, nationality)
+
+    return fetch
+
 
 def generate_unique_nickname(max_attempts: int, gender: str | None, nationality: str | None) -> str:
     """
-    Ask randomuser.me for candidate names and return the first nickname that
-    doesn't already exist in MinecraftAccount.nickname.
+    Ask the configured engine (randomuser.me by default) for candidate names
+    and return the first nickname that doesn't already exist in
+    MinecraftAccount.nickname and could be leased (see leases.py), so no
+    parallel request gets the same one. Availability costs at most one DB
+    query per batch (see availability.filter_available).
+
+    If the primary engine fails and NICKNAME_FALLBACK_ENGINE is set, the rest
+    of the call is served by the fallback instead of raising.
 
     Will try up to `max_attempts` unique names total.
-    After that, returns None to signal "just suffix it yourself".
+    After that, the first candidate seen gets a numeric suffix
+    (see lease_suffixed_nickname). Returns None only if the engines
+    produced no usable candidate at all.
     """
 
     attempts_left = max_attempts
+    first_candidate = None
+    fetch = _engine_with_fallback()
 
     # We'll pull in small batches so we don't spam the API.
-    # randomuser.me supports ?results=#
     while attempts_left > 0:
         batch_size = min(5, attempts_left)
+        candidates = fetch(batch_size, gender, nationality)
 
-        params = {"results": batch_size}
-        if gender:
-            params["gender"] = gender
-        if nationality:
-            params["nat"] = nationality
+        leased = acquire_first_lease(filter_available(candidates))
+        if leased:
+            return leased
 
-        try:
-            ru_resp = requests.get("https://randomuser.me/api/", params=params, timeout=5)
-        except requests.RequestException:
-            raise
+        if first_candidate is None and candidates:
+            first_candidate = candidates[0]
 
-        if ru_resp.status_code != 200:
-            raise RuntimeError("identity_provider_error")
+        attempts_left -= batch_size
+
+    # no unique candidate found within cap -> popular name, suffix it
+    if first_candidate is None:
+        return None
+    return lease_suffixed_nickname(first_candidate)
+
+
+def generate_unique_nicknames(count: int, gender: str | None, nationality: str | None, max_attempts: int | None = None) -> list[str]:
+    """
+    Bulk generate_unique_nickname: up to `count` distinct, leased nicknames.
+
+    Every round asks the engine for the whole shortfall in one call, checks
+    it with one availability query and leases the winners in bulk. Names
+    still missing after `max_attempts` candidates (default: 3 per name, at
+    least 10) are suffixed from popular ones. Fewer than `count` names are
+    returned only if the engines stop producing candidates.
+    """
+    max_attempts = max_attempts or max(10, 3 * count)
+    attempts_left = max_attempts
+    picked: list[str] = []
+    popular: list[str] = []
+    fetch = _engine_with_fallback()
+
+    while len(picked) < count and attempts_left > 0:
+        batch_size = min(count - len(picked), attempts_left)
+        candidates = fetch(batch_size, gender, nationality)
+        attempts_left -= batch_size
+        if not candidates:
+            break
 
-        payload = ru_resp.json()
-        people = payload.get("results", []) or []
+        fresh = [n for n in filter_available(candidates) if n not in picked]
+        picked += acquire_leases(fresh[:count - len(picked)])
+        popular += [n for n in candidates if n not in picked and n not in popular]
 
-        for p in people:
-            first_name = p.get("name", {}).get("first") or ""
-            last_name = p.get("name", {}).get("last") or ""
+    for base in popular:
+        if len(picked) >= count:
+            break
+        nickname = lease_suffixed_nickname(base)
+        if nickname:
+            picked.append(nickname)
 
-            # fallback if API gave us weird blanks
-            if not first_name and not last_name:
-                continue
+    return picked
 
-            base = f"{first_name}_{last_name}".strip()
 
-            # normalize:
-            # - lower
-            # - replace spaces with _
-            # - keep only safe chars via slugify + tweak
-            #   slugify("Ålex Stone") -> "alex-stone"
-            #   then replace "-" with "_"
-            normalized = slugify(base).replace("-", "_")
+async def agenerate_unique_nickname(max_attempts: int, gender: str | None, nationality: str | None) -> str | None:
+    """
+    Async generate_unique_nickname for the ASGI link flow: provider calls go
+    through httpx and availability checks through the async ORM, so the
+    event loop keeps serving other requests while we wait.
+    """
+
+    attempts_left = max_attempts
+    first_candidate = None
+    primary = settings.NICKNAME_ENGINE
+    fallback = settings.NICKNAME_FALLBACK_ENGINE
+    fetch = get_engine(primary, ASYNC_NICKNAME_ENGINES)
+
+    while attempts_left > 0:
+        batch_size = min(5, attempts_left)
+
+        try:
+            candidates = await fetch(batch_size, gender, nationality)
+        except (requests.RequestException, RuntimeError) as exc:
+            if not fallback or fallback == primary:
+                raise
+            logger.warning("Nickname engine %r failed (%s), falling back to %r", primary, exc, fallback)
+            fetch = get_engine(fallback, ASYNC_NICKNAME_ENGINES)
+            candidates = await fetch(batch_size, gender, nationality)
 
-            if not normalized:
-                continue
+        leased = await aacquire_first_lease(await afilter_available(candidates))
+        if leased:
+            return leased
 
-            if not MinecraftAccount.objects.filter(nickname=normalized).exists():
-                return normalized
+        if first_candidate is None and candidates:
+            first_candidate = candidates[0]
 
         attempts_left -= batch_size
 
-    # no unique candidate found within cap
-    return None
\ No newline at end of file
+    if first_candidate is None:
+        return None
+    return await alease_suffixed_nickname(first_candidate)
@@ -1,31 +1,66 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, NotFound, PermissionDenied, Throttled
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
 import requests
+from collections import Counter
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
 from django.utils.translation import gettext_lazy as _
-from django.db import transaction
+from django.conf import settings
+from django.db import IntegrityError
+from django.views import View
 
-from accounts.models import GameToken
-from minecraft.models import MinecraftAccount
-from accounts.auth import HasMinecraftServerKey
-from .utils import generate_unique_nickname
+from accounts.auth import CookieJWTAuthentication
+from .utils import agenerate_unique_nickname, generate_unique_nickname, generate_unique_nicknames
+from .pool import apop_pooled_nickname, pop_pooled_nickname, pop_pooled_nicknames
+from .availability import remember_taken
+from .leases import arelease_lease, release_lease, release_leases
+from .handshake import NOT_FOUND, handshake
+from .roster import aiter_roster, iter_roster, roster_etag
+from .changes import CursorExpired, changes_since, current_cursor
+from .permissions import HasMinecraftServerKey
+from .throttling import MinecraftServerRateThrottle
+from .playtime import batch_flushed, get_playtime_buffer, heartbeat_key
+from . import push
+from .serializers import (
+    AttachUUIDBatchSerializer, AttachUUIDItemSerializer, BulkLinkQuerySerializer, ChangesQuerySerializer,
+    HandshakeQuerySerializer, HeartbeatBatchSerializer, ResolveQuerySerializer, StateEventBatchSerializer,
+    StateEventSerializer,
+)
+from .services import (
+    ReservationLost, apply_events, areserve_token, arelease_token, attach_uuids, is_nickname_clash, link_account,
+    link_accounts, release_token, release_tokens, reserve_token, reserve_tokens, resolve_nickname, taken_among,
+)
 
+CURSOR_EXPIRED = _("Changes after this cursor were pruned; reload the roster.")
 
 
 class LinkMinecraftAccountView(APIView):
     """
     2 modes:
     - GET (authenticated user): pre-create a MinecraftAccount shell and bind the next available token.
-    - POST (server with X-Server-Key): attach UUID for an existing account later.
+    - POST (server with X-Server-Key): attach UUIDs to existing accounts later, in batches.
     """
 
+    # how many fresh names to try when the DB rejects one as already taken
+    nickname_retries = 3
+
     def get_permissions(self):
         if self.request.method == "POST":
             return [HasMinecraftServerKey()]
         return [IsAuthenticated()]
 
-    @transaction.atomic
+    def get_throttles(self):
+        if self.request.method == "POST":
+            return [MinecraftServerRateThrottle()]
+        return super().get_throttles()
+
     def get(self, request):
         user = request.user
 
@@ -33,42 +68,54 @@ class LinkMinecraftAccountView(APIView):
         gender = request.query_params.get("gender")
         nationality = request.query_params.get("nationality")
 
-        # --- 1. pick an available token for this user
-        # "available" means:
-        #   - user owns it
-        #   - it's still active
-        #   - it is NOT already attached to a MinecraftAccount
-        token = GameToken.objects.filter(user=user, is_active=True, minecraft_account__isnull=True).order_by("generated_at").first()
+        # --- 1. reserve an available token for this user (no transaction stays open)
+        token = reserve_token(user)
 
         if token is None:
             return Response({"detail": _("No available tokens. Generate one first.")}, status=status.HTTP_403_FORBIDDEN)
 
-        # --- 2. call randomuser API to get random RP name
+        account = None
         try:
-            nickname_candidate = generate_unique_nickname(max_attempts=10, gender=gender, nationality=nationality)
-        except requests.RequestException:
-            return Response({"detail": _("Failed to generate identity. Please try again.")}, status=status.HTTP_502_BAD_GATEWAY)
-        except RuntimeError:
-            return Response({"detail": _("Identity provider error.")}, status=status.HTTP_502_BAD_GATEWAY)
+            # --- 2./3. pick a name outside of any transaction, then burn the token and
+            # create the MinecraftAccount shell (no uuid yet) in one short transaction.
+            # The availability index can lag behind other nodes, so the unique index
+            # has the last word: on a lost race remember the name and pick another.
+            for _attempt in range(self.nickname_retries):
 
-        if nickname_candidate is None:
-            return Response({'detail': _("Currently impossible to generate a new user, please try again later.")}, status=status.HTTP_502_BAD_GATEWAY)
+                # take a pre-generated name from the pool, only call randomuser API if the bucket is empty
+                nickname_candidate = pop_pooled_nickname(gender, nationality)
 
-        # --- 3. create MinecraftAccount shell with no uuid yet
-        account = MinecraftAccount.objects.create(
-            owner=user,
-            nickname=nickname_candidate,
-            uuid=None,  # will be filled in by POST from server
-            token=token,
-            is_dead=False,
-            dead_at=None,
-            is_active=True,
-            deactivated_at=None,
-        )
+                if nickname_candidate is None:
+                    try:
+                        nickname_candidate = generate_unique_nickname(max_attempts=10, gender=gender, nationality=nationality)
+                    except requests.RequestException:
+                        return Response({"detail": _("Failed to generate identity. Please try again.")}, status=status.HTTP_502_BAD_GATEWAY)
+                    except RuntimeError:
+                        return Response({"detail": _("Identity provider error.")}, status=status.HTTP_502_BAD_GATEWAY)
 
-        # --- 4. burn token so it can't be reused elsewhere
-        token.is_active = False
-        token.save(update_fields=["is_active"])
+                if nickname_candidate is None:
+                    break
+
+                try:
+                    account = link_account(user, token, nickname_candidate)
+                    break
+                except IntegrityError as exc:
+                    release_lease(nickname_candidate)
+                    # a clash on the token or uuid: another name won't fix it
+                    if not is_nickname_clash(exc):
+                        break
+                    # an account already had it (stale index)
+                    remember_taken([nickname_candidate])
+                except ReservationLost:
+                    release_lease(nickname_candidate)
+                    break
+        finally:
+            # --- 4. hand the token back if nothing got linked to it
+            if account is None:
+                release_token(token)
+
+        if account is None:
+            return Response({'detail': _("Currently impossible to generate a new user, please try again later.")}, status=status.HTTP_502_BAD_GATEWAY)
 
         # --- 5. return the shell info
         return Response(
@@ -80,4 +127,417 @@ class LinkMinecraftAccountView(APIView):
                 "created_at": account.created_at,
             },
             status=status.HTTP_201_CREATED,
-        )
\ No newline at end of file
+        )
+
+
+    def post(self, request):
+        """
+        Batch attach: `{"items": [{"token": "...", "uuid": "..."}, {"account_id": 1, "uuid": "..."}, ...]}`.
+
+        Items are validated one by one, resolved together with one query and
+        written with one bulk_update. Returns one result per item, in order.
+        """
+        envelope = AttachUUIDBatchSerializer(data=request.data)
+        envelope.is_valid(raise_exception=True)
+        raw_items = envelope.validated_data["items"]
+
+        results = [None] * len(raw_items)
+        valid = []
+        for index, raw in enumerate(raw_items):
+            item = AttachUUIDItemSerializer(data=raw)
+            if item.is_valid():
+                valid.append((index, item.validated_data))
+            else:
+                results[index] = {"status": "invalid", "errors": item.errors}
+
+        for (index, data), (outcome, account_id) in zip(valid, attach_uuids([data for _index, data in valid])):
+            results[index] = {"status": outcome, "account_id": account_id}
+
+        summary = Counter(result["status"] for result in results)
+        return Response({"ok": True, "results": results, "summary": summary}, status=status.HTTP_200_OK)
+
+
+class BulkLinkMinecraftAccountView(APIView):
+    """
+    GET (authenticated user): link all free tokens (or `count` of them) in one go.
+
+    Same steps as LinkMinecraftAccountView, batched: one reservation, names
+    from the pool and then from one engine call for the rest, one
+    availability query, one token UPDATE and one bulk INSERT.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    # how many times to replace names the DB rejects as already taken
+    nickname_retries = 3
+
+    def get(self, request):
+        user = request.user
+
+        params = BulkLinkQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        count = params.validated_data.get("count")
+        gender = params.validated_data.get("gender")
+        nationality = params.validated_data.get("nationality")
+
+        # --- 1. reserve the tokens
+        tokens = reserve_tokens(user, count)
+
+        if not tokens:
+            return Response({"detail": _("No available tokens. Generate one first.")}, status=status.HTTP_403_FORBIDDEN)
+
+        accounts = []
+        nicknames = []
+        try:
+            # --- 2./3. pick leased names for all of them, then link in one transaction
+            for _attempt in range(self.nickname_retries):
+                if len(nicknames) < len(tokens):
+                    nicknames += pop_pooled_nicknames(gender, nationality, len(tokens) - len(nicknames))
+
+                if len(nicknames) < len(tokens):
+                    try:
+                        nicknames += generate_unique_nicknames(len(tokens) - len(nicknames), gender=gender, nationality=nationality)
+                    except requests.RequestException:
+                        return Response({"detail": _("Failed to generate identity. Please try again.")}, status=status.HTTP_502_BAD_GATEWAY)
+                    except RuntimeError:
+                        return Response({"detail": _("Identity provider error.")}, status=status.HTTP_502_BAD_GATEWAY)
+
+                if not nicknames:
+                    break
+
+                try:
+                    accounts = link_accounts(user, tokens[:len(nicknames)], nicknames)
+                    break
+                except IntegrityError as exc:
+                    # a clash on a token or uuid: other names won't fix it
+                    if not is_nickname_clash(exc):
+                        break
+                    # some names already had accounts (stale index): swap just those
+                    taken = taken_among(nicknames)
+                    release_leases(taken)
+                    remember_taken(taken)
+                    nicknames = [n for n in nicknames if n not in taken]
+                except ReservationLost:
+                    break
+        finally:
+            # --- 4. hand back whatever didn't get linked
+            linked = {account.token_id for account in accounts}
+            release_tokens([t for t in tokens if t.pk not in linked])
+            if not accounts:
+                release_leases(nicknames)
+
+        if not accounts:
+            return Response({'detail': _("Currently impossible to generate a new user, please try again later.")}, status=status.HTTP_502_BAD_GATEWAY)
+
+        # --- 5. return the shells
+        return Response(
+            {
+                "ok": True,
+                "accounts": [
+                    {
+                        "account_id": account.id,
+                        "nickname": account.nickname,
+                        "uuid": account.uuid,  # will be None for now
+                        "created_at": account.created_at,
+                    }
+                    for account in accounts
+                ],
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class HandshakeView(APIView):
+    """
+    GET (server with X-Server-Key): account state for a joining player, by
+    `?token=<GameToken.value>` or `?uuid=<player uuid>`.
+
+    Served from the handshake cache (see handshake.py); under ASGI, cache
+    hits don't even reach this view (see minecraft/asgi.py).
+    """
+
+    authentication_classes = []
+    permission_classes = [HasMinecraftServerKey]
+    throttle_classes = [MinecraftServerRateThrottle]
+
+    def get(self, request):
+        params = HandshakeQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        result = handshake(**params.validated_data)
+        if result == NOT_FOUND:
+            return Response({"detail": NotFound.default_detail}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"ok": True, **result}, status=status.HTTP_200_OK)
+
+
+class ResolveNicknameView(APIView):
+    """
+    GET (server with X-Server-Key): account state for `?nickname=<name>`,
+    matched case-insensitively (moderation tools, chat plugins).
+
+    One probe of the case-insensitive nickname index, see resolve_nickname().
+    """
+
+    authentication_classes = []
+    permission_classes = [HasMinecraftServerKey]
+    throttle_classes = [MinecraftServerRateThrottle]
+
+    def get(self, request):
+        params = ResolveQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        account = resolve_nickname(params.validated_data["nickname"])
+        if account is None:
+            return Response({"detail": NotFound.default_detail}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"ok": True, **account}, status=status.HTTP_200_OK)
+
+
+class RosterView(APIView):
+    """
+    GET (server with X-Server-Key): all active accounts as NDJSON, one
+    `{"account_id", "nickname", "uuid", "is_dead"}` object per line.
+
+    Streamed page by page (see roster.py). Send the last ETag back in
+    If-None-Match to get a 304 while nothing changed. X-Changes-Cursor is
+    the `since` to follow the roster with on changes/.
+    """
+
+    authentication_classes = []
+    permission_classes = [HasMinecraftServerKey]
+    throttle_classes = [MinecraftServerRateThrottle]
+
+    def get(self, request):
+        # before reading anything: changes made while streaming get replayed
+        cursor = current_cursor()
+        etag = roster_etag(cursor)
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+        else:
+            # under ASGI a sync iterator would be buffered whole before sending
+            content = aiter_roster() if isinstance(request._request, ASGIRequest) else iter_roster()
+            response = StreamingHttpResponse(content, content_type="application/x-ndjson")
+            # where to start polling changes/ to keep this copy current
+            response["X-Changes-Cursor"] = cursor
+        response["ETag"] = etag
+        return response
+
+
+class ChangesView(APIView):
+    """
+    GET (server with X-Server-Key): account changes after `?since=<cursor>`,
+    in commit order (see changes.py).
+
+    Returns `{"changes": [...], "cursor": ..., "has_more": ...}`; poll again
+    with `since=<cursor>`, right away while `has_more` is true. 410 once the
+    entries after the cursor have been pruned.
+    """
+
+    authentication_classes = []
+    permission_classes = [HasMinecraftServerKey]
+    throttle_classes = [MinecraftServerRateThrottle]
+
+    def get(self, request):
+        params = ChangesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        since = params.validated_data["since"]
+        limit = params.validated_data.get("limit", settings.MINECRAFT_CHANGES_PAGE_SIZE)
+
+        try:
+            changes, cursor, has_more = changes_since(since, limit)
+        except CursorExpired:
+            return Response({"detail": CURSOR_EXPIRED}, status=status.HTTP_410_GONE)
+        return Response({"changes": changes, "cursor": cursor, "has_more": has_more}, status=status.HTTP_200_OK)
+
+
+class StateEventsView(APIView):
+    """
+    POST (server with X-Server-Key): deaths and deactivations, in batches.
+
+    `{"items": [{"key": "...", "type": "death", "uuid": "...", "at": "..."}, ...]}`.
+    Every event carries an idempotency key, so resending a batch after a
+    timeout is safe. Returns one result per item, in order (see services.apply_events).
+    """
+
+    authentication_classes = []
+    permission_classes = [HasMinecraftServerKey]
+    throttle_classes = [MinecraftServerRateThrottle]
+
+    def post(self, request):
+        envelope = StateEventBatchSerializer(data=request.data)
+        envelope.is_valid(raise_exception=True)
+        raw_items = envelope.validated_data["items"]
+
+        results = [None] * len(raw_items)
+        valid = []
+        for index, raw in enumerate(raw_items):
+            item = StateEventSerializer(data=raw)
+            if item.is_valid():
+                valid.append((index, item.validated_data))
+            else:
+                results[index] = {"status": "invalid", "errors": item.errors}
+
+        for (index, _data), (outcome, account_id) in zip(valid, apply_events([data for _index, data in valid], request.minecraft_server)):
+            results[index] = {"status": outcome, "account_id": account_id}
+
+        summary = Counter(result["status"] for result in results)
+        return Response({"ok": True, "results": results, "summary": summary}, status=status.HTTP_200_OK)
+
+
+class HeartbeatsView(APIView):
+    """
+    POST (server with X-Server-Key): playtime heartbeats of online players,
+    `{"key": "...", "items": [{"uuid": "...", "seconds": 10}, ...]}`.
+
+    Buffered and written in bulk (see playtime.py), hence 202. A batch whose
+    key was seen before is acknowledged and ignored.
+    """
+
+    authentication_classes = []
+    permission_classes = [HasMinecraftServerKey]
+    throttle_classes = [MinecraftServerRateThrottle]
+
+    def post(self, request):
+        batch = HeartbeatBatchSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+        items = batch.validated_data["items"]
+
+        # the flush stores the key with the seconds and drops batches another worker stored first;
+        # these checks just answer most retries right away
+        key = heartbeat_key(request.minecraft_server, batch.validated_data["key"])
+        if batch_flushed(key) or not get_playtime_buffer().add(items, key):
+            return Response({"ok": True, "accepted": 0, "duplicate": True}, status=status.HTTP_200_OK)
+
+        return Response({"ok": True, "accepted": len(items), "duplicate": False}, status=status.HTTP_202_ACCEPTED)
+
+
+class ChangeStreamView(View):
+    """
+    GET (server with X-Server-Key): the change feed pushed as Server-Sent
+    Events (see push.py). Resumes after `Last-Event-ID` (or `?since=`).
+
+    Needs ASGI: a WSGI worker would be tied up for the whole connection.
+    """
+
+    async def get(self, request):
+        # the key lookup may hit the DB
+        if not await sync_to_async(HasMinecraftServerKey().has_permission)(request, self):
+            return JsonResponse({"detail": PermissionDenied.default_detail}, status=status.HTTP_403_FORBIDDEN, encoder=JSONEncoder)
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({"detail": _("Streaming requires the ASGI server.")}, status=status.HTTP_501_NOT_IMPLEMENTED, encoder=JSONEncoder)
+
+        since = request.headers.get("Last-Event-ID") or request.GET.get("since")
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                return JsonResponse({"detail": _("Invalid cursor.")}, status=status.HTTP_400_BAD_REQUEST, encoder=JSONEncoder)
+            if await push.acursor_expired(since):
+                return JsonResponse({"detail": CURSOR_EXPIRED}, status=status.HTTP_410_GONE, encoder=JSONEncoder)
+
+        response = StreamingHttpResponse(push.stream(since), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # nginx: flush every event
+        return response
+
+
+class AsyncLinkMinecraftAccountView(View):
+    """
+    Native async twin of LinkMinecraftAccountView.get for ASGI deployments.
+
+    Same contract (params, status codes, payload), but the provider call goes
+    through httpx and the lookups through the async ORM, so while a request
+    waits on randomuser.me the worker keeps serving others instead of
+    parking a thread for the whole round trip.
+    """
+
+    nickname_retries = LinkMinecraftAccountView.nickname_retries
+    # same limits as the sync view, which gets DRF's defaults
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+
+    async def get(self, request):
+        user = await self.authenticate(request)
+        if user is None:
+            return self.respond({"detail": NotAuthenticated.default_detail}, status.HTTP_401_UNAUTHORIZED)
+
+        request.user = user
+        throttled = await sync_to_async(self.check_throttles)(request)
+        if throttled is not None:
+            headers = {"Retry-After": str(throttled.wait)} if throttled.wait is not None else None
+            return self.respond({"detail": throttled.detail}, status.HTTP_429_TOO_MANY_REQUESTS, headers)
+
+        gender = request.GET.get("gender")
+        nationality = request.GET.get("nationality")
+
+        token = await areserve_token(user)
+
+        if token is None:
+            return self.respond({"detail": _("No available tokens. Generate one first.")}, status.HTTP_403_FORBIDDEN)
+
+        account = None
+        try:
+            for _attempt in range(self.nickname_retries):
+                nickname_candidate = await apop_pooled_nickname(gender, nationality)
+
+                if nickname_candidate is None:
+                    try:
+                        nickname_candidate = await agenerate_unique_nickname(max_attempts=10, gender=gender, nationality=nationality)
+                    except requests.RequestException:
+                        return self.respond({"detail": _("Failed to generate identity. Please try again.")}, status.HTTP_502_BAD_GATEWAY)
+                    except RuntimeError:
+                        return self.respond({"detail": _("Identity provider error.")}, status.HTTP_502_BAD_GATEWAY)
+
+                if nickname_candidate is None:
+                    break
+
+                try:
+                    # atomic blocks need the sync ORM, so only this step hops to the DB thread
+                    account = await sync_to_async(link_account)(user, token, nickname_candidate)
+                    break
+                except IntegrityError as exc:
+                    await arelease_lease(nickname_candidate)
+                    if not is_nickname_clash(exc):
+                        break
+                    await sync_to_async(remember_taken)([nickname_candidate])
+                except ReservationLost:
+                    await arelease_lease(nickname_candidate)
+                    break
+        finally:
+            if account is None:
+                await arelease_token(token)
+
+        if account is None:
+            return self.respond({"detail": _("Currently impossible to generate a new user, please try again later.")}, status.HTTP_502_BAD_GATEWAY)
+
+        return self.respond(
+            {
+                "ok": True,
+                "account_id": account.id,
+                "nickname": account.nickname,
+                "uuid": account.uuid,
+                "created_at": account.created_at,
+            },
+            status.HTTP_201_CREATED,
+        )
+
+    async def authenticate(self, request):
+        """Cookie/header JWT, same as the DRF views; None when missing or invalid."""
+        try:
+            result = await sync_to_async(CookieJWTAuthentication().authenticate)(request)
+        except AuthenticationFailed:
+            return None
+        if result is None or not result[0].is_active:
+            return None
+        return result[0]
+
+    def check_throttles(self, request) -> Throttled | None:
+        """APIView.check_throttles, returning the refusal instead of raising it (throttles may hit the cache)."""
+        waits = [throttle.wait() for throttle in (cls() for cls in self.throttle_classes)
+                 if not throttle.allow_request(request, self)]
+        if not waits:
+            return None
+        return Throttled(max((wait for wait in waits if wait is not None), default=None))
+
+    @staticmethod
+    def respond(data: dict, status_code: int, headers: dict | None = None) -> JsonResponse:
+        # DRF's encoder renders lazy translations and datetimes like Response does
+        return JsonResponse(data, status=status_code, encoder=JSONEncoder, headers=headers)